@@ -0,0 +1,80 @@
+"""Deterministic, streaming zip writer used for scaffold downloads."""
+
+from __future__ import annotations
+
+import io
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Tuple, Union
+from zipfile import ZIP64_LIMIT, ZIP_STORED, ZipFile, ZipInfo
+
+
+# Fixed metadata so identical inputs always produce byte-identical archives.
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+CHUNK_SIZE = 64 * 1024
+
+# Paths and open binary files (e.g. spooled uploads) are copied in chunks, never read whole.
+ZipSource = Union[str, bytes, Path, BinaryIO]
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable sink; forces zipfile to emit data descriptors."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:  # type: ignore[override]
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def zip_info(name: str) -> ZipInfo:
+    info = ZipInfo(name, date_time=ZIP_EPOCH)
+    info.compress_type = ZIP_STORED
+    info.create_system = 3
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def iter_zip(entries: Iterable[Tuple[str, ZipSource]], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield the archive in chunks; at most ``chunk_size`` of file data is held at once."""
+    sink = _ChunkSink()
+    with ZipFile(sink, "w") as bundle:
+        for name, source in entries:
+            info = zip_info(name)
+            if isinstance(source, Path):
+                force_zip64 = source.stat().st_size > ZIP64_LIMIT
+                with source.open("rb") as src, bundle.open(info, "w", force_zip64=force_zip64) as dest:
+                    while block := src.read(chunk_size):
+                        dest.write(block)
+                        yield sink.drain()
+            elif hasattr(source, "read"):
+                force_zip64 = source.seek(0, io.SEEK_END) > ZIP64_LIMIT
+                source.seek(0)
+                with bundle.open(info, "w", force_zip64=force_zip64) as dest:
+                    while block := source.read(chunk_size):
+                        dest.write(block)
+                        yield sink.drain()
+            else:
+                bundle.writestr(info, source.encode("utf-8") if isinstance(source, str) else source)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+def build_zip(entries: Iterable[Tuple[str, ZipSource]]) -> bytes:
+    return b"".join(iter_zip(entries))
+
+
+__all__ = ["CHUNK_SIZE", "ZIP_EPOCH", "ZipSource", "build_zip", "iter_zip", "zip_info"]
@@ -0,0 +1,131 @@
+"""Batch scaffolding driven by a JSONL/CSV manifest and a process pool."""
+
+from __future__ import annotations
+
+import csv
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Set, Tuple, Union
+
+from app.main import ScaffoldContext, addon_directory, sync_scaffold
+
+
+@dataclass
+class BatchResult:
+    line: int
+    addon_folder: str
+    addon_dir: str
+    files: int
+    seconds: float
+    error: str = ""
+    new_objects: int = 0
+
+
+def _parse_row(line: int, row: object) -> Union[ScaffoldContext, BatchResult]:
+    try:
+        if not isinstance(row, dict):
+            raise ValueError(f"expected an object, got {type(row).__name__}")
+        return ScaffoldContext.from_mapping(row)
+    except (TypeError, ValueError) as exc:
+        folder = row.get("addon_folder") if isinstance(row, dict) else None
+        return BatchResult(line, str(folder or "?"), "", 0, 0.0, str(exc))
+
+
+def iter_manifest(path: Path) -> Iterator[Tuple[int, Union[ScaffoldContext, BatchResult]]]:
+    """Yield ``(line, context)`` pairs one row at a time; a row that cannot be parsed yields a failed result."""
+    with path.open(encoding="utf-8", newline="") as handle:
+        if path.suffix.lower() == ".csv":
+            reader = csv.DictReader(handle)
+            for row in reader:
+                yield reader.line_num, _parse_row(reader.line_num, row)
+            return
+        for line_no, line in enumerate(handle, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_no, BatchResult(line_no, "?", "", 0, 0.0, f"invalid JSON: {exc}")
+                continue
+            yield line_no, _parse_row(line_no, row)
+
+
+def scaffold_entry(
+    line: int, base: Path, ctx: ScaffoldContext, store: Optional[Path] = None, link_mode: str = "hardlink"
+) -> BatchResult:
+    started = time.perf_counter()
+    addon_dir = addon_directory(base, ctx)
+    new_objects = 0
+    try:
+        addon_dir.mkdir(parents=True, exist_ok=True)
+        changes = sync_scaffold(addon_dir, ctx)
+        files = sum(change.status != "unchanged" for change in changes)
+        if store is not None:
+            from app.store import AssetStore
+
+            new_objects = AssetStore(store, link_mode).dedupe_addon(addon_dir).new_objects
+    except (OSError, KeyError, ValueError) as exc:
+        return BatchResult(line, ctx.addon_folder, str(addon_dir), 0, time.perf_counter() - started, str(exc))
+    return BatchResult(line, ctx.addon_folder, str(addon_dir), files, time.perf_counter() - started, new_objects=new_objects)
+
+
+def _report(result: BatchResult) -> None:
+    if result.error:
+        print(f"[line {result.line}] {result.addon_folder}: FAILED ({result.error})")
+    else:
+        print(f"[line {result.line}] {result.addon_folder}: {result.files} files written in {result.seconds * 1000:.1f} ms")
+
+
+def action_batch_scaffold(
+    manifest: Path, base: Path, jobs: int = 1, store: Optional[Path] = None, link_mode: str = "hardlink"
+) -> int:
+    """Scaffold every manifest entry, keeping at most ``jobs * 4`` entries in flight."""
+    started = time.perf_counter()
+    total_files = 0
+    entries = 0
+    failures = 0
+    new_objects = 0
+
+    def collect(result: BatchResult) -> None:
+        nonlocal total_files, entries, failures, new_objects
+        entries += 1
+        total_files += result.files
+        new_objects += result.new_objects
+        failures += bool(result.error)
+        _report(result)
+
+    if jobs <= 1:
+        for line, ctx in iter_manifest(manifest):
+            collect(ctx if isinstance(ctx, BatchResult) else scaffold_entry(line, base, ctx, store, link_mode))
+    else:
+        window = jobs * 4
+        pending: Set[Future] = set()
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for line, ctx in iter_manifest(manifest):
+                if isinstance(ctx, BatchResult):
+                    collect(ctx)
+                    continue
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future.result())
+                pending.add(pool.submit(scaffold_entry, line, base, ctx, store, link_mode))
+            for future in wait(pending).done:
+                collect(future.result())
+
+    elapsed = time.perf_counter() - started
+    rate = total_files / elapsed if elapsed else 0.0
+    print(
+        f"\nScaffolded {entries - failures}/{entries} addons, {total_files} files written "
+        f"in {elapsed:.2f}s ({rate:.0f} files/sec) under {base / '@MyWeaponMod' / 'addons'}"
+    )
+    if store is not None:
+        print(f"Asset store {store}: {new_objects} new objects")
+    return failures
+
+
+__all__ = ["BatchResult", "action_batch_scaffold", "iter_manifest", "scaffold_entry"]
@@ -0,0 +1,208 @@
+"""Micro/macro benchmarks for the scaffold pipeline with baseline regression gating."""
+
+from __future__ import annotations
+
+import json
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from string import Template
+from typing import Callable, Dict, List, Optional
+
+from app.main import (
+    CONFIG_TEMPLATE,
+    MODEL_CFG_TEMPLATE,
+    ScaffoldContext,
+    addon_directory,
+    placeholder_files,
+    sync_scaffold,
+)
+from app.templating import CompiledTemplate
+
+Result = Dict[str, float]
+
+TMPFS_CANDIDATES = [Path("/dev/shm")]
+GATED_METRIC = "p50_us"
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def measure(func: Callable[[], object], iterations: int, warmup: int = 5) -> Result:
+    for _ in range(min(warmup, iterations)):
+        func()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter_ns()
+        func()
+        samples.append((time.perf_counter_ns() - started) / 1000)
+    samples.sort()
+    total_seconds = sum(samples) / 1e6
+    return {
+        "iterations": iterations,
+        "p50_us": round(percentile(samples, 0.50), 2),
+        "p95_us": round(percentile(samples, 0.95), 2),
+        "p99_us": round(percentile(samples, 0.99), 2),
+        "mean_us": round(sum(samples) / len(samples), 2),
+        "ops_per_sec": round(iterations / total_seconds, 1) if total_seconds else 0.0,
+    }
+
+
+def _context_with_magazines(count: int) -> ScaffoldContext:
+    magazines = ",".join(f"rhs_mag_bench_{index}_Mag" for index in range(count))
+    return ScaffoldContext(magazines=magazines, magazine_wells="SR25,CBA_762x51_SR25")
+
+
+# A block tag and everything up to its matching end tag (model.cfg does not nest blocks).
+BLOCK = re.compile(r"^[ \t]*\{%\s*(for|if)\b.*?\{%\s*end\1\s*%\}[ \t]*\n?", re.MULTILINE | re.DOTALL)
+
+
+def block_free(template: str) -> str:
+    """``template`` without its ``{% for %}``/``{% if %}`` blocks, so ``string.Template`` can render it."""
+    return BLOCK.sub("", template)
+
+
+def bench_templates(iterations: int) -> Dict[str, Result]:
+    kwargs = ScaffoldContext().to_format_kwargs()
+    # string.Template cannot render blocks, so the reference point renders model.cfg without them.
+    plain_model_cfg = block_free(MODEL_CFG_TEMPLATE.template)
+    compiled = CompiledTemplate(plain_model_cfg)
+    reference = Template(plain_model_cfg)
+    return {
+        "render.config_cpp": measure(lambda: CONFIG_TEMPLATE.render(kwargs), iterations),
+        "render.model_cfg": measure(lambda: MODEL_CFG_TEMPLATE.render(kwargs), iterations),
+        "render.model_cfg.block_free": measure(lambda: compiled.render(kwargs), iterations),
+        "render.model_cfg.string_template": measure(lambda: reference.substitute(**kwargs), iterations),
+    }
+
+
+def bench_format_kwargs(iterations: int, sizes: List[int]) -> Dict[str, Result]:
+    results = {}
+    for size in sizes:
+        ctx = _context_with_magazines(size)
+        results[f"to_format_kwargs.magazines_{size}"] = measure(ctx.to_format_kwargs, iterations)
+    return results
+
+
+def bench_scaffold(iterations: int, label: str, root: Path) -> Dict[str, Result]:
+    work = Path(tempfile.mkdtemp(prefix="arma-bench-", dir=root))
+    counter = iter(range(10**9))
+    files_per_run = 0
+
+    def run() -> None:
+        nonlocal files_per_run
+        ctx = ScaffoldContext(addon_folder=f"bench_{next(counter)}")
+        addon_dir = addon_directory(work, ctx)
+        addon_dir.mkdir(parents=True, exist_ok=True)
+        changes = sync_scaffold(addon_dir, ctx)
+        files_per_run = len(changes) + len(placeholder_files(addon_dir, ctx))
+
+    try:
+        result = measure(run, iterations, warmup=2)
+        unchanged_ctx = ScaffoldContext(addon_folder="bench_0")
+        noop = measure(lambda: sync_scaffold(addon_directory(work, unchanged_ctx), unchanged_ctx), iterations)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    result["files_per_sec"] = round(result["ops_per_sec"] * files_per_run, 1)
+    return {f"scaffold.{label}": result, f"scaffold.{label}.noop": noop}
+
+
+def bench_web(iterations: int) -> Dict[str, Result]:
+    try:
+        from app.web import build_scaffold_zip, create_app
+    except ImportError as exc:
+        print(f"Skipping web benchmarks: {exc}", file=sys.stderr)
+        return {}
+    ctx = ScaffoldContext()
+    archive_size = len(build_scaffold_zip(ctx))
+    zip_result = measure(lambda: build_scaffold_zip(ctx), iterations)
+    zip_result["mb_per_sec"] = round(zip_result["ops_per_sec"] * archive_size / (1024 * 1024), 2)
+
+    client = create_app().test_client()
+    counter = iter(range(10**9))
+    results = {
+        "zip.build": zip_result,
+        "http.get_index": measure(lambda: client.get("/").close(), iterations),
+        "http.get_plan": measure(lambda: client.get("/plan").close(), iterations),
+        "http.post_scaffold_cached": measure(
+            lambda: client.post("/scaffold", data={"addon_folder": "bench"}).get_data(), iterations
+        ),
+        "http.post_scaffold_uncached": measure(
+            lambda: client.post("/scaffold", data={"addon_folder": f"bench_{next(counter)}"}).get_data(), iterations
+        ),
+    }
+    for name in results:
+        if name.startswith("http."):
+            results[name]["requests_per_sec"] = results[name]["ops_per_sec"]
+    return results
+
+
+def run_benchmarks(iterations: int, disk_dir: Optional[Path] = None) -> Dict[str, object]:
+    benchmarks: Dict[str, Result] = {}
+    benchmarks.update(bench_templates(iterations))
+    benchmarks.update(bench_format_kwargs(iterations, [1, 100, 1000]))
+    scaffold_iterations = max(10, iterations // 4)
+    for candidate in TMPFS_CANDIDATES:
+        if candidate.is_dir():
+            benchmarks.update(bench_scaffold(scaffold_iterations, "tmpfs", candidate))
+            break
+    benchmarks.update(bench_scaffold(scaffold_iterations, "disk", disk_dir or Path.cwd()))
+    benchmarks.update(bench_web(iterations))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "benchmarks": benchmarks,
+    }
+
+
+def compare(current: Dict[str, object], baseline: Dict[str, object], threshold: float) -> List[str]:
+    regressions = []
+    base_benchmarks = baseline.get("benchmarks", {})
+    for name, result in current["benchmarks"].items():  # type: ignore[union-attr]
+        previous = base_benchmarks.get(name)  # type: ignore[union-attr]
+        if not previous or not previous.get(GATED_METRIC):
+            continue
+        ratio = result[GATED_METRIC] / previous[GATED_METRIC]
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{name}: {GATED_METRIC} {previous[GATED_METRIC]:.1f} -> {result[GATED_METRIC]:.1f} us (+{(ratio - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def action_bench(
+    iterations: int = 200,
+    output: Optional[Path] = None,
+    baseline: Optional[Path] = None,
+    threshold: float = 0.15,
+    disk_dir: Optional[Path] = None,
+) -> int:
+    report = run_benchmarks(iterations, disk_dir)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output:
+        output.write_text(text + "\n", encoding="utf-8")
+        print(f"Wrote {output}", file=sys.stderr)
+    print(text)
+    if not baseline:
+        return 0
+    regressions = compare(report, json.loads(baseline.read_text(encoding="utf-8")), threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    if not regressions:
+        print(f"No regressions beyond {threshold:.0%} against {baseline}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+__all__ = ["action_bench", "compare", "measure", "percentile", "run_benchmarks"]
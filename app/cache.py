@@ -0,0 +1,78 @@
+"""Content-addressed LRU cache for rendered scaffold archives."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.main import CONFIG_TEMPLATE, MODEL_CFG_TEMPLATE, ScaffoldContext
+
+
+TEMPLATE_DIGEST = hashlib.sha256(
+    (CONFIG_TEMPLATE.template + "\0" + MODEL_CFG_TEMPLATE.template).encode("utf-8")
+).hexdigest()
+
+
+def context_key(ctx: ScaffoldContext) -> str:
+    """Stable hash of the normalized context plus the templates it renders into."""
+    payload = json.dumps({**ctx.to_format_kwargs(), "binarize": ctx.binarize}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{TEMPLATE_DIGEST}\0{payload}".encode("utf-8")).hexdigest()[:32]
+
+
+class ByteLRUCache:
+    """Thread-safe LRU mapping of key -> bytes bounded by total payload size."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: bytes) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+            self._entries[key] = value
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                self.evictions += 1
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+__all__ = ["ByteLRUCache", "TEMPLATE_DIGEST", "context_key"]
@@ -0,0 +1,953 @@
+"""Parser and class-hierarchy index for Arma config syntax (config.cpp, *.hpp)."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+
+class Expression(str):
+    """An unquoted value kept verbatim, e.g. ``db-5`` or ``true``."""
+
+
+Value = Union[str, int, float, Expression, List["Value"]]
+
+
+class ConfigParseError(ValueError):
+    """Raised for syntax errors, with the offending file and line."""
+
+
+@dataclass
+class Token:
+    kind: str
+    text: str
+    line: int
+    source: str
+    space_before: bool = False
+
+
+@dataclass
+class ConfigClass:
+    name: str
+    parent: Optional[str] = None
+    properties: Dict[str, Value] = field(default_factory=dict)
+    classes: Dict[str, "ConfigClass"] = field(default_factory=dict)
+    appends: Set[str] = field(default_factory=set)
+    deletes: List[str] = field(default_factory=list)
+    external: bool = False
+    source: str = ""
+    line: int = 0
+
+    def child(self, name: str) -> Optional["ConfigClass"]:
+        return self.classes.get(name.lower())
+
+    def walk(self, prefix: str = "") -> Iterable[Tuple[str, "ConfigClass"]]:
+        for key, cls in self.classes.items():
+            path = f"{prefix}/{key}" if prefix else key
+            yield path, cls
+            yield from cls.walk(path)
+
+
+@dataclass
+class Macro:
+    params: Optional[List[str]]
+    body: List[Token]
+
+
+@dataclass
+class ParseResult:
+    root: ConfigClass
+    # Every file read while parsing, mapped to its content hash (None when an include was missing).
+    dependencies: Dict[str, Optional[str]] = field(default_factory=dict)
+    missing_includes: List[str] = field(default_factory=list)
+
+
+TOKEN_RE = re.compile(
+    r"""
+    (?P<newline>\n)
+  | (?P<space>[ \t\r\f\v]+|\\\n)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:[^"\n]|"")*"|'(?:[^'\n]|'')*')
+  | (?P<number>0[xX][0-9A-Fa-f]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<concat>\#\#)
+  | (?P<hash>\#)
+  | (?P<punct>\+=|[{}\[\];:=,()+\-*/<>!&|^%.?@$\\~`])
+  | (?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+NUMBER_RE = re.compile(r"[+-]?(?:0[xX][0-9A-Fa-f]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)")
+INCLUDE_RE = re.compile(r'\s*include\s*(?:"([^"]+)"|<([^>]+)>)')
+
+
+def _hash_bytes(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def tokenize(text: str, source: str = "<string>") -> List[Token]:
+    tokens: List[Token] = []
+    line = 1
+    space = False
+    for match in TOKEN_RE.finditer(text):
+        kind = match.lastgroup or "other"
+        value = match.group()
+        if kind == "newline":
+            tokens.append(Token("newline", "\n", line, source))
+            line += 1
+            space = True
+            continue
+        if kind in {"space", "comment"}:
+            line += value.count("\n")
+            space = True
+            continue
+        tokens.append(Token(kind, value, line, source, space))
+        space = False
+    return tokens
+
+
+class Preprocessor:
+    """Token-level preprocessor for ``#include``, ``#define``/``#undef`` and ``#ifdef`` blocks."""
+
+    def __init__(self, include_dirs: Sequence[Path] = (), defines: Optional[Dict[str, str]] = None) -> None:
+        self.include_dirs = [Path(path) for path in include_dirs]
+        self.macros: Dict[str, Macro] = {
+            name: Macro(None, [t for t in tokenize(value) if t.kind != "newline"])
+            for name, value in (defines or {}).items()
+        }
+        self.dependencies: Dict[str, Optional[str]] = {}
+        self.missing_includes: List[str] = []
+
+    def _resolve_include(self, name: str, current: Path) -> Optional[Path]:
+        relative = name.replace("\\", "/").lstrip("/")
+        candidates = [current.parent / relative] + [root / relative for root in self.include_dirs]
+        for candidate in candidates:
+            if candidate.is_file():
+                return candidate
+        return None
+
+    def process_file(self, path: Path) -> List[Token]:
+        data = path.read_bytes()
+        self.dependencies[str(path)] = _hash_bytes(data)
+        return self.process(data.decode("utf-8-sig", errors="replace"), path)
+
+    def process(self, text: str, path: Path) -> List[Token]:
+        output: List[Token] = []
+        lines = self._split_lines(tokenize(text, str(path)))
+        active: List[bool] = []
+        for line_tokens in lines:
+            if line_tokens and line_tokens[0].kind == "hash":
+                self._directive(line_tokens, path, active, output)
+                continue
+            if all(active):
+                output.extend(self._expand(line_tokens, set()))
+        if active:
+            raise ConfigParseError(f"{path}: unterminated #if block")
+        return output
+
+    @staticmethod
+    def _split_lines(tokens: List[Token]) -> List[List[Token]]:
+        lines: List[List[Token]] = [[]]
+        for token in tokens:
+            if token.kind == "newline":
+                lines.append([])
+            else:
+                lines[-1].append(token)
+        return lines
+
+    def _directive(self, tokens: List[Token], path: Path, active: List[bool], output: List[Token]) -> None:
+        if len(tokens) < 2:
+            return
+        name = tokens[1].text
+        if name in {"ifdef", "ifndef"}:
+            defined = len(tokens) > 2 and tokens[2].text in self.macros
+            active.append(defined if name == "ifdef" else not defined)
+            return
+        if name == "else":
+            if not active:
+                raise ConfigParseError(f"{path}:{tokens[0].line}: #else without #if")
+            active[-1] = not active[-1]
+            return
+        if name == "endif":
+            if not active:
+                raise ConfigParseError(f"{path}:{tokens[0].line}: #endif without #if")
+            active.pop()
+            return
+        if not all(active):
+            return
+        if name == "define" and len(tokens) > 2:
+            macro_name = tokens[2].text
+            rest = tokens[3:]
+            params: Optional[List[str]] = None
+            if rest and rest[0].text == "(" and not rest[0].space_before:
+                close = next((i for i, token in enumerate(rest) if token.text == ")"), None)
+                if close is None:
+                    raise ConfigParseError(f"{path}:{tokens[0].line}: unterminated parameter list in #define {macro_name}")
+                params = [token.text for token in rest[1:close] if token.text != ","]
+                rest = rest[close + 1:]
+            self.macros[macro_name] = Macro(params, rest)
+        elif name == "undef" and len(tokens) > 2:
+            self.macros.pop(tokens[2].text, None)
+        elif name == "include":
+            raw = "".join(token.text for token in tokens[2:])
+            match = INCLUDE_RE.match("include " + raw)
+            target_name = (match.group(1) or match.group(2)) if match else raw.strip('"<>')
+            target = self._resolve_include(target_name, path)
+            if target is None:
+                self.missing_includes.append(target_name)
+                self.dependencies.setdefault(str(path.parent / target_name.replace("\\", "/")), None)
+                return
+            output.extend(self.process_file(target))
+
+    def _expand(self, tokens: List[Token], hidden: Set[str]) -> List[Token]:
+        result: List[Token] = []
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            macro = self.macros.get(token.text) if token.kind == "word" and token.text not in hidden else None
+            if macro is None:
+                result.append(token)
+                index += 1
+                continue
+            if macro.params is None:
+                body = macro.body
+                index += 1
+            else:
+                if index + 1 >= len(tokens) or tokens[index + 1].text != "(":
+                    result.append(token)
+                    index += 1
+                    continue
+                args, index = self._collect_args(tokens, index + 1)
+                body = self._substitute(macro, args)
+            expanded = self._expand(self._relocate(body, token), hidden | {token.text})
+            result.extend(expanded)
+        return result
+
+    @staticmethod
+    def _relocate(body: List[Token], site: Token) -> List[Token]:
+        return [
+            Token(t.kind, t.text, site.line, site.source, site.space_before if i == 0 else t.space_before)
+            for i, t in enumerate(body)
+        ]
+
+    @staticmethod
+    def _collect_args(tokens: List[Token], open_index: int) -> Tuple[List[List[Token]], int]:
+        args: List[List[Token]] = [[]]
+        depth = 0
+        index = open_index + 1
+        while index < len(tokens):
+            token = tokens[index]
+            if token.text == "(":
+                depth += 1
+            elif token.text == ")":
+                if depth == 0:
+                    return args, index + 1
+                depth -= 1
+            elif token.text == "," and depth == 0:
+                args.append([])
+                index += 1
+                continue
+            args[-1].append(token)
+            index += 1
+        raise ConfigParseError(f"{tokens[open_index].source}:{tokens[open_index].line}: unterminated macro call")
+
+    @staticmethod
+    def _substitute(macro: Macro, args: List[List[Token]]) -> List[Token]:
+        bindings = dict(zip(macro.params or [], args))
+        output: List[Token] = []
+        body = macro.body
+        index = 0
+        while index < len(body):
+            token = body[index]
+            if token.kind == "hash" and index + 1 < len(body) and body[index + 1].text in bindings:
+                text = "".join(t.text for t in bindings[body[index + 1].text])
+                output.append(Token("string", f'"{text}"', token.line, token.source, token.space_before))
+                index += 2
+                continue
+            if token.kind == "concat":
+                index += 1
+                if output and index < len(body):
+                    right = bindings.get(body[index].text, [body[index]])
+                    left = output.pop()
+                    joined = left.text + "".join(t.text for t in right)
+                    output.append(Token("word", joined, left.line, left.source, left.space_before))
+                    index += 1
+                continue
+            if token.kind == "word" and token.text in bindings:
+                output.extend(bindings[token.text])
+            else:
+                output.append(token)
+            index += 1
+        return output
+
+
+class Parser:
+    def __init__(self, tokens: List[Token]) -> None:
+        self.tokens = tokens
+        self.index = 0
+
+    def _peek(self, offset: int = 0) -> Optional[Token]:
+        position = self.index + offset
+        return self.tokens[position] if position < len(self.tokens) else None
+
+    def _next(self) -> Token:
+        token = self._peek()
+        if token is None:
+            last = self.tokens[-1] if self.tokens else Token("eof", "", 0, "<string>")
+            raise ConfigParseError(f"{last.source}:{last.line}: unexpected end of input")
+        self.index += 1
+        return token
+
+    def _expect(self, text: str) -> Token:
+        token = self._next()
+        if token.text != text:
+            raise ConfigParseError(f"{token.source}:{token.line}: expected '{text}', found '{token.text}'")
+        return token
+
+    def parse(self) -> ConfigClass:
+        root = ConfigClass("")
+        self._body(root, top_level=True)
+        return root
+
+    def _body(self, cls: ConfigClass, top_level: bool = False) -> None:
+        while True:
+            token = self._peek()
+            if token is None:
+                if top_level:
+                    return
+                raise ConfigParseError(f"{cls.source}:{cls.line}: class {cls.name} is not closed")
+            if token.text == "}" and not top_level:
+                self.index += 1
+                return
+            self._statement(cls)
+
+    def _statement(self, cls: ConfigClass) -> None:
+        token = self._next()
+        if token.text == ";":
+            return
+        if token.text == "class":
+            self._class(cls, token)
+            return
+        if token.text == "delete":
+            cls.deletes.append(self._next().text)
+            self._expect(";")
+            return
+        if token.kind != "word":
+            raise ConfigParseError(f"{token.source}:{token.line}: unexpected '{token.text}'")
+        name = token.text
+        following = self._next()
+        if following.text == "[":
+            self._expect("]")
+            operator = self._next()
+            if operator.text not in {"=", "+="}:
+                raise ConfigParseError(f"{operator.source}:{operator.line}: expected '=' or '+=' after {name}[]")
+            cls.properties[name] = self._array()
+            if operator.text == "+=":
+                cls.appends.add(name)
+            self._end_statement()
+            return
+        if following.text != "=":
+            raise ConfigParseError(f"{following.source}:{following.line}: expected '=' after {name}")
+        cls.properties[name] = self._value({";"})
+        self._end_statement()
+
+    def _end_statement(self) -> None:
+        token = self._peek()
+        if token is not None and token.text == ";":
+            self.index += 1
+
+    def _class(self, container: ConfigClass, keyword: Token) -> None:
+        name = self._next().text
+        parent = None
+        token = self._next()
+        if token.text == ":":
+            parent = self._next().text
+            token = self._next()
+        existing = container.classes.get(name.lower())
+        if token.text == ";":
+            if existing is None:
+                container.classes[name.lower()] = ConfigClass(
+                    name, parent, external=True, source=keyword.source, line=keyword.line
+                )
+            return
+        if token.text != "{":
+            raise ConfigParseError(f"{token.source}:{token.line}: expected '{{' or ';' after class {name}")
+        cls = ConfigClass(name, parent, source=keyword.source, line=keyword.line)
+        container.classes[name.lower()] = cls
+        self._body(cls)
+        self._end_statement()
+
+    def _array(self) -> List[Value]:
+        self._expect("{")
+        items: List[Value] = []
+        while True:
+            token = self._peek()
+            if token is None:
+                raise ConfigParseError("unterminated array")
+            if token.text == "}":
+                self.index += 1
+                return items
+            if token.text == ",":
+                self.index += 1
+                continue
+            if token.text == "{":
+                items.append(self._array())
+            else:
+                items.append(self._value({",", "}"}))
+
+    def _value(self, terminators: Set[str]) -> Value:
+        collected: List[Token] = []
+        depth = 0
+        while True:
+            token = self._peek()
+            if token is None:
+                break
+            if depth == 0 and token.text in terminators:
+                break
+            if depth == 0 and token.text == "}" and "}" not in terminators:
+                break
+            if token.text in "([":
+                depth += 1
+            elif token.text in ")]":
+                depth -= 1
+            collected.append(token)
+            self.index += 1
+        if len(collected) == 1 and collected[0].kind == "string":
+            text = collected[0].text
+            quote = text[0]
+            return text[1:-1].replace(quote * 2, quote)
+        raw = "".join((" " if i and t.space_before else "") + t.text for i, t in enumerate(collected))
+        if NUMBER_RE.fullmatch(raw):
+            return _number(raw)
+        return Expression(raw)
+
+
+def _number(raw: str) -> Union[int, float]:
+    sign = -1 if raw.startswith("-") else 1
+    body = raw.lstrip("+-")
+    if body[:2].lower() == "0x":
+        return sign * int(body, 16)
+    if re.fullmatch(r"\d+", body):
+        return sign * int(body)
+    return sign * float(body)
+
+
+def parse_text(text: str, source: str = "<string>", include_dirs: Sequence[Path] = ()) -> ConfigClass:
+    preprocessor = Preprocessor(include_dirs)
+    return Parser(preprocessor.process(text, Path(source))).parse()
+
+
+def parse_file(path: Path, include_dirs: Sequence[Path] = (), defines: Optional[Dict[str, str]] = None) -> ParseResult:
+    preprocessor = Preprocessor(include_dirs, defines)
+    tokens = preprocessor.process_file(Path(path))
+    root = Parser(tokens).parse()
+    return ParseResult(root, preprocessor.dependencies, preprocessor.missing_includes)
+
+
+def _split_path(path: str) -> List[str]:
+    return [part.strip().lower() for part in re.split(r"/|>>", path) if part.strip()]
+
+
+class ConfigIndex:
+    """Merged class tree with precomputed inheritance chains; lookups are dict hits."""
+
+    def __init__(self) -> None:
+        self.root = ConfigClass("")
+        self.classes: Dict[str, ConfigClass] = {}
+        self.by_name: Dict[str, List[str]] = {}
+        self.chains: Dict[str, Tuple[str, ...]] = {}
+        self.unresolved: Dict[str, str] = {}
+        self._flattened: Dict[str, Dict[str, Value]] = {}
+
+    def merge(self, root: ConfigClass) -> None:
+        self._merge_into(self.root, root)
+
+    def _merge_into(self, target: ConfigClass, source: ConfigClass) -> None:
+        target.properties.update(source.properties)
+        target.appends |= source.appends
+        target.deletes.extend(source.deletes)
+        for key in source.deletes:
+            target.classes.pop(key.lower(), None)
+        for key, child in source.classes.items():
+            self._merge_child(target, key, child)
+
+    def _merge_child(self, target: ConfigClass, key: str, child: ConfigClass) -> None:
+        existing = target.classes.get(key)
+        if existing is None or (existing.external and not child.external):
+            existing = ConfigClass(child.name, child.parent, external=child.external, source=child.source, line=child.line)
+            if key in target.classes:
+                existing.classes = target.classes[key].classes
+            target.classes[key] = existing
+        elif child.parent is not None and not child.external:
+            existing.parent = child.parent
+        self._merge_into(existing, child)
+
+    def build(self) -> "ConfigIndex":
+        self.classes = dict(self.root.walk())
+        self.by_name = {}
+        for path in self.classes:
+            self.by_name.setdefault(path.rsplit("/", 1)[-1], []).append(path)
+        self.chains = {}
+        self.unresolved = {}
+        self._flattened = {}
+        for path in self.classes:
+            self._chain(path, set())
+        return self
+
+    def rebuild(self, touched: Sequence[ConfigClass], roots: Sequence[ConfigClass]) -> int:
+        """Update the merged tree after some files changed, without merging every file again.
+
+        ``touched`` holds the parse trees of the changed files (old and new versions), ``roots`` every
+        current file in merge order. Only classes those trees declare are merged again (whole subtrees
+        where a ``delete`` is involved), and only classes whose inheritance could have changed are
+        re-resolved. Returns the number of re-resolved classes.
+        """
+        trie: Dict[str, list] = {}
+        for tree in touched:
+            _mark_touched(trie, tree)
+        self.root.properties, self.root.appends = {}, set()
+        for root in roots:
+            self.root.properties.update(root.properties)
+            self.root.appends |= root.appends
+        removed: Set[str] = set()
+        added: Dict[str, ConfigClass] = {}
+        relink: Set[str] = set()
+        edited: Set[str] = set()
+        self._remerge(self.root, "", list(roots), trie, removed, added, relink, edited)
+        appeared = {path for path in added if path not in self.classes}
+        for path in removed - set(added):
+            del self.classes[path]
+        self.classes.update(added)
+        self.by_name = {}
+        for path in self.classes:
+            self.by_name.setdefault(path.rsplit("/", 1)[-1], []).append(path)
+
+        # A chain is stale when it runs through a re-linked class, when its class is nested in one with
+        # a stale chain (parents are looked up through enclosing scopes), or when a class appeared or
+        # disappeared under its parent's name. Property edits only invalidate flattened properties.
+        heirs: Dict[str, List[str]] = {}
+        for path, chain in self.chains.items():
+            if len(chain) > 1:
+                heirs.setdefault(chain[1], []).append(path)
+        names = {path.rsplit("/", 1)[-1] for path in appeared | (removed - set(added))}
+        pending = list(relink | removed)
+        if names:
+            pending += [path for path, cls in self.classes.items() if cls.parent and cls.parent.lower() in names]
+        stale = _closure(pending, heirs, self.classes, nested=True)
+        for path in stale:
+            self.chains.pop(path, None)
+            self.unresolved.pop(path, None)
+        for path in stale | _closure(list(edited), heirs, self.classes, nested=False):
+            self._flattened.pop(path, None)
+        for path in stale:
+            if path in self.classes:
+                self._chain(path, set())
+        return len(stale)
+
+    def _remerge(
+        self,
+        target: ConfigClass,
+        prefix: str,
+        sources: List[ConfigClass],
+        trie: Dict[str, list],
+        removed: Set[str],
+        added: Dict[str, ConfigClass],
+        relink: Set[str],
+        edited: Set[str],
+    ) -> None:
+        """Replay ``merge`` for the children of ``target`` named in ``trie``; ``sources`` are the
+        declarations of ``target`` since it was last deleted, in merge order."""
+        for key, (subtrie, full) in trie.items():
+            path = f"{prefix}/{key}" if prefix else key
+            old = target.classes.get(key)
+            state: Optional[ConfigClass] = None
+            declared: List[ConfigClass] = []
+            for source in sources:
+                if any(name.lower() == key for name in source.deletes):
+                    state, declared = None, []
+                child = source.classes.get(key)
+                if child is None:
+                    continue
+                if state is None or (state.external and not child.external):
+                    state = ConfigClass(child.name, child.parent, external=child.external, source=child.source, line=child.line)
+                elif child.parent is not None and not child.external:
+                    state.parent = child.parent
+                state.properties.update(child.properties)
+                state.appends |= child.appends
+                state.deletes.extend(child.deletes)
+                declared.append(child)
+            if old is not None and (state is None or full):
+                removed.add(path)
+                removed.update(item for item, _ in old.walk(path))
+            if state is None:
+                target.classes.pop(key, None)
+                continue
+            target.classes[key] = state
+            added[path] = state
+            if full or old is None:
+                for source in declared:
+                    for name in source.deletes:
+                        state.classes.pop(name.lower(), None)
+                    for child_key, child in source.classes.items():
+                        self._merge_child(state, child_key, child)
+                added.update(state.walk(path))
+                relink.add(path)
+                relink.update(item for item, _ in state.walk(path))
+            else:
+                if state.parent != old.parent:
+                    relink.add(path)
+                elif state.properties != old.properties:
+                    edited.add(path)
+                # Children no changed file mentions merge exactly as before; keep them.
+                state.classes = old.classes
+                self._remerge(state, path, declared, subtrie, removed, added, relink, edited)
+
+    def _scope_chain(self, scope: str, visiting: Set[str]) -> Tuple[str, ...]:
+        return self._chain(scope, visiting) if scope else ("",)
+
+    def _resolve_parent(self, path: str, visiting: Set[str]) -> Optional[str]:
+        cls = self.classes[path]
+        if not cls.parent:
+            return None
+        base = cls.parent.lower()
+        scope = path.rsplit("/", 1)[0] if "/" in path else ""
+        while True:
+            for holder in self._scope_chain(scope, visiting):
+                candidate = f"{holder}/{base}" if holder else base
+                if candidate != path and candidate in self.classes:
+                    return candidate
+            if not scope:
+                return None
+            scope = scope.rsplit("/", 1)[0] if "/" in scope else ""
+
+    def _chain(self, path: str, visiting: Set[str]) -> Tuple[str, ...]:
+        cached = self.chains.get(path)
+        if cached is not None:
+            return cached
+        if path in visiting:
+            return (path,)
+        visiting.add(path)
+        parent = self._resolve_parent(path, visiting)
+        if parent is None:
+            chain: Tuple[str, ...] = (path,)
+            cls = self.classes[path]
+            if cls.parent:
+                self.unresolved[path] = cls.parent
+        else:
+            chain = (path,) + self._chain(parent, visiting)
+        visiting.discard(path)
+        self.chains[path] = chain
+        return chain
+
+    def get(self, path: str) -> Optional[ConfigClass]:
+        return self.classes.get("/".join(_split_path(path)))
+
+    def chain(self, path: str) -> List[ConfigClass]:
+        return [self.classes[item] for item in self.chains.get("/".join(_split_path(path)), ())]
+
+    def find(self, name: str) -> List[str]:
+        return self.by_name.get(name.lower(), [])
+
+    def properties(self, path: str) -> Dict[str, Value]:
+        """Effective properties (inherited ones included), keyed by lower-cased name."""
+        key = "/".join(_split_path(path))
+        cached = self._flattened.get(key)
+        if cached is None:
+            cached = {}
+            for item in reversed(self.chains.get(key, ())):
+                cached.update((name.lower(), value) for name, value in self.classes[item].properties.items())
+            self._flattened[key] = cached
+        return cached
+
+    def property(self, path: str, name: str) -> Optional[Value]:
+        return self.properties(path).get(name.lower())
+
+    def subclasses(self, path: str) -> List[str]:
+        key = "/".join(_split_path(path))
+        return [item for item, chain in self.chains.items() if key in chain[1:]]
+
+
+def _value_to_json(value: Value) -> object:
+    if isinstance(value, list):
+        return [_value_to_json(item) for item in value]
+    if isinstance(value, Expression):
+        return {"expr": str(value)}
+    return value
+
+
+def _value_from_json(value: object) -> Value:
+    if isinstance(value, list):
+        return [_value_from_json(item) for item in value]
+    if isinstance(value, dict):
+        return Expression(value["expr"])
+    if isinstance(value, (str, int, float)):
+        return value
+    raise ValueError(f"unexpected cached value {value!r}")
+
+
+def _class_to_json(cls: ConfigClass) -> Dict[str, object]:
+    return {
+        "name": cls.name,
+        "parent": cls.parent,
+        "properties": {name: _value_to_json(value) for name, value in cls.properties.items()},
+        "classes": {key: _class_to_json(child) for key, child in cls.classes.items()},
+        "appends": sorted(cls.appends),
+        "deletes": cls.deletes,
+        "external": cls.external,
+        "source": cls.source,
+        "line": cls.line,
+    }
+
+
+def _class_from_json(data: Dict[str, object]) -> ConfigClass:
+    return ConfigClass(
+        str(data["name"]),
+        data["parent"],  # type: ignore[arg-type]
+        {str(name): _value_from_json(value) for name, value in data["properties"].items()},  # type: ignore[union-attr]
+        {str(key): _class_from_json(child) for key, child in data["classes"].items()},  # type: ignore[union-attr]
+        set(data["appends"]),  # type: ignore[arg-type]
+        list(data["deletes"]),  # type: ignore[arg-type]
+        bool(data["external"]),
+        str(data["source"]),
+        int(data["line"]),  # type: ignore[arg-type]
+    )
+
+
+def _closure(pending: List[str], heirs: Dict[str, List[str]], classes: Dict[str, ConfigClass], nested: bool) -> Set[str]:
+    """``pending`` plus every class inheriting from (and, with ``nested``, declared inside) one of them."""
+    found: Set[str] = set()
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.add(path)
+        pending += heirs.get(path, ())
+        cls = classes.get(path)
+        if nested and cls is not None:
+            pending += [f"{path}/{key}" for key in cls.classes]
+    return found
+
+
+def _mark_touched(trie: Dict[str, list], cls: ConfigClass) -> None:
+    """Record every class path ``cls`` declares; deleted names need their whole subtree merged again."""
+    for name in cls.deletes:
+        trie.setdefault(name.lower(), [{}, False])[1] = True
+    for key, child in cls.classes.items():
+        _mark_touched(trie.setdefault(key, [{}, False])[0], child)
+
+
+@dataclass
+class FileRecord:
+    result: ParseResult
+    stats: Dict[str, Tuple[int, int]]
+
+    def to_json(self) -> Dict[str, object]:
+        return {
+            "root": _class_to_json(self.result.root),
+            "dependencies": self.result.dependencies,
+            "missing_includes": self.result.missing_includes,
+            "stats": self.stats,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, object]) -> "FileRecord":
+        result = ParseResult(
+            _class_from_json(data["root"]),  # type: ignore[arg-type]
+            dict(data["dependencies"]),  # type: ignore[call-overload]
+            list(data["missing_includes"]),  # type: ignore[call-overload]
+        )
+        return cls(result, {name: (int(pair[0]), int(pair[1])) for name, pair in data["stats"].items()})  # type: ignore[union-attr]
+
+    def is_fresh(self) -> bool:
+        for dependency, digest in self.result.dependencies.items():
+            path = Path(dependency)
+            try:
+                stat = path.stat()
+            except OSError:
+                if digest is None:
+                    continue
+                return False
+            if digest is None:
+                return False
+            if self.stats.get(dependency) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            if _hash_bytes(path.read_bytes()) != digest:
+                return False
+            self.stats[dependency] = (stat.st_mtime_ns, stat.st_size)
+        return True
+
+
+def _stat_pair(path: str) -> Tuple[int, int]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return (0, -1)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class ConfigIndexer:
+    """Indexes a mod tree, re-parsing only configs whose content (or includes) changed.
+
+    The merged index is kept (in memory and in the cache) and updated in place: only the classes
+    declared by changed, added or removed files are merged again. The cache is plain JSON, so
+    loading a cache file never executes anything it contains.
+    """
+
+    CACHE_VERSION = 2
+
+    def __init__(self, include_dirs: Sequence[Path] = (), cache_path: Optional[Path] = None) -> None:
+        self.include_dirs = list(include_dirs)
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.records: Dict[str, FileRecord] = {}
+        self.files: List[str] = []
+        self.merged: Optional[ConfigIndex] = None
+        self.stats = {"parsed": 0, "reused": 0, "relinked": 0, "seconds": 0.0}
+        if self.cache_path and self.cache_path.is_file():
+            try:
+                self._load()
+            except (OSError, ValueError, KeyError, TypeError, AttributeError, IndexError):
+                self.records, self.files, self.merged = {}, [], None
+
+    def _load(self) -> None:
+        assert self.cache_path is not None
+        data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        if not isinstance(data, dict) or data.get("version") != self.CACHE_VERSION:
+            return
+        self.records = {name: FileRecord.from_json(record) for name, record in data["records"].items()}
+        self.files = [name for name in data["files"] if name in self.records]
+        merged = data.get("index")
+        if merged is not None and len(self.files) == len(data["files"]):
+            index = ConfigIndex()
+            index.root = _class_from_json(merged["root"])
+            index.classes = dict(index.root.walk())
+            for path in index.classes:
+                index.by_name.setdefault(path.rsplit("/", 1)[-1], []).append(path)
+            index.chains = {path: tuple(chain) for path, chain in merged["chains"].items()}
+            index.unresolved = dict(merged["unresolved"])
+            self.merged = index
+
+    @staticmethod
+    def discover(paths: Sequence[Path]) -> List[Path]:
+        found: List[Path] = []
+        for path in paths:
+            path = Path(path)
+            if path.is_dir():
+                found.extend(sorted(path.rglob("config.cpp")))
+            elif path.is_file():
+                found.append(path)
+        return found
+
+    def index(self, paths: Sequence[Path]) -> ConfigIndex:
+        started = time.perf_counter()
+        parsed = reused = 0
+        files = [str(path) for path in self.discover(paths)]
+        touched: List[ConfigClass] = []
+        changed = False
+        for name in files:
+            record = self.records.get(name)
+            if record is not None and record.is_fresh():
+                reused += 1
+                continue
+            result = parse_file(Path(name), self.include_dirs)
+            if record is not None:
+                touched.append(record.result.root)
+            touched.append(result.root)
+            self.records[name] = FileRecord(result, {dep: _stat_pair(dep) for dep in result.dependencies})
+            parsed += 1
+            changed = True
+        for stale in set(self.records) - set(files):
+            touched.append(self.records.pop(stale).result.root)
+            changed = True
+
+        kept = set(files) & set(self.files)
+        same_order = [name for name in files if name in kept] == [name for name in self.files if name in kept]
+        index = self.merged
+        if index is None or not same_order:
+            index = ConfigIndex()
+            for name in files:
+                index.merge(self.records[name].result.root)
+            index.build()
+            relinked = len(index.classes)
+        elif changed:
+            relinked = index.rebuild(touched, [self.records[name].result.root for name in files])
+        else:
+            relinked = 0
+        self.files, self.merged = files, index
+        self.stats = {"parsed": parsed, "reused": reused, "relinked": relinked, "seconds": time.perf_counter() - started}
+        if self.cache_path and (changed or relinked):
+            self.save()
+        return index
+
+    def save(self) -> None:
+        if not self.cache_path:
+            return
+        data: Dict[str, object] = {
+            "version": self.CACHE_VERSION,
+            "files": self.files,
+            "records": {name: record.to_json() for name, record in self.records.items()},
+        }
+        if self.merged is not None:
+            data["index"] = {
+                "root": _class_to_json(self.merged.root),
+                "chains": {path: list(chain) for path, chain in self.merged.chains.items()},
+                "unresolved": self.merged.unresolved,
+            }
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        partial.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+        os.replace(partial, self.cache_path)
+
+
+def _format_value(value: Value) -> str:
+    if isinstance(value, list):
+        return "{" + ", ".join(_format_value(item) for item in value) + "}"
+    if isinstance(value, Expression):
+        return str(value)
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return repr(value)
+
+
+def action_config(paths: Sequence[Path], lookup: Optional[str] = None, cache_path: Optional[Path] = None) -> None:
+    indexer = ConfigIndexer(cache_path=cache_path)
+    index = indexer.index(paths)
+    print(
+        f"Indexed {len(index.classes)} classes from {indexer.stats['parsed'] + indexer.stats['reused']} files "
+        f"(parsed {indexer.stats['parsed']}, reused {indexer.stats['reused']}, "
+        f"re-linked {indexer.stats['relinked']} classes) in {indexer.stats['seconds'] * 1000:.1f} ms"
+    )
+    if not lookup:
+        return
+    matches = [lookup] if index.get(lookup) else index.find(lookup)
+    if not matches:
+        print(f"No class matches '{lookup}'.")
+        return
+    for path in matches:
+        key = "/".join(_split_path(path))
+        chain = index.chains.get(key, ())
+        names = " : ".join(index.classes[item].name for item in chain)
+        external = index.unresolved.get(chain[-1]) if chain else None
+        print(f"\n{path}: {names}" + (f" : {external} (not in index)" if external else ""))
+        for name, value in index.properties(key).items():
+            print(f"  {name} = {_format_value(value)}")
+
+
+__all__ = [
+    "ConfigClass",
+    "ConfigIndex",
+    "ConfigIndexer",
+    "ConfigParseError",
+    "Expression",
+    "ParseResult",
+    "Preprocessor",
+    "action_config",
+    "parse_file",
+    "parse_text",
+    "tokenize",
+]
@@ -0,0 +1,270 @@
+"""Offline classname index (RHS or any addon set) with memory-mapped prefix search."""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.cfgparse import ConfigClass, ConfigIndex, ConfigParseError, parse_file, parse_text
+from app.main import ScaffoldContext
+from app.pbo import MIME_STORED, PboError, parse_archive
+from app.rapify import RapifyError, derapify
+
+MAGIC = b"CLSIDX1\0"
+COUNT = struct.Struct("<I")
+OFFSET = struct.Struct("<I")
+
+KIND_PATCH = "patch"
+KIND_MAGAZINE = "magazine"
+KIND_MAGAZINE_WELL = "magazine_well"
+KIND_SLOT = "slot"
+KIND_WEAPON = "weapon"
+KINDS = [KIND_PATCH, KIND_MAGAZINE, KIND_MAGAZINE_WELL, KIND_SLOT, KIND_WEAPON]
+KIND_CODES = {kind: index for index, kind in enumerate(KINDS)}
+
+ROOT_SECTIONS = {
+    "cfgpatches": KIND_PATCH,
+    "cfgmagazines": KIND_MAGAZINE,
+    "cfgmagazinewells": KIND_MAGAZINE_WELL,
+    "cfgweapons": KIND_WEAPON,
+}
+SLOT_BASES = {"slotinfo", "muzzleslot", "cowsslot", "pointerslot", "underbarrelslot"}
+# Base-game patches are always present, so the validator does not require them in the index.
+BUILTIN_PATCH_PREFIXES = ("a3_",)
+
+
+class ClassnameIndexError(ValueError):
+    """Raised when a file is not a readable classname index."""
+
+
+def _classify(root: ConfigClass) -> Iterable[Tuple[str, str]]:
+    index = ConfigIndex()
+    index.merge(root)
+    index.build()
+    for key, kind in ROOT_SECTIONS.items():
+        section = root.child(key)
+        if section is None:
+            continue
+        for cls in section.classes.values():
+            if not cls.external:
+                yield cls.name, kind
+    for path, cls in root.classes.items():
+        if cls.external or path in ROOT_SECTIONS:
+            continue
+        chain = index.chains.get(path, (path,))
+        bases = {item.rsplit("/", 1)[-1] for item in chain}
+        if index.unresolved.get(chain[-1]):
+            bases.add(index.unresolved[chain[-1]].lower())
+        if path not in SLOT_BASES and bases & SLOT_BASES:
+            yield cls.name, KIND_SLOT
+
+
+CONFIG_NAMES = {"config.cpp", "config.bin"}
+
+
+def _configs_in_pbo(path: Path) -> List[ConfigClass]:
+    """Parse every ``config.cpp`` and binarized ``config.bin`` in a PBO (installed mods ship the latter)."""
+    roots = []
+    with path.open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        archive = parse_archive(view, path)
+        for entry in archive.entries:
+            basename = entry.name.lower().rsplit("\\", 1)[-1]
+            if basename not in CONFIG_NAMES:
+                continue
+            if entry.method != MIME_STORED:
+                raise PboError(f"{entry.name}: compressed PBO entries are not supported")
+            data = view[entry.offset:entry.offset + entry.data_size]
+            if basename == "config.bin":
+                roots.append(derapify(data))
+            else:
+                roots.append(parse_text(data.decode("utf-8-sig", errors="replace"), f"{path}:{entry.name}"))
+    return roots
+
+
+def collect_classnames(sources: Sequence[Path]) -> Tuple[Dict[Tuple[str, str], None], List[str]]:
+    """Classnames found in ``sources`` and one line per file that could not be read or parsed."""
+    found: Dict[Tuple[str, str], None] = {}
+    problems: List[str] = []
+    for source in sources:
+        source = Path(source)
+        if not source.exists():
+            problems.append(f"{source}: no such file or directory")
+            continue
+        files = [source] if source.is_file() else sorted(
+            p for p in source.rglob("*") if p.suffix.lower() == ".pbo" or p.name.lower() in CONFIG_NAMES
+        )
+        for path in files:
+            try:
+                if path.suffix.lower() == ".pbo":
+                    # Data-only PBOs (models, textures, sounds) have no config; they just add nothing.
+                    roots = _configs_in_pbo(path)
+                elif path.suffix.lower() == ".bin":
+                    roots = [derapify(path.read_bytes())]
+                else:
+                    roots = [parse_file(path).root]
+            except (ConfigParseError, RapifyError, PboError, OSError) as exc:
+                problems.append(f"{path}: {exc}")
+                continue
+            for root in roots:
+                for name, kind in _classify(root):
+                    found[(name, kind)] = None
+    return found, problems
+
+
+def write_index(entries: Iterable[Tuple[str, str]], output: Path) -> int:
+    records = sorted(set(entries), key=lambda item: (item[0].lower(), item[0], item[1]))
+    blob = bytearray()
+    offsets = [0]
+    for name, kind in records:
+        blob += bytes([KIND_CODES[kind]]) + name.encode("utf-8")
+        offsets.append(len(blob))
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("wb") as handle:
+        handle.write(MAGIC + COUNT.pack(len(records)))
+        handle.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        handle.write(blob)
+    return len(records)
+
+
+class ClassnameIndex:
+    """Read-only view of an index file; records are sorted case-insensitively for bisection."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._handle = self.path.open("rb")
+        # mmap refuses empty files, so anything shorter than the header is rejected before mapping.
+        if os.fstat(self._handle.fileno()).st_size < len(MAGIC) + COUNT.size:
+            self._handle.close()
+            raise ClassnameIndexError(f"{path} is not a classname index")
+        self._view = mmap.mmap(self._handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._view[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ClassnameIndexError(f"{path} is not a classname index")
+        (self.count,) = COUNT.unpack_from(self._view, len(MAGIC))
+        self._offsets_at = len(MAGIC) + COUNT.size
+        self._blob_at = self._offsets_at + OFFSET.size * (self.count + 1)
+        if self._blob_at > len(self._view):
+            self.close()
+            raise ClassnameIndexError(f"{path} is truncated: {self.count} records do not fit")
+
+    def close(self) -> None:
+        self._view.close()
+        self._handle.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _record(self, index: int) -> Tuple[str, str]:
+        start, end = struct.unpack_from("<2I", self._view, self._offsets_at + OFFSET.size * index)
+        raw = self._view[self._blob_at + start:self._blob_at + end]
+        return raw[1:].decode("utf-8"), KINDS[raw[0]]
+
+    def _lower_bound(self, key: str) -> int:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._record(middle)[0].lower() < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def complete(self, prefix: str, kind: Optional[str] = None, limit: int = 20) -> List[Tuple[str, str]]:
+        key = prefix.lower()
+        results: List[Tuple[str, str]] = []
+        index = self._lower_bound(key)
+        while index < self.count and len(results) < limit:
+            name, record_kind = self._record(index)
+            if not name.lower().startswith(key):
+                break
+            if kind is None or record_kind == kind:
+                results.append((name, record_kind))
+            index += 1
+        return results
+
+    def contains(self, name: str, kind: Optional[str] = None) -> bool:
+        key = name.lower()
+        index = self._lower_bound(key)
+        while index < self.count:
+            record_name, record_kind = self._record(index)
+            if record_name.lower() != key:
+                return False
+            if kind is None or record_kind == kind:
+                return True
+            index += 1
+        return False
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def validate_context(ctx: ScaffoldContext, index: ClassnameIndex) -> List[str]:
+    problems: List[str] = []
+    for name in _split(ctx.magazines):
+        if not index.contains(name, KIND_MAGAZINE):
+            problems.append(f"Unknown magazine '{name}'{_suggest(index, name, KIND_MAGAZINE)}")
+    for name in _split(ctx.magazine_wells):
+        if not index.contains(name, KIND_MAGAZINE_WELL):
+            problems.append(f"Unknown magazine well '{name}'{_suggest(index, name, KIND_MAGAZINE_WELL)}")
+    for name in ctx.required_addons:
+        if name.lower().startswith(BUILTIN_PATCH_PREFIXES):
+            continue
+        if not index.contains(name, KIND_PATCH):
+            problems.append(f"Unknown required addon '{name}'{_suggest(index, name, KIND_PATCH)}")
+    return problems
+
+
+def _suggest(index: ClassnameIndex, name: str, kind: str) -> str:
+    for cut in range(len(name), 2, -1):
+        matches = index.complete(name[:cut], kind, limit=3)
+        if matches:
+            return " (did you mean " + ", ".join(match for match, _ in matches) + "?)"
+    return ""
+
+
+def action_classnames_build(sources: Sequence[Path], output: Path) -> int:
+    """Build the index; returns the number of unreadable sources, or 1 when nothing at all was indexed."""
+    started = time.perf_counter()
+    found, problems = collect_classnames(sources)
+    for problem in problems:
+        print(f"Skipped {problem}")
+    if not found:
+        print(f"No classnames found in {', '.join(str(source) for source in sources)}; {output} not written")
+        return max(len(problems), 1)
+    count = write_index(found, output)
+    by_kind: Dict[str, int] = {}
+    for _, kind in found:
+        by_kind[kind] = by_kind.get(kind, 0) + 1
+    summary = ", ".join(f"{by_kind.get(kind, 0)} {kind}" for kind in KINDS)
+    print(f"Wrote {count} classnames ({summary}) to {output} in {time.perf_counter() - started:.2f}s")
+    return len(problems)
+
+
+def action_classnames_search(index_path: Path, prefix: str, kind: Optional[str] = None, limit: int = 20) -> None:
+    index = ClassnameIndex(index_path)
+    try:
+        started = time.perf_counter()
+        results = index.complete(prefix, kind, limit)
+        elapsed = (time.perf_counter() - started) * 1000
+        for name, record_kind in results:
+            print(f"{record_kind:<14} {name}")
+        print(f"{len(results)} matches in {elapsed:.3f} ms ({len(index)} classnames indexed)")
+    finally:
+        index.close()
+
+
+__all__ = [
+    "ClassnameIndex",
+    "ClassnameIndexError",
+    "KINDS",
+    "action_classnames_build",
+    "action_classnames_search",
+    "collect_classnames",
+    "validate_context",
+    "write_index",
+]
@@ -0,0 +1,442 @@
+"""Delta update bundles between two mod builds, using rsync-style rolling block checksums.
+
+``diff`` indexes both trees in parallel by per-file SHA-256. For each changed file it lays block signatures
+(a weak rolling checksum plus BLAKE2b) over the old copy and slides the weak checksum across the new copy to
+find blocks that can be copied instead of shipped. A bundle is a small JSON header followed by one
+zlib-compressed op stream per changed file. ``apply`` replays it against the old build and verifies every
+rebuilt file's hash before anything is replaced.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"ARMADELTA\x01"
+HEADER_LENGTH = struct.Struct("<I")
+DEFAULT_BLOCK_SIZE = 16 * 1024
+# New-file offsets whose weak checksums are computed at once; bounds the NumPy scratch memory.
+SCAN_WINDOW = 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+OP_COPY = 0x43  # "C": old offset (u64), length (u32)
+OP_LITERAL = 0x4C  # "L": length (u32), then the bytes
+COPY = struct.Struct("<QI")
+LITERAL = struct.Struct("<I")
+
+
+class DeltaError(ValueError):
+    """Raised for malformed bundles or old builds that do not match the bundle's base."""
+
+
+@dataclass
+class FileIndex:
+    path: str
+    size: int
+    sha256: str
+
+
+@dataclass
+class DeltaEntry:
+    path: str
+    action: str  # "keep", "copy" (from another old path), "delta" (against the old path) or "add"
+    size: int
+    sha256: str
+    source: str = ""
+    base_sha256: str = ""
+    ops_size: int = 0
+    copied: int = 0
+
+
+@dataclass
+class DiffResult:
+    output: Path
+    entries: List[DeltaEntry]
+    deleted: List[str]
+    patch_bytes: int
+    full_bytes: int
+    seconds: float
+
+    def count(self, action: str) -> int:
+        return sum(entry.action == action for entry in self.entries)
+
+
+@contextmanager
+def _mapped(path: Path) -> Iterator[bytes | mmap.mmap]:
+    """Read-only view of a file; large models and PBOs are paged in by the OS instead of read whole."""
+    with path.open("rb") as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            yield view
+
+
+def list_files(root: Path) -> List[str]:
+    return sorted(path.relative_to(root).as_posix() for path in root.rglob("*") if path.is_file())
+
+
+def index_file(root: Path, relative: str) -> FileIndex:
+    path = root / relative
+    digest = hashlib.sha256()
+    with _mapped(path) as view:
+        for start in range(0, len(view), CHUNK_SIZE):
+            digest.update(view[start:start + CHUNK_SIZE])
+        size = len(view)
+    return FileIndex(relative, size, digest.hexdigest())
+
+
+def weak_checksums(data: np.ndarray, block: int) -> np.ndarray:
+    """rsync's weak checksum for every ``block``-byte window of ``data``, via prefix sums.
+
+    ``a`` is the byte sum and ``b`` the position-weighted sum, both mod 2**16. uint64 arithmetic wraps
+    mod 2**64, which keeps the low 16 bits exact."""
+    positions = np.arange(len(data), dtype=np.uint64)
+    sums = np.zeros(len(data) + 1, dtype=np.uint64)
+    np.cumsum(data, dtype=np.uint64, out=sums[1:])
+    weighted = np.zeros(len(data) + 1, dtype=np.uint64)
+    np.cumsum(np.multiply(data, positions, dtype=np.uint64), out=weighted[1:])
+    starts = positions[:len(data) - block + 1]
+    a = sums[block:] - sums[:-block]
+    b = (starts + np.uint64(block)) * a - (weighted[block:] - weighted[:-block])
+    return ((a & np.uint64(0xFFFF)) | ((b & np.uint64(0xFFFF)) << np.uint64(16))).astype(np.uint32)
+
+
+def _strong(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def block_signatures(view: bytes | mmap.mmap, block: int) -> Dict[int, List[Tuple[int, bytes]]]:
+    """Weak checksum -> ``(offset, strong hash)`` for every whole block of the old file."""
+    signatures: Dict[int, List[Tuple[int, bytes]]] = {}
+    whole = len(view) - len(view) % block
+    step = max(SCAN_WINDOW // block, 1) * block
+    for start in range(0, whole, step):
+        stop = min(start + step, whole)
+        blocks = np.frombuffer(view, dtype=np.uint8, count=stop - start, offset=start).reshape(-1, block)
+        a = blocks.sum(axis=1, dtype=np.uint64)
+        b = (blocks.astype(np.uint64) * np.arange(block, 0, -1, dtype=np.uint64)).sum(axis=1, dtype=np.uint64)
+        weak = ((a & np.uint64(0xFFFF)) | ((b & np.uint64(0xFFFF)) << np.uint64(16))).astype(np.uint32)
+        del blocks
+        for index, value in enumerate(weak.tolist()):
+            offset = start + index * block
+            signatures.setdefault(value, []).append((offset, _strong(view[offset:offset + block])))
+    return signatures
+
+
+class _OpWriter:
+    """Compresses ops into ``handle``, merging adjacent copies and splitting literals into bounded chunks."""
+
+    def __init__(self, handle: BinaryIO) -> None:
+        self.handle = handle
+        self.compressor = zlib.compressobj(6)
+        self.copy: Optional[List[int]] = None
+        self.copied = 0
+
+    def _emit(self, data: bytes) -> None:
+        self.handle.write(self.compressor.compress(data))
+
+    def _flush_copy(self) -> None:
+        if self.copy is not None:
+            self._emit(bytes([OP_COPY]) + COPY.pack(*self.copy))
+            self.copy = None
+
+    def copy_from(self, offset: int, length: int) -> None:
+        self.copied += length
+        if self.copy is not None and self.copy[0] + self.copy[1] == offset and self.copy[1] + length < 1 << 32:
+            self.copy[1] += length
+            return
+        self._flush_copy()
+        self.copy = [offset, length]
+
+    def literal(self, view: bytes | mmap.mmap, start: int, stop: int) -> None:
+        if start >= stop:
+            return
+        self._flush_copy()
+        for begin in range(start, stop, CHUNK_SIZE):
+            end = min(begin + CHUNK_SIZE, stop)
+            self._emit(bytes([OP_LITERAL]) + LITERAL.pack(end - begin))
+            self._emit(view[begin:end])
+
+    def close(self) -> None:
+        self._flush_copy()
+        self.handle.write(self.compressor.flush())
+
+
+def write_ops(old: Optional[Path], new: Path, ops_path: Path, block: int) -> Tuple[int, int]:
+    """Write the compressed op stream rebuilding ``new`` from ``old``; returns ``(ops bytes, copied bytes)``."""
+    with ops_path.open("wb") as handle, _mapped(new) as target, (_mapped(old) if old else nullcontext(b"")) as base:
+        writer = _OpWriter(handle)
+        signatures = block_signatures(base, block) if len(target) >= block else {}
+        consumed = 0
+        if signatures:
+            # Bitmap over the low 24 bits of every old weak checksum: a cheap prefilter before the dict lookup.
+            known = np.zeros(1 << 24, dtype=bool)
+            known[np.fromiter(signatures, dtype=np.uint32, count=len(signatures)) & 0xFFFFFF] = True
+            last = len(target) - block + 1
+            for start in range(0, last, SCAN_WINDOW):
+                stop = min(start + SCAN_WINDOW, last)
+                if stop <= consumed:
+                    continue
+                window = np.frombuffer(target, dtype=np.uint8, count=stop - start + block - 1, offset=start)
+                weak = weak_checksums(window, block)
+                del window  # a live view into the map would stop it from closing
+                candidates = np.flatnonzero(known[weak & 0xFFFFFF])
+                index = int(np.searchsorted(candidates, max(consumed - start, 0)))
+                while index < len(candidates):
+                    position = start + int(candidates[index])
+                    blocks = signatures.get(int(weak[position - start]))
+                    match = None
+                    if blocks is not None:
+                        strong = _strong(target[position:position + block])
+                        match = next((offset for offset, digest in blocks if digest == strong), None)
+                    if match is None:
+                        index += 1
+                        continue
+                    writer.literal(target, consumed, position)
+                    writer.copy_from(match, block)
+                    consumed = position + block
+                    # Windows overlapping the copied block cannot start a match; jump past them.
+                    index = int(np.searchsorted(candidates, consumed - start))
+        writer.literal(target, consumed, len(target))
+        writer.close()
+        copied = writer.copied
+    return ops_path.stat().st_size, copied
+
+
+class _OpReader:
+    """Reads exactly-sized pieces out of one zlib-compressed op stream of ``size`` bytes."""
+
+    def __init__(self, handle: BinaryIO, size: int) -> None:
+        self.handle = handle
+        self.remaining = size
+        self.decompressor = zlib.decompressobj()
+        self.buffer = bytearray()
+
+    def read(self, count: int) -> bytes:
+        while len(self.buffer) < count and self.remaining:
+            chunk = self.handle.read(min(CHUNK_SIZE, self.remaining))
+            if not chunk:
+                raise DeltaError("Bundle is truncated")
+            self.remaining -= len(chunk)
+            try:
+                self.buffer += self.decompressor.decompress(chunk)
+            except zlib.error as exc:
+                raise DeltaError(f"Bundle op stream is corrupt: {exc}") from None
+        data = bytes(self.buffer[:count])
+        del self.buffer[:count]
+        return data
+
+    def read_exact(self, count: int) -> bytes:
+        data = self.read(count)
+        if len(data) != count:
+            raise DeltaError("Bundle op stream is truncated")
+        return data
+
+
+def _iter_ops(handle: BinaryIO, size: int) -> Iterator[Tuple[int, int, int, bytes]]:
+    """Yield ``(op, old offset, length, literal bytes)`` for one file's op stream."""
+    reader = _OpReader(handle, size)
+    while tag := reader.read(1):
+        if tag[0] == OP_COPY:
+            offset, length = COPY.unpack(reader.read_exact(COPY.size))
+            yield OP_COPY, offset, length, b""
+        elif tag[0] == OP_LITERAL:
+            (length,) = LITERAL.unpack(reader.read_exact(LITERAL.size))
+            yield OP_LITERAL, 0, length, reader.read_exact(length)
+        else:
+            raise DeltaError(f"Unknown delta op 0x{tag[0]:02x}")
+
+
+def _map(pool: Optional[Executor], function, *iterables) -> List:
+    if pool is None:
+        return list(map(function, *iterables))
+    return list(pool.map(function, *iterables))
+
+
+def _write_ops_task(args: Tuple[Optional[Path], Path, Path, int]) -> Tuple[int, int]:
+    return write_ops(*args)
+
+
+def diff_trees(
+    old_root: Path, new_root: Path, output: Path, block_size: int = DEFAULT_BLOCK_SIZE, jobs: int = 1
+) -> DiffResult:
+    started = time.perf_counter()
+    old_root, new_root, output = Path(old_root), Path(new_root), Path(output)
+    for root in (old_root, new_root):
+        if not root.is_dir():
+            raise DeltaError(f"{root} is not a directory")
+    old_files, new_files = list_files(old_root), list_files(new_root)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    with executor or nullcontext(), tempfile.TemporaryDirectory(dir=output.parent, prefix=".delta-") as scratch:
+        roots = [old_root] * len(old_files) + [new_root] * len(new_files)
+        indexes = _map(executor, index_file, roots, old_files + new_files)
+        old_index = {item.path: item for item in indexes[:len(old_files)]}
+        new_index = indexes[len(old_files):]
+        old_by_sha = {item.sha256: item.path for item in old_index.values()}
+
+        entries: List[DeltaEntry] = []
+        tasks: List[Tuple[Optional[Path], Path, Path, int]] = []
+        for item in new_index:
+            previous = old_index.get(item.path)
+            entry = DeltaEntry(item.path, "delta", item.size, item.sha256)
+            if previous is not None and previous.sha256 == item.sha256:
+                entry.action = "keep"
+            elif item.sha256 in old_by_sha:
+                entry.action, entry.source = "copy", old_by_sha[item.sha256]
+            else:
+                if previous is None:
+                    entry.action = "add"
+                else:
+                    entry.base_sha256 = previous.sha256
+                ops_path = Path(scratch) / f"{len(tasks)}.ops"
+                tasks.append((old_root / item.path if previous else None, new_root / item.path, ops_path, block_size))
+            entries.append(entry)
+        results = iter(_map(executor, _write_ops_task, tasks))
+        for entry in entries:
+            if entry.action in ("delta", "add"):
+                entry.ops_size, entry.copied = next(results)
+
+        header = json.dumps(
+            {
+                "block_size": block_size,
+                "files": [asdict(entry) for entry in entries],
+                "deleted": sorted(set(old_index) - {entry.path for entry in entries}),
+            },
+            separators=(",", ":"),
+        ).encode("utf-8")
+        partial = output.with_name(output.name + ".part")
+        with partial.open("wb") as handle:
+            handle.write(MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+            for task in tasks:
+                with task[2].open("rb") as ops:
+                    shutil.copyfileobj(ops, handle, CHUNK_SIZE)
+        os.replace(partial, output)
+    return DiffResult(
+        output,
+        entries,
+        json.loads(header)["deleted"],
+        output.stat().st_size,
+        sum(entry.size for entry in entries),
+        time.perf_counter() - started,
+    )
+
+
+def read_header(handle: BinaryIO) -> dict:
+    if handle.read(len(MAGIC)) != MAGIC:
+        raise DeltaError("Not a delta bundle")
+    (length,) = HEADER_LENGTH.unpack(handle.read(HEADER_LENGTH.size))
+    try:
+        return json.loads(handle.read(length))
+    except ValueError as exc:
+        raise DeltaError(f"Corrupt bundle header: {exc}") from None
+
+
+def _rebuild(handle: BinaryIO, entry: dict, base: Optional[Path], target: Path) -> None:
+    digest = hashlib.sha256()
+    with (_mapped(base) if base else nullcontext(b"")) as view, target.open("wb") as out:
+        for op, offset, length, data in _iter_ops(handle, entry["ops_size"]):
+            if op == OP_COPY:
+                if offset + length > len(view):
+                    raise DeltaError(f"{entry['path']}: copy beyond the end of the old file")
+                data = view[offset:offset + length]
+            digest.update(data)
+            out.write(data)
+    if digest.hexdigest() != entry["sha256"]:
+        raise DeltaError(f"{entry['path']}: rebuilt file does not match the new build")
+
+
+def apply_bundle(bundle: Path, old_root: Path, output: Optional[Path] = None) -> Tuple[int, int]:
+    """Rebuild the new build from ``old_root`` into ``output`` (in place by default).
+
+    Every file is staged next to its target and verified first, so a failed apply changes nothing.
+    Returns ``(files rebuilt or copied, files deleted)``."""
+    old_root = Path(old_root)
+    output = Path(output) if output else old_root
+    in_place = output.resolve() == old_root.resolve()
+    staged: List[Tuple[Path, Path]] = []
+    try:
+        with Path(bundle).open("rb") as handle:
+            header = read_header(handle)
+            for entry in header["files"]:
+                target = output / entry["path"]
+                if entry["action"] == "keep" and in_place:
+                    continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                temp = target.with_name(f".{target.name}.delta-tmp")
+                staged.append((temp, target))
+                if entry["action"] in ("keep", "copy"):
+                    source = old_root / (entry["source"] or entry["path"])
+                    if not source.is_file() or index_file(old_root, source.relative_to(old_root).as_posix()).sha256 != entry["sha256"]:
+                        raise DeltaError(f"{entry['path']}: old build does not match the bundle's base")
+                    shutil.copyfile(source, temp)
+                    continue
+                base = old_root / entry["path"] if entry["action"] == "delta" else None
+                if base is not None and (not base.is_file() or index_file(old_root, entry["path"]).sha256 != entry["base_sha256"]):
+                    raise DeltaError(f"{entry['path']}: old build does not match the bundle's base")
+                _rebuild(handle, entry, base, temp)
+    except BaseException:
+        for temp, _ in staged:
+            temp.unlink(missing_ok=True)
+        raise
+    for temp, target in staged:
+        os.replace(temp, target)
+    deleted = 0
+    if in_place:
+        for relative in header["deleted"]:
+            (output / relative).unlink(missing_ok=True)
+            deleted += 1
+    return len(staged), deleted
+
+
+def action_diff(old_root: Path, new_root: Path, output: Path, block_size: int = DEFAULT_BLOCK_SIZE, jobs: int = 1) -> None:
+    result = diff_trees(old_root, new_root, output, block_size, jobs)
+    for entry in result.entries:
+        if entry.action == "delta":
+            print(f"  delta  {entry.path}: {entry.copied / max(entry.size, 1):.0%} reused, {entry.ops_size / 1024:.1f} KiB")
+        elif entry.action in ("add", "copy"):
+            detail = f"from {entry.source}" if entry.source else f"{entry.ops_size / 1024:.1f} KiB"
+            print(f"  {entry.action:<6} {entry.path}: {detail}")
+    for relative in result.deleted:
+        print(f"  delete {relative}")
+    ratio = result.patch_bytes / result.full_bytes if result.full_bytes else 0.0
+    print(
+        f"\nWrote {result.output}: {result.patch_bytes / 1024:.1f} KiB patch vs {result.full_bytes / 1024:.1f} KiB full "
+        f"build ({ratio:.1%}); {result.count('keep')} unchanged, {result.count('delta')} delta, "
+        f"{result.count('add')} added, {result.count('copy')} copied, {len(result.deleted)} deleted "
+        f"in {result.seconds:.2f}s"
+    )
+
+
+def action_apply(bundle: Path, old_root: Path, output: Optional[Path] = None) -> None:
+    written, deleted = apply_bundle(bundle, old_root, output)
+    print(f"Applied {bundle} to {output or old_root}: {written} files written, {deleted} deleted")
+
+
+__all__ = [
+    "DEFAULT_BLOCK_SIZE",
+    "DeltaEntry",
+    "DeltaError",
+    "DiffResult",
+    "action_apply",
+    "action_diff",
+    "apply_bundle",
+    "block_signatures",
+    "diff_trees",
+    "weak_checksums",
+    "write_ops",
+]
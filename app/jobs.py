@@ -0,0 +1,232 @@
+"""Background scaffold jobs: a bounded worker pool with job state persisted in SQLite.
+
+The SQLite file is the source of truth, so any pre-fork worker process can report on or serve a job that
+another worker built. The queue bound is enforced there too, across processes."""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+from app.archive import ZipSource, iter_zip
+from app.main import ScaffoldContext
+
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_MAX_QUEUED_JOBS = 16
+MAX_BATCH_SIZE = 500
+JOB_RETENTION_SECONDS = 24 * 60 * 60
+ACTIVE = ("queued", "running")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    error TEXT NOT NULL DEFAULT '',
+    archive TEXT NOT NULL DEFAULT '',
+    contexts TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+EntryBuilder = Callable[[ScaffoldContext], List[Tuple[str, ZipSource]]]
+
+
+class QueueFull(RuntimeError):
+    """Raised when the configured number of queued and running jobs is already reached."""
+
+
+@dataclass
+class Job:
+    id: str
+    status: str  # "queued", "running", "done" or "failed"
+    total: int
+    done: int
+    error: str
+    archive: str
+    created: float
+    updated: float
+
+    def to_json(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "error": self.error,
+            "created": self.created,
+            "updated": self.updated,
+        }
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    def __init__(
+        self,
+        directory: Path,
+        build_entries: EntryBuilder,
+        workers: int = DEFAULT_JOB_WORKERS,
+        max_queued: int = DEFAULT_MAX_QUEUED_JOBS,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.directory / "jobs.sqlite3"
+        self.build_entries = build_entries
+        self.workers = workers
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._pid = -1
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pending: "queue.Queue[str]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._db().execute(SCHEMA)
+        self.recover()
+
+    def _db(self) -> sqlite3.Connection:
+        # Connections and threads do not survive fork(), so each process opens its own on first use.
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.db_path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._pid = os.getpid()
+            self._threads = []
+            self._pending = queue.Queue()
+        return self._connection  # type: ignore[return-value]
+
+    def recover(self) -> int:
+        """Fail active jobs whose owning process has died (crash, restart); returns how many."""
+        with self._lock:
+            db = self._db()
+            rows = db.execute("SELECT id, pid FROM jobs WHERE status IN (?, ?)", ACTIVE).fetchall()
+            dead = [job_id for job_id, pid in rows if not _pid_alive(pid)]
+            for job_id in dead:
+                db.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'interrupted by a server restart', updated = ? WHERE id = ?",
+                    (time.time(), job_id),
+                )
+        return len(dead)
+
+    def submit(self, contexts: Sequence[ScaffoldContext]) -> Job:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        payload = json.dumps([asdict(ctx) for ctx in contexts])
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                (active,) = db.execute("SELECT count(*) FROM jobs WHERE status IN (?, ?)", ACTIVE).fetchone()
+                if active >= self.max_queued:
+                    raise QueueFull(f"{active} scaffold jobs are already queued or running")
+                db.execute(
+                    "INSERT INTO jobs (id, status, total, contexts, pid, created, updated) VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                    (job_id, len(contexts), payload, os.getpid(), now, now),
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            self._start_workers()
+        self._pending.put(job_id)
+        self.purge()
+        return Job(job_id, "queued", len(contexts), 0, "", "", now, now)
+
+    def _start_workers(self) -> None:
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"scaffold-job-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT id, status, total, done, error, archive, created, updated, pid FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = Job(*row[:-1])
+        if job.status in ACTIVE and not _pid_alive(row[-1]):
+            self.recover()
+            return self.get(job_id)
+        return job
+
+    def _update(self, job_id: str, **values: object) -> None:
+        columns = ", ".join(f"{name} = ?" for name in values)
+        with self._lock:
+            self._db().execute(
+                f"UPDATE jobs SET {columns}, updated = ? WHERE id = ?", (*values.values(), time.time(), job_id)
+            )
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._pending.get()
+            try:
+                self.run(job_id)
+            finally:
+                self._pending.task_done()
+
+    def run(self, job_id: str) -> None:
+        with self._lock:
+            row = self._db().execute("SELECT contexts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return
+        self._update(job_id, status="running")
+        archive = self.directory / f"{job_id}.zip"
+        partial = archive.with_name(archive.name + ".part")
+        try:
+            contexts = [ScaffoldContext.from_mapping(data) for data in json.loads(row[0])]
+            with partial.open("wb") as handle:
+                for chunk in iter_zip(self._entries(job_id, contexts)):
+                    handle.write(chunk)
+            os.replace(partial, archive)
+        except Exception as exc:  # a failed job must never take its worker thread down
+            partial.unlink(missing_ok=True)
+            self._update(job_id, status="failed", error=str(exc) or type(exc).__name__)
+            return
+        self._update(job_id, status="done", done=len(contexts), archive=str(archive))
+
+    def _entries(self, job_id: str, contexts: Sequence[ScaffoldContext]) -> Iterator[Tuple[str, ZipSource]]:
+        for index, ctx in enumerate(contexts):
+            if index:
+                self._update(job_id, done=index)
+            yield from self.build_entries(ctx)
+
+    def purge(self, retention: float = JOB_RETENTION_SECONDS) -> int:
+        """Delete finished jobs (and their archives) older than ``retention`` seconds."""
+        cutoff = time.time() - retention
+        with self._lock:
+            db = self._db()
+            rows = db.execute(
+                "SELECT id, archive FROM jobs WHERE status IN ('done', 'failed') AND updated < ?", (cutoff,)
+            ).fetchall()
+            for job_id, archive in rows:
+                if archive:
+                    Path(archive).unlink(missing_ok=True)
+                db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return len(rows)
+
+    def depth(self) -> int:
+        with self._lock:
+            (active,) = self._db().execute("SELECT count(*) FROM jobs WHERE status IN (?, ?)", ACTIVE).fetchone()
+        return active
+
+
+__all__ = ["Job", "JobQueue", "MAX_BATCH_SIZE", "QueueFull"]
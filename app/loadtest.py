@@ -0,0 +1,496 @@
+"""Load testing: an asyncio client drives a weighted request mix at a fixed arrival rate.
+
+Requests are scheduled open-loop. Each one is timed from the moment it was due, not from when a
+connection became free, so a stalled server shows up as latency instead of quietly lowering the rate.
+Without ``--url`` the app is built here by ``create_app`` and served by forked workers, exactly like
+``web --workers``, so the client never competes with the server for the GIL and the RSS is the server's.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import ssl
+import sys
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from app.bench import percentile
+from app.main import ScaffoldContext
+
+DEFAULT_MIX = {"GET /": 4.0, "GET /plan": 2.0, "GET /guides": 2.0, "POST /scaffold": 1.0}
+LATENCY_TARGETS = {"p50_ms": 0.50, "p90_ms": 0.90, "p95_ms": 0.95, "p99_ms": 0.99, "max_ms": 1.0}
+TARGET_KEYS = set(LATENCY_TARGETS) | {"error_rate", "min_throughput", "rss_mb", "rss_growth_mb"}
+READ_CHUNK = 64 * 1024
+
+
+@dataclass
+class Scenario:
+    rate: float = 50.0  # requests started per second
+    duration: float = 30.0  # measured seconds, after the warmup
+    warmup: float = 2.0  # seconds of load excluded from latency stats and the RSS baseline
+    connections: int = 16
+    timeout: float = 30.0
+    scaffold_variants: int = 20  # distinct weapon classnames POSTed, so the zip cache sees misses too
+    seed: int = 0
+    mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    targets: Dict[str, float] = field(default_factory=dict)
+    route_targets: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+    @classmethod
+    def from_mapping(cls, data: Dict[str, object]) -> "Scenario":
+        known = set(cls.__dataclass_fields__)
+        unknown = sorted(set(data) - known)
+        if unknown:
+            raise ValueError(f"Unknown scenario keys: {', '.join(unknown)}")
+        scenario = cls(**data)  # type: ignore[arg-type]
+        scenario.validate()
+        return scenario
+
+    def validate(self) -> None:
+        if self.rate <= 0 or self.duration <= 0 or self.warmup < 0 or self.timeout <= 0:
+            raise ValueError("rate, duration and timeout must be positive and warmup not negative")
+        if self.connections < 1 or self.scaffold_variants < 1:
+            raise ValueError("connections and scaffold_variants must be at least 1")
+        if not self.mix or any(weight <= 0 for weight in self.mix.values()):
+            raise ValueError("mix needs at least one route, each with a positive weight")
+        for route in self.mix:
+            parse_route(route)
+        for name in self.targets:
+            if name not in TARGET_KEYS:
+                raise ValueError(f"Unknown target {name!r}; choose from {', '.join(sorted(TARGET_KEYS))}")
+        for route, targets in self.route_targets.items():
+            if route not in self.mix:
+                raise ValueError(f"route_targets names {route!r}, which is not in the mix")
+            for name in targets:
+                if name not in LATENCY_TARGETS and name != "error_rate":
+                    raise ValueError(f"Route target {name!r} must be a latency target or error_rate")
+
+
+def parse_route(route: str) -> Tuple[str, str]:
+    method, _, path = route.partition(" ")
+    if method not in ("GET", "POST") or not path.startswith("/"):
+        raise ValueError(f"Route {route!r} must look like 'GET /path' or 'POST /path'")
+    return method, path
+
+
+def load_scenario(path: Optional[Path]) -> Scenario:
+    if path is None:
+        return Scenario()
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as exc:
+        raise ValueError(f"Cannot read scenario {path}: {exc}") from exc
+    if not isinstance(data, dict):
+        raise ValueError(f"Scenario {path} must be a JSON object")
+    return Scenario.from_mapping(data)
+
+
+@dataclass
+class Sample:
+    route: str
+    due: float  # seconds since the run started
+    latency: float
+    status: int  # 0 when the request failed before a response arrived
+    error: str = ""
+
+
+# -- server side -------------------------------------------------------------------------------------
+
+
+def _quiet_worker(app, listener: socket.socket, threads: int, timeout: float) -> None:
+    import logging
+
+    from app.server import serve_worker
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no access log line per request
+    serve_worker(app, listener, threads, timeout)
+
+
+class LocalServer:
+    """``create_app`` served on an ephemeral port by forked workers (one thread server without fork)."""
+
+    def __init__(self, workers: int = 1, threads: int = 4) -> None:
+        from app.web import create_app
+
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.listener.set_inheritable(True)
+        self.url = "http://127.0.0.1:%d" % self.listener.getsockname()[1]
+        app = create_app()
+        self.pids: List[int] = []
+        self._server = None
+        if not hasattr(os, "fork"):
+            from app.server import PooledWSGIServer, handler_with_timeout
+
+            self._server = PooledWSGIServer(
+                "127.0.0.1", 0, app, handler=handler_with_timeout(30.0), fd=self.listener.fileno(), threads=threads
+            )
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+            return
+        for _ in range(max(workers, 1)):
+            pid = os.fork()
+            if pid == 0:
+                code = 0
+                try:
+                    _quiet_worker(app, self.listener, threads, 30.0)
+                except BaseException:
+                    code = 1
+                finally:
+                    os._exit(code)
+            self.pids.append(pid)
+
+    def rss_pids(self) -> List[int]:
+        return self.pids or [os.getpid()]
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                continue
+        for pid in self.pids:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.listener.close()
+
+
+def process_rss(pids: List[int]) -> Optional[int]:
+    """Resident bytes of ``pids`` and all their descendants, from /proc; None where that is unavailable."""
+    parents: Dict[int, List[int]] = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            # The command name may contain spaces and parentheses; the parent pid follows the last ")".
+            ppid = int(stat.read_text().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents.setdefault(ppid, []).append(int(stat.parent.name))
+    total, found, pending, seen = 0, False, list(pids), set()
+    while pending:
+        pid = pending.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        pending.extend(parents.get(pid, []))
+        try:
+            status = Path(f"/proc/{pid}/status").read_text()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith("VmRSS:"):
+                total += int(line.split()[1]) * 1024
+                found = True
+    return total if found else None
+
+
+# -- client side -------------------------------------------------------------------------------------
+
+
+class _Connection:
+    """One keep-alive HTTP/1.1 connection; just enough of the protocol to time requests and drain bodies."""
+
+    def __init__(self, host: str, port: int, tls: bool) -> None:
+        self.host, self.port, self.tls = host, port, tls
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: bytes) -> int:
+        if self.writer is None:
+            context = ssl.create_default_context() if self.tls else None
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=context)
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nContent-Length: {len(body)}\r\n"
+        if body:
+            head += "Content-Type: application/x-www-form-urlencoded\r\n"
+        self.writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await self.writer.drain()
+        reader = self.reader
+        assert reader is not None
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        status = int(line.split()[1])
+        headers: Dict[str, str] = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if status in (204, 304) or 100 <= status < 200:
+            pass
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            while size := int((await reader.readline()).split(b";")[0], 16):
+                await self._drain(size + 2)
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+        elif "content-length" in headers:
+            await self._drain(int(headers["content-length"]))
+        else:
+            while await reader.read(READ_CHUNK):
+                pass
+            self.close()
+            return status
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status
+
+    async def _drain(self, size: int) -> None:
+        # Bodies are read and dropped in chunks so large zips never accumulate in the client.
+        assert self.reader is not None
+        while size:
+            chunk = await self.reader.readexactly(min(size, READ_CHUNK))
+            size -= len(chunk)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def scaffold_body(variant: int) -> bytes:
+    defaults = ScaffoldContext()
+    return urlencode(
+        {"weapon_class": f"{defaults.weapon_class}_lt{variant}", "weapon_name": f"{defaults.weapon_name} {variant}"}
+    ).encode("ascii")
+
+
+class LoadRun:
+    def __init__(self, url: str, scenario: Scenario, rss_pids: Optional[List[int]], interval: float = 1.0) -> None:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Expected an http:// or https:// URL, got {url!r}")
+        self.host = parts.hostname
+        self.tls = parts.scheme == "https"
+        self.port = parts.port or (443 if self.tls else 80)
+        self.prefix = parts.path.rstrip("/")
+        self.scenario = scenario
+        self.rss_pids = rss_pids
+        self.interval = interval
+        self.samples: List[Sample] = []
+        self.timeline: List[Dict[str, object]] = []
+        self.rss: List[Tuple[float, int]] = []
+
+    async def _one(self, route: str, index: int, due: float, pool: "asyncio.Queue[_Connection]") -> None:
+        method, path = parse_route(route)
+        body = scaffold_body(index % self.scenario.scaffold_variants) if route == "POST /scaffold" else b""
+        connection = await pool.get()
+        status, error = 0, ""
+        try:
+            status = await asyncio.wait_for(connection.request(method, self.prefix + path, body), self.scenario.timeout)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.TimeoutError) as exc:
+            connection.close()
+            error = type(exc).__name__
+        finally:
+            pool.put_nowait(connection)
+        loop = asyncio.get_running_loop()
+        self.samples.append(Sample(route, due - self._started, loop.time() - due, status, error))
+
+    async def _monitor(self) -> None:
+        seen = 0
+        while True:
+            await asyncio.sleep(self.interval)
+            elapsed = asyncio.get_running_loop().time() - self._started
+            window = self.samples[seen:]
+            seen += len(window)
+            latencies = sorted(sample.latency for sample in window)
+            point: Dict[str, object] = {
+                "t": round(elapsed, 1),
+                "completed": len(window),
+                "rps": round(len(window) / self.interval, 1),
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+                "errors": sum(_failed(sample) for sample in window),
+            }
+            rss = process_rss(self.rss_pids) if self.rss_pids else None
+            if rss is not None:
+                self.rss.append((elapsed, rss))
+                point["rss_mb"] = round(rss / (1024 * 1024), 1)
+            self.timeline.append(point)
+            rss_text = f"  rss {point['rss_mb']:>7.1f} MB" if "rss_mb" in point else ""
+            print(
+                f"  t={elapsed:6.1f}s  {point['rps']:>7.1f} req/s  p50 {point['p50_ms']:>8.2f} ms  "
+                f"p99 {point['p99_ms']:>8.2f} ms  errors {point['errors']}{rss_text}",
+                flush=True,
+            )
+
+    async def run(self) -> None:
+        scenario = self.scenario
+        rng = random.Random(scenario.seed)
+        routes = list(scenario.mix)
+        weights = [scenario.mix[route] for route in routes]
+        pool: "asyncio.Queue[_Connection]" = asyncio.Queue()
+        for _ in range(scenario.connections):
+            pool.put_nowait(_Connection(self.host, self.port, self.tls))
+        loop = asyncio.get_running_loop()
+        self._started = loop.time()
+        monitor = asyncio.create_task(self._monitor())
+        tasks = set()
+        for index in range(int(scenario.rate * (scenario.warmup + scenario.duration))):
+            due = self._started + index / scenario.rate
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+            task = asyncio.create_task(self._one(rng.choices(routes, weights)[0], index, due, pool))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        self.elapsed = loop.time() - self._started
+        monitor.cancel()
+        while not pool.empty():
+            pool.get_nowait().close()
+
+
+def _failed(sample: Sample) -> bool:
+    return bool(sample.error) or sample.status >= 400
+
+
+def summarize(samples: List[Sample]) -> Dict[str, object]:
+    latencies = sorted(sample.latency for sample in samples)
+    statuses: Dict[str, int] = {}
+    for sample in samples:
+        key = sample.error or str(sample.status)
+        statuses[key] = statuses.get(key, 0) + 1
+    summary: Dict[str, object] = {name: round(percentile(latencies, rank) * 1000, 2) for name, rank in LATENCY_TARGETS.items()}
+    summary.update(
+        requests=len(samples),
+        errors=sum(_failed(sample) for sample in samples),
+        error_rate=round(sum(_failed(sample) for sample in samples) / len(samples), 4) if samples else 0.0,
+        statuses=dict(sorted(statuses.items())),
+    )
+    return summary
+
+
+def build_report(run: LoadRun) -> Dict[str, object]:
+    scenario = run.scenario
+    measured = [sample for sample in run.samples if sample.due >= scenario.warmup]
+    # Requests still finishing after the schedule ended count towards the measured window they belong to.
+    window = max(run.elapsed - scenario.warmup, 1e-9)
+    overall = summarize(measured)
+    overall["throughput"] = round(len(measured) / window, 1)
+    routes = {}
+    for route in scenario.mix:
+        subset = [sample for sample in measured if sample.route == route]
+        routes[route] = summarize(subset)
+        routes[route]["throughput"] = round(len(subset) / window, 1)
+    report: Dict[str, object] = {
+        "scenario": asdict(scenario),
+        "overall": overall,
+        "routes": routes,
+        "timeline": run.timeline,
+    }
+    if run.rss:
+        after_warmup = [rss for elapsed, rss in run.rss if elapsed >= scenario.warmup] or [run.rss[-1][1]]
+        mb = 1024 * 1024
+        report["rss"] = {
+            "start_mb": round(after_warmup[0] / mb, 1),
+            "peak_mb": round(max(rss for _, rss in run.rss) / mb, 1),
+            "end_mb": round(run.rss[-1][1] / mb, 1),
+            "growth_mb": round((run.rss[-1][1] - after_warmup[0]) / mb, 1),
+        }
+    return report
+
+
+def check_targets(report: Dict[str, object], scenario: Scenario) -> List[str]:
+    """Every target the run breached, as human-readable lines; empty when the scenario passed."""
+    breaches = []
+    overall: Dict[str, float] = report["overall"]  # type: ignore[assignment]
+    for name, limit in scenario.targets.items():
+        if name in LATENCY_TARGETS or name == "error_rate":
+            if overall[name] > limit:
+                breaches.append(f"{name} {overall[name]} > {limit}")
+        elif name == "min_throughput":
+            if overall["throughput"] < limit:
+                breaches.append(f"throughput {overall['throughput']} req/s < {limit}")
+        elif "rss" not in report:
+            breaches.append(f"{name} is set but server RSS could not be measured (use --server-pid with --url)")
+        else:
+            rss: Dict[str, float] = report["rss"]  # type: ignore[assignment]
+            value = rss["peak_mb"] if name == "rss_mb" else rss["growth_mb"]
+            if value > limit:
+                breaches.append(f"{name} {value} > {limit}")
+    routes: Dict[str, Dict[str, float]] = report["routes"]  # type: ignore[assignment]
+    for route, targets in scenario.route_targets.items():
+        for name, limit in targets.items():
+            if routes[route][name] > limit:
+                breaches.append(f"{route} {name} {routes[route][name]} > {limit}")
+    return breaches
+
+
+def print_report(report: Dict[str, object]) -> None:
+    overall: Dict[str, object] = report["overall"]  # type: ignore[assignment]
+    print(
+        f"\n{overall['requests']} requests measured, {overall['throughput']} req/s, "
+        f"{overall['errors']} errors ({float(overall['error_rate']):.2%})"
+    )
+    print(f"{'route':<18}{'count':>7}{'req/s':>8}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}{'errors':>8}")
+    rows = list(report["routes"].items()) + [("all", overall)]  # type: ignore[union-attr]
+    for route, stats in rows:
+        print(
+            f"{route:<18}{stats['requests']:>7}{stats['throughput']:>8}"
+            + "".join(f"{stats[name]:>9.2f}" for name in LATENCY_TARGETS)
+            + f"{stats['errors']:>8}"
+        )
+    print("Latencies in ms; statuses: " + ", ".join(f"{key} x{count}" for key, count in overall["statuses"].items()))  # type: ignore[union-attr]
+    if "rss" in report:
+        rss: Dict[str, float] = report["rss"]  # type: ignore[assignment]
+        print(
+            f"Server RSS: {rss['start_mb']} MB after warmup, peak {rss['peak_mb']} MB, "
+            f"end {rss['end_mb']} MB ({rss['growth_mb']:+} MB)"
+        )
+
+
+def action_loadtest(
+    scenario: Scenario,
+    url: Optional[str] = None,
+    server_pid: Optional[int] = None,
+    workers: int = 1,
+    threads: int = 4,
+    output: Optional[Path] = None,
+) -> int:
+    server = None if url else LocalServer(workers, threads)
+    try:
+        target = url or server.url  # type: ignore[union-attr]
+        rss_pids = server.rss_pids() if server else ([server_pid] if server_pid else None)
+        print(
+            f"Load testing {target}: {scenario.rate:g} req/s for {scenario.warmup:g}s warmup + "
+            f"{scenario.duration:g}s over {scenario.connections} connections",
+            flush=True,
+        )
+        run = LoadRun(target, scenario, rss_pids)
+        asyncio.run(run.run())
+    finally:
+        if server is not None:
+            server.close()
+    report = build_report(run)
+    breaches = check_targets(report, scenario)
+    report["breaches"] = breaches
+    print_report(report)
+    if output:
+        output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote {output}", file=sys.stderr)
+    for line in breaches:
+        print(f"TARGET MISSED {line}", file=sys.stderr)
+    if scenario.targets or scenario.route_targets:
+        print("All targets met." if not breaches else f"{len(breaches)} targets missed.", file=sys.stderr)
+    return len(breaches)
+
+
+__all__ = [
+    "DEFAULT_MIX",
+    "LoadRun",
+    "LocalServer",
+    "Scenario",
+    "action_loadtest",
+    "build_report",
+    "check_targets",
+    "load_scenario",
+    "process_rss",
+    "summarize",
+]
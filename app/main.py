@@ -5,12 +5,20 @@ CLI assistant for guiding Arma 3 custom rifle mod creation with RHS dependency.
 from __future__ import annotations
 
 import argparse
+import difflib
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
 import textwrap
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Mapping
 
-from string import Template
+from app.templating import CompiledTemplate
 
 
 STEP_OVERVIEW: List[str] = [
@@ -24,7 +32,7 @@ STEP_OVERVIEW: List[str] = [
 ]
 
 
-CONFIG_TEMPLATE = Template(
+CONFIG_TEMPLATE = CompiledTemplate(
     textwrap.dedent(
         r"""
         #include "basicDefines_A3.hpp"
@@ -35,11 +43,34 @@ CONFIG_TEMPLATE = Template(
                 name = "${weapon_name} (RHS Mod)";
                 url = "";
                 units[] = {};
-                weapons[] = {"${weapon_class}"};
+                weapons[] = {${patch_weapons}};
                 requiredVersion = 1.0;
                 requiredAddons[] = {${required_addons}};
             };
         };
+        {% if ammo_class %}
+
+        class CfgAmmo {
+            class ${ammo_base};
+            class ${ammo_class}: ${ammo_base} {
+                author = "${author}";
+            };
+        };
+        {% endif %}
+        {% if magazine_class %}
+
+        class CfgMagazines {
+            class ${magazine_base};
+            class ${magazine_class}: ${magazine_base} {
+                author = "${author}";
+                scope = 2;
+                displayName = "${weapon_name} Magazine";
+                {% if ammo_class %}
+                ammo = "${ammo_class}";
+                {% endif %}
+            };
+        };
+        {% endif %}
 
         class Mode_SemiAuto;
         class Mode_FullAuto;
@@ -60,7 +91,10 @@ CONFIG_TEMPLATE = Template(
                 descriptionShort = "DMR (7.62x51) using RHS attachments";
                 model = "\\${addon_prefix}\\addons\\${addon_folder}\\${model_filename}";
                 picture = "\\${addon_prefix}\\addons\\${addon_folder}\\data\\UI\\${weapon_icon}";
-                modes[] = {"Single"};
+                {% if hidden_selections %}
+                hiddenSelections[] = {${hidden_selections}};
+                {% endif %}
+                modes[] = {${fire_mode_names}};
                 magazineWell[] = {${magazine_wells}};
                 magazines[] = {${magazines}};
                 reloadAction = "GestureReloadDMR";
@@ -83,18 +117,37 @@ CONFIG_TEMPLATE = Template(
 
                 handAnim[] = {"OFP2_ManSkeleton", "\\A3\\Weapons_F_Mark\\LongRangeRifles\\GM6\\handanim_GM6.rtm"};
 
-                class Single: Mode_SemiAuto {
+                {% for mode in fire_modes %}
+                class ${mode.name}: ${mode.base} {
                     sounds[] = {"StandardSound", "SilencedSound"};
-                    reloadTime = 0.1;
-                    dispersion = 0.00087;
+                    reloadTime = ${mode.reload_time};
+                    dispersion = ${mode.dispersion};
+                    {% if mode.burst %}
+                    burst = ${mode.burst};
+                    {% endif %}
                 };
+                {% endfor %}
+            };
+            {% for variant in variants %}
+
+            class ${variant.classname}: ${weapon_class} {
+                displayName = "${variant.name}";
+                baseWeapon = "${variant.classname}";
+                {% if variant.model %}
+                model = "\\${addon_prefix}\\addons\\${addon_folder}\\${variant.model}";
+                {% endif %}
+                {% if variant.textures %}
+                hiddenSelectionsTextures[] = {${variant.textures}};
+                {% endif %}
             };
+            {% endfor %}
+            {% for optic in optics %}
 
-            class ${optic_class}: ItemCore {
+            class ${optic.classname}: ItemCore {
                 scope = 2; scopeCurator = 2;
-                displayName = "${optic_name}";
-                model = "\\${addon_prefix}\\addons\\${addon_folder}\\${optic_model}";
-                picture = "\\${addon_prefix}\\addons\\${addon_folder}\\data\\UI\\${optic_icon}";
+                displayName = "${optic.name}";
+                model = "\\${addon_prefix}\\addons\\${addon_folder}\\${optic.model}";
+                picture = "\\${addon_prefix}\\addons\\${addon_folder}\\data\\UI\\${optic.icon}";
                 descriptionShort = "Optical sight for the ${weapon_name}";
                 weaponInfoType = "RscWeaponZeroing";
                 class ItemInfo: InventoryOpticsItem_Base_F {
@@ -116,13 +169,14 @@ CONFIG_TEMPLATE = Template(
                     };
                 };
             };
+            {% endfor %}
         };
         """
     )
 )
 
 
-MODEL_CFG_TEMPLATE = Template(
+MODEL_CFG_TEMPLATE = CompiledTemplate(
     textwrap.dedent(
         r"""
         class CfgSkeletons {
@@ -140,7 +194,7 @@ MODEL_CFG_TEMPLATE = Template(
             };
             class ${model_class}: Default {
                 skeletonName = "WeaponSkeleton";
-                sections[] = {"bolt", "magazine"};
+                sections[] = {${model_sections}};
                 class Animations {
                     class BoltMovement {
                         source = "reload";
@@ -165,12 +219,69 @@ MODEL_CFG_TEMPLATE = Template(
                     };
                 };
             };
+            {% for model in variant_models %}
+            class ${model}: ${model_class} {};
+            {% endfor %}
         };
         """
     )
 )
 
 
+# Fire mode presets keyed by lowercase name; the order given in ``fire_modes`` is kept.
+FIRE_MODES: Dict[str, Dict[str, object]] = {
+    "single": {"name": "Single", "base": "Mode_SemiAuto", "reload_time": "0.1", "dispersion": "0.00087", "burst": 0},
+    "burst": {"name": "Burst", "base": "Mode_SemiAuto", "reload_time": "0.08", "dispersion": "0.00093", "burst": 3},
+    "fullauto": {"name": "FullAuto", "base": "Mode_FullAuto", "reload_time": "0.08", "dispersion": "0.001", "burst": 0},
+}
+AMMO_BASE = "B_762x51_Ball"
+
+
+def _split_names(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+@dataclass
+class WeaponVariant:
+    """A thin child of the base weapon: only what differs (name, textures, model) is written out."""
+
+    classname: str
+    name: str = ""
+    textures: List[str] = field(default_factory=list)
+    model: str = ""
+
+    @classmethod
+    def parse(cls, spec: str) -> "WeaponVariant":
+        """Parse ``classname|display name|texture,texture|model``; everything after the classname is optional."""
+        parts = [part.strip() for part in spec.split("|")]
+        if len(parts) > 4 or not parts[0]:
+            raise ValueError(f"Invalid variant {spec!r}: expected classname|display name|textures|model")
+        parts += [""] * (4 - len(parts))
+        return cls(parts[0], parts[1], _split_names(parts[2]), parts[3])
+
+    @classmethod
+    def from_value(cls, value: object) -> "WeaponVariant":
+        if isinstance(value, WeaponVariant):
+            return value
+        if isinstance(value, str):
+            return cls.parse(value)
+        if isinstance(value, Mapping):
+            data = dict(value)
+            textures = data.get("textures") or data.get("hiddenSelectionsTextures") or []
+            data.pop("hiddenSelectionsTextures", None)
+            data["textures"] = _split_names(textures) if isinstance(textures, str) else [str(item) for item in textures]
+            try:
+                return cls(**data)
+            except TypeError as exc:
+                raise ValueError(f"Invalid variant {value!r}: {exc}") from None
+        raise ValueError(f"Invalid variant {value!r}")
+
+
+def _addon_path(path: str) -> str:
+    """Addon-relative path in the doubled-backslash form the config templates use."""
+    return "\\\\".join(part for part in path.replace("\\", "/").split("/") if part)
+
+
 @dataclass
 class ScaffoldContext:
     addon_prefix: str = "my_mod"
@@ -187,12 +298,88 @@ class ScaffoldContext:
     magazine_wells: str = "SR25"
     magazines: str = "rhs_mag_20Rnd_762x51_M118_special_Mag"
     required_addons: List[str] = None
+    fire_modes: str = "Single"
+    magazine_class: str = ""
+    ammo_class: str = ""
+    variants: List[WeaponVariant] = None
+    hidden_selections: str = "camo"
+    binarize: bool = False
 
     def __post_init__(self) -> None:
         if self.required_addons is None:
             self.required_addons = ["A3_Weapons_F", "rhsusf_main", "rhs_c_weapons"]
+        if isinstance(self.binarize, str):
+            self.binarize = self.binarize.strip().lower() in {"1", "true", "yes", "on"}
+        if self.variants is None:
+            self.variants = []
+        elif isinstance(self.variants, str):
+            self.variants = [WeaponVariant.parse(spec) for spec in re.split(r"[;\n]", self.variants) if spec.strip()]
+        else:
+            self.variants = [WeaponVariant.from_value(variant) for variant in self.variants]
+        classnames = [self.weapon_class] + [variant.classname for variant in self.variants]
+        duplicates = sorted({name for name in classnames if classnames.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate weapon classnames: {', '.join(duplicates)}")
+        unknown = [mode for mode in _split_names(self.fire_modes) if mode.lower() not in FIRE_MODES]
+        if unknown:
+            raise ValueError(f"Unknown fire modes: {', '.join(unknown)} (choose from Single, Burst, FullAuto)")
+        if self.magazine_class and not _split_names(self.magazines):
+            raise ValueError("A custom magazine_class needs at least one entry in magazines to inherit from")
+
+    def fire_mode_list(self) -> List[Dict[str, object]]:
+        return [FIRE_MODES[mode.lower()] for mode in _split_names(self.fire_modes)]
+
+    def optic_list(self) -> List[Dict[str, str]]:
+        """One entry per comma-separated optic class; missing names fall back to the classname and
+        shorter model/icon lists repeat their last item."""
+        names = _split_names(self.optic_name)
+        models = _split_names(self.optic_model)
+        icons = _split_names(self.optic_icon)
+        return [
+            {
+                "classname": classname,
+                "name": names[index] if index < len(names) else classname,
+                "model": models[min(index, len(models) - 1)] if models else "",
+                "icon": icons[min(index, len(icons) - 1)] if icons else "",
+            }
+            for index, classname in enumerate(_split_names(self.optic_class))
+        ]
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, object]) -> "ScaffoldContext":
+        known = {field.name for field in fields(cls)}
+        unknown = sorted(set(data) - known)
+        if unknown:
+            raise ValueError(f"Unknown scaffold fields: {', '.join(unknown)}")
+        values = {key: value for key, value in data.items() if value not in (None, "")}
+        addons = values.get("required_addons")
+        if isinstance(addons, str):
+            values["required_addons"] = [item.strip() for item in addons.split(",") if item.strip()]
+        return cls(**values)
 
-    def to_format_kwargs(self) -> Dict[str, str]:
+    @property
+    def pbo_prefix(self) -> str:
+        return f"{self.addon_prefix}\\addons\\{self.addon_folder}"
+
+    def variant_list(self) -> List[Dict[str, str]]:
+        root = f"\\\\{self.addon_prefix}\\\\addons\\\\{self.addon_folder}\\\\"
+        return [
+            {
+                "classname": variant.classname,
+                "name": variant.name or variant.classname,
+                "model": _addon_path(variant.model),
+                "textures": ", ".join(f'"{root}{_addon_path(texture)}"' for texture in variant.textures),
+            }
+            for variant in self.variants
+        ]
+
+    def to_format_kwargs(self) -> Dict[str, object]:
+        magazines = _split_names(self.magazines)
+        fire_modes = self.fire_mode_list()
+        retextured = any(variant.textures for variant in self.variants)
+        selections = _split_names(self.hidden_selections) if retextured else []
+        model_class = Path(self.model_filename).stem
+        variant_models = [Path(variant.model.replace("\\", "/")).stem for variant in self.variants if variant.model]
         return {
             "addon_prefix": self.addon_prefix,
             "addon_folder": self.addon_folder,
@@ -201,29 +388,64 @@ class ScaffoldContext:
             "weapon_name": self.weapon_name,
             "model_filename": self.model_filename,
             "weapon_icon": self.weapon_icon,
-            "optic_class": self.optic_class,
-            "optic_name": self.optic_name,
-            "optic_model": self.optic_model,
-            "optic_icon": self.optic_icon,
-            "magazine_wells": ", ".join(
-                f'"{item.strip()}"' for item in self.magazine_wells.split(",") if item.strip()
-            ),
+            "optics": self.optic_list(),
+            "magazine_wells": ", ".join(f'"{item}"' for item in _split_names(self.magazine_wells)),
             "magazines": ", ".join(
-                f'"{item.strip()}"' for item in self.magazines.split(",") if item.strip()
+                f'"{item}"' for item in ([self.magazine_class] if self.magazine_class else []) + magazines
             ),
+            "magazine_class": self.magazine_class,
+            "magazine_base": magazines[0] if magazines else "",
+            "ammo_class": self.ammo_class,
+            "ammo_base": AMMO_BASE,
+            "fire_modes": fire_modes,
+            "fire_mode_names": ", ".join(f'"{mode["name"]}"' for mode in fire_modes),
             "required_addons": ", ".join(f'"{item.strip()}"' for item in self.required_addons),
-            "model_class": Path(self.model_filename).stem,
+            "model_class": model_class,
+            "patch_weapons": ", ".join(
+                f'"{name}"' for name in [self.weapon_class] + [variant.classname for variant in self.variants]
+            ),
+            "variants": self.variant_list(),
+            "variant_models": [stem for stem in dict.fromkeys(variant_models) if stem != model_class],
+            "hidden_selections": ", ".join(f'"{name}"' for name in selections),
+            "model_sections": ", ".join(f'"{name}"' for name in ["bolt", "magazine"] + selections),
         }
 
 
-def write_template(path: Path, content: str) -> None:
-    path.write_text(content.strip() + "\n", encoding="utf-8")
+MANIFEST_NAME = ".scaffold-manifest.json"
+
+
+def display_path(path: Path) -> Path:
     resolved = path.resolve()
     try:
-        display_path = resolved.relative_to(Path.cwd())
+        return resolved.relative_to(Path.cwd())
     except ValueError:
-        display_path = resolved
-    print(f"Created {display_path}")
+        return resolved
+
+
+def atomic_write_bytes(path: Path, content: bytes) -> None:
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(content)
+        # mkstemp creates 0600 files; keep the existing mode or fall back to a normal 0644.
+        try:
+            mode = path.stat().st_mode & 0o777
+        except OSError:
+            mode = 0o644
+        os.chmod(temp_name, mode)
+        os.replace(temp_name, path)
+    except BaseException:
+        os.unlink(temp_name)
+        raise
+
+
+def atomic_write_text(path: Path, content: str) -> None:
+    atomic_write_bytes(path, content.encode("utf-8"))
+
+
+def write_template(path: Path, content: str) -> None:
+    atomic_write_text(path, content.strip() + "\n")
+    print(f"Created {display_path(path)}")
 
 
 def action_plan() -> None:
@@ -235,41 +457,194 @@ def action_plan() -> None:
           " - Test in Virtual Arsenal with RHS loaded; inspect RPT if something is missing.\n")
 
 
-def action_scaffold(base: Path, context: ScaffoldContext | None = None) -> None:
-    ctx = context or ScaffoldContext()
-    addon_dir = base / "@MyWeaponMod" / "addons" / ctx.addon_folder
-    data_dir = addon_dir / "data" / "UI"
-    addon_dir.mkdir(parents=True, exist_ok=True)
-    data_dir.mkdir(parents=True, exist_ok=True)
+def addon_directory(base: Path, ctx: ScaffoldContext) -> Path:
+    return base / "@MyWeaponMod" / "addons" / ctx.addon_folder
 
-    format_kwargs = ctx.to_format_kwargs()
-    write_template(addon_dir / "config.cpp", CONFIG_TEMPLATE.substitute(**format_kwargs))
-    write_template(addon_dir / "model.cfg", MODEL_CFG_TEMPLATE.substitute(**format_kwargs))
 
-    placeholder_files = [
-        addon_dir / ctx.model_filename,
-        addon_dir / ctx.optic_model,
+def placeholder_files(addon_dir: Path, ctx: ScaffoldContext) -> List[Path]:
+    data_dir = addon_dir / "data" / "UI"
+    optics = ctx.optic_list()
+    paths = [addon_dir / ctx.model_filename]
+    paths += [addon_dir / optic["model"] for optic in optics if optic["model"]]
+    paths += [
         addon_dir / "data" / "rifle_dmr_co.paa",
         addon_dir / "data" / "rifle_dmr_nohq.paa",
         addon_dir / "data" / "rifle_dmr_smdi.paa",
         addon_dir / "data" / "rifle_dmr.rvmat",
         data_dir / ctx.weapon_icon,
-        data_dir / ctx.optic_icon,
     ]
-    for placeholder in placeholder_files:
-        placeholder.parent.mkdir(parents=True, exist_ok=True)
+    paths += [data_dir / optic["icon"] for optic in optics if optic["icon"]]
+    for variant in ctx.variants:
+        if variant.model:
+            paths.append(addon_dir / variant.model.replace("\\", "/"))
+        paths += [addon_dir / texture.replace("\\", "/") for texture in variant.textures]
+    return list(dict.fromkeys(paths))
+
+
+def touch_placeholders(addon_dir: Path, ctx: ScaffoldContext) -> List[Path]:
+    placeholders = placeholder_files(addon_dir, ctx)
+    for placeholder in placeholders:
         if not placeholder.exists():
+            placeholder.parent.mkdir(parents=True, exist_ok=True)
             placeholder.touch()
-    print(f"\nScaffold ready in: {addon_dir}")
+    return placeholders
+
+
+def render_scaffold(ctx: ScaffoldContext) -> Dict[str, str | bytes]:
+    """Rendered files keyed by path relative to the addon folder (``config.bin`` is bytes)."""
+    format_kwargs = ctx.to_format_kwargs()
+    rendered: Dict[str, str | bytes] = {
+        "config.cpp": CONFIG_TEMPLATE.render(format_kwargs).strip() + "\n",
+        "model.cfg": MODEL_CFG_TEMPLATE.render(format_kwargs).strip() + "\n",
+        "$PBOPREFIX$": ctx.pbo_prefix + "\n",
+    }
+    if ctx.binarize:
+        add_binarized(rendered)
+    return rendered
+
+
+def add_binarized(rendered: Dict[str, str | bytes]) -> None:
+    """Add ``config.bin`` next to a freshly rendered ``config.cpp``."""
+    from app.rapify import rapify_text
+
+    rendered["config.bin"] = rapify_text(rendered["config.cpp"])  # type: ignore[arg-type]
+
+
+@dataclass
+class FileChange:
+    path: Path
+    status: str  # "created", "updated" or "unchanged"
+    content: str | bytes
+
+
+def load_manifest(addon_dir: Path) -> Dict[str, Dict[str, object]]:
+    """Manifest records keyed by relative path: ``sha256`` plus the ``size``/``mtime_ns`` seen when written."""
+    try:
+        raw = json.loads((addon_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(raw, dict):
+        return {}
+    # Older manifests stored a bare hash; without a stat record those files are always re-hashed once.
+    return {name: record if isinstance(record, dict) else {"sha256": record} for name, record in raw.items()}
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_record(path: Path, digest: str) -> Dict[str, object]:
+    stat = path.stat()
+    return {"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def sync_scaffold(
+    addon_dir: Path,
+    ctx: ScaffoldContext,
+    dry_run: bool = False,
+    rendered: Dict[str, str | bytes] | None = None,
+) -> List[FileChange]:
+    """Write only files whose rendered content differs from what is on disk.
+
+    The manifest hash stands in for the file while its size and mtime still match the manifest record;
+    otherwise (hand edits, restored backups) the on-disk file is hashed, so drift is always repaired.
+    """
+    manifest = load_manifest(addon_dir)
+    changes: List[FileChange] = []
+    dirty = False
+    for relative, content in (rendered if rendered is not None else render_scaffold(ctx)).items():
+        path = addon_dir / relative
+        data = content if isinstance(content, bytes) else content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        record = manifest.get(relative, {})
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stat = None
+        if stat is not None and record.get("sha256") == digest:
+            if record.get("size") == stat.st_size and record.get("mtime_ns") == stat.st_mtime_ns:
+                changes.append(FileChange(path, "unchanged", content))
+                continue
+            if stat.st_size == len(data) and file_sha256(path) == digest:
+                # Same bytes, different stat (touched or copied): only the record is refreshed.
+                changes.append(FileChange(path, "unchanged", content))
+                if not dry_run:
+                    manifest[relative] = manifest_record(path, digest)
+                    dirty = True
+                continue
+        changes.append(FileChange(path, "updated" if stat is not None else "created", content))
+        if not dry_run:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if isinstance(content, bytes):
+                atomic_write_bytes(path, content)
+            else:
+                atomic_write_text(path, content)
+            manifest[relative] = manifest_record(path, digest)
+            dirty = True
+    if not dry_run:
+        touch_placeholders(addon_dir, ctx)
+        if dirty:
+            atomic_write_text(addon_dir / MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+    return changes
+
+
+def file_diff(change: FileChange) -> str:
+    if isinstance(change.content, bytes):
+        return f"Binary file {display_path(change.path)} differs\n"
+    try:
+        current = change.path.read_text(encoding="utf-8").splitlines(keepends=True)
+    except OSError:
+        current = []
+    name = str(display_path(change.path))
+    return "".join(
+        difflib.unified_diff(current, change.content.splitlines(keepends=True), f"a/{name}", f"b/{name}")
+    )
+
+
+def action_scaffold(
+    base: Path,
+    context: ScaffoldContext | None = None,
+    dry_run: bool = False,
+    show_diff: bool = False,
+    store: Path | None = None,
+    link_mode: str = "hardlink",
+) -> None:
+    ctx = context or ScaffoldContext()
+    addon_dir = addon_directory(base, ctx)
+    if not dry_run:
+        addon_dir.mkdir(parents=True, exist_ok=True)
+
+    changes = sync_scaffold(addon_dir, ctx, dry_run=dry_run)
+    for change in changes:
+        if change.status == "unchanged":
+            continue
+        label = f"Would {change.status[:-1]}" if dry_run else change.status.capitalize()
+        print(f"{label} {display_path(change.path)}")
+        if show_diff:
+            print(file_diff(change), end="")
+    unchanged = sum(change.status == "unchanged" for change in changes)
+    written = len(changes) - unchanged
+    if dry_run:
+        print(f"\nDry run: {written} file(s) would change, {unchanged} unchanged in {addon_dir}")
+        return
+    print(f"\nScaffold ready in: {addon_dir} ({written} written, {unchanged} unchanged)")
+    if store is not None:
+        from app.store import AssetStore, dedupe_report
+
+        print(dedupe_report(AssetStore(store, link_mode).dedupe_addon(addon_dir)))
     print("Replace placeholder .p3d and .paa files with your converted assets before packing.")
 
 
 def action_guide(topic: str) -> None:
     sections = {
         "model": "Prepare geometry LODs, memory points (usti hlavne, konec hlavne, nabojnicestart, nabojniceend) and proxies for TOP/SIDE/MUZZLE/UNDERBARREL in Object Builder.",
-        "textures": "Convert textures to .paa (_co, _nohq, _smdi) and reference them via an RVMAT with relative paths to avoid pink materials.",
+        "textures": "Convert textures to .paa (_co, _nohq, _smdi) with `python -m app textures <src_dir>` and reference them via an RVMAT with relative paths to avoid pink materials.",
         "attachments": "Use rhs_western_rifle_muzzle_slot, rhs_western_rifle_scopes_slot_short, rhs_western_rifle_laser_slot, and rhs_western_rifle_underbarrel_slot for plug-and-play RHS suppressors, optics, lasers, and bipods.",
-        "packaging": "Pack steyr_dmr_rhs into a PBO (Addon Builder or Mikero), binarize models, sign the PBO, and include the .bikey in a keys folder before publishing.",
+        "packaging": "Pack steyr_dmr_rhs into a PBO (python -m app pack, Addon Builder or Mikero), binarize models, sign the PBO, and include the .bikey in a keys folder before publishing.",
     }
     if topic == "all":
         for key, text in sections.items():
@@ -282,6 +657,17 @@ def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Walk through creating a custom Arma 3 rifle mod with RHS dependency."
     )
+    parser.add_argument(
+        "--profile",
+        metavar="OUT",
+        help="Profile the subcommand into OUT.pstats and OUT.collapsed (default: profile-<command>); "
+        "with `web`, profile requests that send an X-Profile header into the OUT folder (default: profiles).",
+    )
+    parser.add_argument(
+        "--trace-startup",
+        action="store_true",
+        help="Re-run the command with import timing and print a startup/import time breakdown.",
+    )
     subparsers = parser.add_subparsers(dest="command")
 
     subparsers.add_parser("plan", help="Print the high-level checklist.")
@@ -304,13 +690,254 @@ def build_parser() -> argparse.ArgumentParser:
         default="rhs_mag_20Rnd_762x51_M118_special_Mag",
         help="Comma-separated list of magazine classnames.",
     )
+    scaffold_parser.add_argument(
+        "--fire-modes",
+        default="Single",
+        help="Comma-separated fire modes to generate (Single, Burst, FullAuto).",
+    )
+    scaffold_parser.add_argument(
+        "--optic-class",
+        default="Steyr_DMR_Scope",
+        help="Comma-separated optic classnames to generate; pass an empty string for none.",
+    )
+    scaffold_parser.add_argument("--magazine-class", default="", help="Also generate this CfgMagazines class.")
+    scaffold_parser.add_argument("--ammo-class", default="", help="Also generate this CfgAmmo class.")
+    scaffold_parser.add_argument(
+        "--variant",
+        dest="variants",
+        action="append",
+        default=[],
+        metavar="CLASS|NAME|TEXTURES|MODEL",
+        help="Add a child class of the base weapon (repeatable); textures are comma-separated, name/textures/model optional.",
+    )
+    scaffold_parser.add_argument(
+        "--binarize",
+        action="store_true",
+        help="Also write a rapified config.bin next to config.cpp.",
+    )
+    scaffold_parser.add_argument(
+        "--classnames",
+        type=Path,
+        help="Classname index (see `classnames build`) used to validate magazines, wells and addons first.",
+    )
+    scaffold_parser.add_argument(
+        "--store",
+        type=Path,
+        help="Content-addressed asset store; identical .p3d/.paa/.rvmat files across addons are linked from it.",
+    )
+    scaffold_parser.add_argument(
+        "--link-mode",
+        choices=["hardlink", "reflink"],
+        default="hardlink",
+        help="How store objects are placed in addon folders (falls back to copying when unsupported).",
+    )
+    scaffold_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show which files would change without writing anything.",
+    )
+    scaffold_parser.add_argument("--diff", action="store_true", help="Print a unified diff for each changed file.")
+    scaffold_parser.add_argument(
+        "--watch",
+        type=Path,
+        metavar="SPEC",
+        help="JSON/TOML spec to watch; outputs are re-rendered whenever it (or a template override) changes.",
+    )
+    scaffold_parser.add_argument("--poll-interval", type=float, default=0.2, help="Seconds between watch polls.")
+    scaffold_parser.add_argument(
+        "--manifest",
+        type=Path,
+        help="JSONL or CSV file with one scaffold context per row (batch mode).",
+    )
+    scaffold_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes used in batch mode.",
+    )
 
     guide_parser = subparsers.add_parser("guide", help="Show focused tips (model, textures, attachments, packaging, all).")
     guide_parser.add_argument("topic", type=str, default="all", nargs="?")
 
+    pack_parser = subparsers.add_parser("pack", help="Pack addon folders into PBOs.")
+    pack_parser.add_argument("addon_dirs", type=Path, nargs="+", help="Addon folders such as @MyWeaponMod/addons/steyr_dmr_rhs.")
+    pack_parser.add_argument(
+        "--output",
+        type=Path,
+        help="Directory for the .pbo files (defaults to next to each addon folder).",
+    )
+    pack_parser.add_argument("--prefix", help="PBO prefix; defaults to $PBOPREFIX$ or the folder name.")
+    pack_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    pack_parser.add_argument("--store", type=Path, help="Link identical assets from this asset store before packing.")
+    pack_parser.add_argument("--link-mode", choices=["hardlink", "reflink"], default="hardlink")
+
+    store_parser = subparsers.add_parser("store", help="Inspect or garbage-collect the shared asset store.")
+    store_subparsers = store_parser.add_subparsers(dest="store_command")
+    store_stats_parser = store_subparsers.add_parser("stats", help="Show object, reference and saved byte counts.")
+    store_stats_parser.add_argument("root", type=Path)
+    store_gc_parser = store_subparsers.add_parser("gc", help="Delete objects no addon references any more.")
+    store_gc_parser.add_argument("root", type=Path)
+    store_gc_parser.add_argument("--dry-run", action="store_true", help="Report what would be removed.")
+
+    textures_parser = subparsers.add_parser("textures", help="Convert PNG/TGA sources into PAA textures.")
+    textures_parser.add_argument("src_dir", type=Path, help="A .png/.tga file, or a folder searched recursively for them.")
+    textures_parser.add_argument(
+        "--output",
+        type=Path,
+        help="Directory for the .paa files, mirroring src_dir (defaults to next to each source).",
+    )
+    textures_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    textures_parser.add_argument("--force", action="store_true", help="Reconvert even if the source hash is unchanged.")
+
+    rapify_parser = subparsers.add_parser("rapify", help="Binarize config.cpp files into config.bin.")
+    rapify_parser.add_argument("configs", type=Path, nargs="+")
+    rapify_parser.add_argument("--output", type=Path, help="Output file (single input only; defaults to <name>.bin).")
+
+    derapify_parser = subparsers.add_parser("derapify", help="Turn config.bin files back into config text.")
+    derapify_parser.add_argument("configs", type=Path, nargs="+")
+    derapify_parser.add_argument("--output", type=Path, help="Output file (single input only; defaults to <name>.cpp).")
+
+    check_parser = subparsers.add_parser("check", help="Inspect .p3d models and check them against model.cfg.")
+    check_parser.add_argument("paths", type=Path, nargs="+", help="Models or addon folders searched recursively for .p3d files.")
+    check_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    check_parser.add_argument("--verbose", action="store_true", help="List every LOD with its point and face counts.")
+
+    diff_parser = subparsers.add_parser("diff", help="Write a delta update bundle between two mod builds.")
+    diff_parser.add_argument("old_build", type=Path, help="Previous release, e.g. an old @MyWeaponMod folder.")
+    diff_parser.add_argument("new_build", type=Path)
+    diff_parser.add_argument("--output", type=Path, default=Path("update.delta"), help="Bundle file to write.")
+    diff_parser.add_argument("--block-size", type=int, default=16 * 1024, help="Bytes per matched block.")
+    diff_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+
+    apply_parser = subparsers.add_parser("apply", help="Rebuild a new mod build from an old one and a delta bundle.")
+    apply_parser.add_argument("bundle", type=Path)
+    apply_parser.add_argument("old_build", type=Path)
+    apply_parser.add_argument("--output", type=Path, help="Write the new build here instead of updating old_build in place.")
+
+    unpack_parser = subparsers.add_parser("unpack", help="Extract a PBO into a folder.")
+    unpack_parser.add_argument("pbo", type=Path)
+    unpack_parser.add_argument("--output", type=Path, help="Destination folder (defaults to the PBO name).")
+
+    list_parser = subparsers.add_parser("list", help="List the entries of a PBO.")
+    list_parser.add_argument("pbo", type=Path)
+
+    keys_parser = subparsers.add_parser("keys", help="Manage BI signing keys.")
+    keys_subparsers = keys_parser.add_subparsers(dest="keys_command")
+    keys_new_parser = keys_subparsers.add_parser("new", help="Create <authority>.biprivatekey and <authority>.bikey.")
+    keys_new_parser.add_argument("authority")
+    keys_new_parser.add_argument("--output", type=Path, default=Path.cwd(), help="Directory for the key files.")
+    keys_new_parser.add_argument("--bits", type=int, default=1024)
+
+    sign_parser = subparsers.add_parser("sign", help="Sign PBOs (.bisign) or verify existing signatures.")
+    sign_parser.add_argument("pbos", type=Path, nargs="+")
+    sign_key_group = sign_parser.add_mutually_exclusive_group(required=True)
+    sign_key_group.add_argument("--key", type=Path, help="Private key (.biprivatekey) used to sign.")
+    sign_key_group.add_argument("--verify", type=Path, metavar="BIKEY", help="Verify signatures against a .bikey instead.")
+    sign_parser.add_argument("--version", type=int, choices=[2, 3], default=3, help="Signature version.")
+    sign_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+
+    config_parser = subparsers.add_parser("config", help="Parse config.cpp files and inspect the class hierarchy.")
+    config_parser.add_argument("paths", type=Path, nargs="+", help="config.cpp files or mod folders to index.")
+    config_parser.add_argument("--class", dest="lookup", help="Class path (CfgWeapons/Steyr_DMR_762) or bare name to resolve.")
+    config_parser.add_argument("--cache", type=Path, help="Parse cache file; unchanged configs are not re-parsed.")
+
+    classnames_parser = subparsers.add_parser("classnames", help="Build or query the offline classname index.")
+    classnames_subparsers = classnames_parser.add_subparsers(dest="classnames_command")
+    classnames_build_parser = classnames_subparsers.add_parser("build", help="Index classnames from PBOs, config.cpp or config.bin files.")
+    classnames_build_parser.add_argument("sources", type=Path, nargs="+", help="RHS @mod folders, PBOs, config.cpp or config.bin files.")
+    classnames_build_parser.add_argument("--output", type=Path, default=Path("classnames.idx"))
+    classnames_search_parser = classnames_subparsers.add_parser("search", help="Prefix-search the index.")
+    classnames_search_parser.add_argument("prefix")
+    classnames_search_parser.add_argument("--index", type=Path, default=Path("classnames.idx"))
+    classnames_search_parser.add_argument("--kind", choices=["patch", "magazine", "magazine_well", "slot", "weapon"])
+    classnames_search_parser.add_argument("--limit", type=int, default=20)
+
+    bench_parser = subparsers.add_parser("bench", help="Benchmark rendering, scaffolding, zips and HTTP; print JSON.")
+    bench_parser.add_argument("--iterations", type=int, default=200)
+    bench_parser.add_argument("--output", type=Path, help="Also write the JSON report here (e.g. to save a baseline).")
+    bench_parser.add_argument("--baseline", type=Path, help="Baseline JSON to compare against.")
+    bench_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.15,
+        help="Allowed p50 slowdown versus the baseline before exiting non-zero (0.15 = 15%%).",
+    )
+    bench_parser.add_argument("--disk-dir", type=Path, help="Directory used for the on-disk scaffold benchmark.")
+
+    loadtest_parser = subparsers.add_parser(
+        "loadtest", help="Drive the web UI with a request mix at a target rate; report latency, errors and RSS."
+    )
+    loadtest_parser.add_argument("--scenario", type=Path, help="JSON scenario: rate, duration, mix and targets.")
+    loadtest_parser.add_argument("--url", help="Test a running server instead of starting create_app in-process.")
+    loadtest_parser.add_argument("--server-pid", type=int, help="With --url: track RSS of this process and its children.")
+    loadtest_parser.add_argument("--rate", type=float, help="Requests started per second (overrides the scenario).")
+    loadtest_parser.add_argument("--duration", type=float, help="Measured seconds (overrides the scenario).")
+    loadtest_parser.add_argument("--connections", type=int, help="Keep-alive connections (overrides the scenario).")
+    loadtest_parser.add_argument("--workers", type=int, default=1, help="In-process mode: forked worker processes.")
+    loadtest_parser.add_argument("--threads", type=int, default=4, help="In-process mode: request threads per worker.")
+    loadtest_parser.add_argument("--output", type=Path, help="Also write the JSON report here.")
+
     web_parser = subparsers.add_parser("web", help="Run the browser-based helper UI.")
     web_parser.add_argument("--host", default="127.0.0.1")
     web_parser.add_argument("--port", type=int, default=8000)
+    web_parser.add_argument(
+        "--cache-bytes",
+        type=int,
+        default=32 * 1024 * 1024,
+        help="Memory budget for cached scaffold zips (LRU eviction beyond it).",
+    )
+    web_parser.add_argument(
+        "--workers",
+        type=int,
+        help="Run the pre-fork production server with this many worker processes (default: Flask dev server).",
+    )
+    web_parser.add_argument("--threads", type=int, default=4, help="Request threads per worker process.")
+    web_parser.add_argument(
+        "--timeout", type=float, default=30.0, help="Socket read/write timeout in seconds (not a limit on request handling)."
+    )
+    web_parser.add_argument(
+        "--keep-alive",
+        type=float,
+        default=5.0,
+        help="Seconds an idle keep-alive connection is kept open between requests (0 closes after every response).",
+    )
+    web_parser.add_argument("--backlog", type=int, default=128, help="Listen backlog (bounded accept queue).")
+    web_parser.add_argument("--classnames", type=Path, help="Classname index for /api/complete and form validation.")
+    web_parser.add_argument(
+        "--max-upload-mb",
+        type=int,
+        default=512,
+        help="Largest scaffold form upload accepted per request, in MiB (413 beyond it).",
+    )
+    web_parser.add_argument(
+        "--upload-budget-mb",
+        type=int,
+        default=2048,
+        help="Total MiB of uploads in flight at once per worker process (503 beyond it).",
+    )
+    web_parser.add_argument(
+        "--jobs-dir",
+        type=Path,
+        help="Directory for the /api/scaffold job database and archives (default: a folder in the temp dir).",
+    )
+    web_parser.add_argument(
+        "--metrics-dir",
+        type=Path,
+        help="With --workers: directory where workers share metric snapshots (default: a fresh folder in the temp dir).",
+    )
+    web_parser.add_argument("--job-workers", type=int, default=2, help="Background threads per process building batch jobs.")
+    web_parser.add_argument(
+        "--max-queued-jobs",
+        type=int,
+        default=16,
+        help="Queued plus running batch jobs across all workers before /api/scaffold answers 429.",
+    )
+    web_parser.add_argument(
+        "--no-metrics",
+        dest="metrics",
+        action="store_false",
+        help="Disable request/stage timing and the /metrics endpoint.",
+    )
     web_parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -321,34 +948,264 @@ def build_parser() -> argparse.ArgumentParser:
 
 
 def main(argv: List[str] | None = None) -> None:
+    # Profiling stays unimported unless asked for, so the default path costs one env lookup.
+    tracing = os.environ.get("ARMA_TRACE_STARTUP") == "1"
+    if tracing:
+        from app.profiling import startup_mark
+
+        startup_mark("main")
     parser = build_parser()
-    args = parser.parse_args(argv)
+    argv = list(argv) if argv is not None else sys.argv[1:]
+    # `--profile` takes its output only as `--profile=OUT`, so `--profile scaffold` profiles scaffold.
+    args = parser.parse_args(["--profile=" if arg == "--profile" else arg for arg in argv])
+    if tracing:
+        startup_mark("parse_args")
+    if args.trace_startup:
+        from app.profiling import trace_startup
+
+        raise SystemExit(trace_startup(argv))
+    if args.profile is not None and args.command != "web":
+        from app.profiling import profile_call
+
+        profile_call(lambda: run_command(parser, args), Path(args.profile or f"profile-{args.command or 'help'}"))
+    else:
+        run_command(parser, args)
+    if tracing:
+        startup_mark("command")
 
+
+def _is_user_error(exc: BaseException) -> bool:
+    # OSError covers missing or unreadable paths; every error class defined in this package describes bad
+    # input (a malformed PBO, config or bundle). A plain ValueError elsewhere is a bug and keeps its traceback.
+    return isinstance(exc, OSError) or (isinstance(exc, ValueError) and type(exc).__module__.startswith("app."))
+
+
+def run_command(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Run the chosen subcommand; bad input ends in a one-line error and exit status 1, not a traceback."""
+    try:
+        dispatch(parser, args)
+    except (OSError, ValueError) as exc:
+        if not _is_user_error(exc):
+            raise
+        parser.exit(1, f"{parser.prog} {args.command}: error: {exc}\n")
+
+
+def require_paths(*paths: Path) -> None:
+    """Raise FileNotFoundError for the first input path that does not exist."""
+    for path in paths:
+        if not Path(path).exists():
+            raise FileNotFoundError(f"{path}: no such file or directory")
+
+
+def dispatch(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
     if args.command == "plan":
         action_plan()
+    elif args.command == "scaffold" and args.watch:
+        from app.watch import action_watch
+
+        action_watch(args.watch, Path(args.output), interval=args.poll_interval)
+    elif args.command == "scaffold" and args.manifest:
+        from app.batch import action_batch_scaffold
+
+        if action_batch_scaffold(
+            args.manifest, Path(args.output), jobs=args.jobs, store=args.store, link_mode=args.link_mode
+        ):
+            raise SystemExit(1)
     elif args.command == "scaffold":
-        context = ScaffoldContext(
-            addon_prefix=args.addon_prefix,
-            addon_folder=args.addon_folder,
-            weapon_class=args.weapon_class,
-            weapon_name=args.weapon_name,
-            author=args.author,
-            magazine_wells=args.magazine_wells,
-            magazines=args.magazines,
+        try:
+            context = ScaffoldContext(
+                addon_prefix=args.addon_prefix,
+                addon_folder=args.addon_folder,
+                weapon_class=args.weapon_class,
+                weapon_name=args.weapon_name,
+                author=args.author,
+                magazine_wells=args.magazine_wells,
+                magazines=args.magazines,
+                fire_modes=args.fire_modes,
+                optic_class=args.optic_class,
+                magazine_class=args.magazine_class,
+                ammo_class=args.ammo_class,
+                variants=args.variants,
+                binarize=args.binarize,
+            )
+        except ValueError as exc:
+            parser.error(str(exc))
+        if args.classnames:
+            from app.classnames import ClassnameIndex, validate_context
+
+            problems = validate_context(context, ClassnameIndex(args.classnames))
+            if problems:
+                print("Scaffold not written:\n" + "\n".join(f" - {problem}" for problem in problems))
+                raise SystemExit(1)
+        action_scaffold(
+            Path(args.output),
+            context,
+            dry_run=args.dry_run,
+            show_diff=args.diff,
+            store=args.store,
+            link_mode=args.link_mode,
         )
-        action_scaffold(Path(args.output), context)
     elif args.command == "guide":
         action_guide(args.topic)
+    elif args.command == "pack":
+        from app.pbo import action_pack
+
+        action_pack(
+            args.addon_dirs, args.output, prefix=args.prefix, jobs=args.jobs, store=args.store, link_mode=args.link_mode
+        )
+    elif args.command == "diff":
+        from app.delta import action_diff
+
+        action_diff(args.old_build, args.new_build, args.output, block_size=args.block_size, jobs=args.jobs)
+    elif args.command == "apply":
+        from app.delta import action_apply
+
+        action_apply(args.bundle, args.old_build, args.output)
+    elif args.command == "store" and args.store_command == "stats":
+        from app.store import action_store_stats
+
+        require_paths(args.root)
+        action_store_stats(args.root)
+    elif args.command == "store" and args.store_command == "gc":
+        from app.store import action_store_gc
+
+        require_paths(args.root)
+        action_store_gc(args.root, dry_run=args.dry_run)
+    elif args.command == "store":
+        parser.parse_args(["store", "--help"])
+    elif args.command == "textures":
+        from app.textures import action_textures
+
+        require_paths(args.src_dir)
+        if action_textures(args.src_dir, args.output, jobs=args.jobs, force=args.force):
+            raise SystemExit(1)
+    elif args.command == "rapify":
+        from app.rapify import action_rapify
+
+        action_rapify(args.configs, args.output)
+    elif args.command == "derapify":
+        from app.rapify import action_derapify
+
+        action_derapify(args.configs, args.output)
+    elif args.command == "check":
+        from app.p3d import action_check
+
+        if action_check(args.paths, jobs=args.jobs, verbose=args.verbose):
+            raise SystemExit(1)
+    elif args.command == "unpack":
+        from app.pbo import action_unpack
+
+        action_unpack(args.pbo, args.output)
+    elif args.command == "list":
+        from app.pbo import action_list
+
+        action_list(args.pbo)
+    elif args.command == "keys":
+        if args.keys_command != "new":
+            parser.parse_args(["keys", "--help"])
+        from app.signing import action_keys_new
+
+        action_keys_new(args.authority, args.output, bits=args.bits)
+    elif args.command == "sign" and args.verify:
+        from app.signing import action_verify
+
+        if action_verify(args.pbos, args.verify, jobs=args.jobs):
+            raise SystemExit(1)
+    elif args.command == "sign":
+        from app.signing import action_sign
+
+        action_sign(args.pbos, args.key, jobs=args.jobs, version=args.version)
+    elif args.command == "config":
+        from app.cfgparse import action_config
+
+        require_paths(*args.paths)
+        action_config(args.paths, lookup=args.lookup, cache_path=args.cache)
+    elif args.command == "classnames" and args.classnames_command == "build":
+        from app.classnames import action_classnames_build
+
+        if action_classnames_build(args.sources, args.output):
+            raise SystemExit(1)
+    elif args.command == "classnames" and args.classnames_command == "search":
+        from app.classnames import action_classnames_search
+
+        action_classnames_search(args.index, args.prefix, kind=args.kind, limit=args.limit)
+    elif args.command == "classnames":
+        parser.parse_args(["classnames", "--help"])
+    elif args.command == "bench":
+        from app.bench import action_bench
+
+        if action_bench(args.iterations, args.output, args.baseline, args.threshold, args.disk_dir):
+            raise SystemExit(1)
+    elif args.command == "loadtest":
+        from app.loadtest import action_loadtest, load_scenario
+
+        try:
+            scenario = load_scenario(args.scenario)
+            for name in ("rate", "duration", "connections"):
+                if getattr(args, name) is not None:
+                    setattr(scenario, name, getattr(args, name))
+            scenario.validate()
+        except ValueError as exc:
+            parser.error(str(exc))
+        if action_loadtest(
+            scenario, args.url, args.server_pid, workers=args.workers, threads=args.threads, output=args.output
+        ):
+            raise SystemExit(1)
     elif args.command == "web":
         from app.web import create_app
 
-        app = create_app()
+        metrics_dir = None
+        if args.workers is not None and args.metrics and not args.dry_run:
+            # Created once, before forking, so reloaded workers keep adding to the same totals.
+            metrics_dir = args.metrics_dir or Path(tempfile.mkdtemp(prefix="arma-metrics-"))
+            metrics_dir.mkdir(parents=True, exist_ok=True)
+            for stale in metrics_dir.glob("*.json"):
+                stale.unlink()
+
+        def app_factory():
+            return create_app(
+                cache_bytes=args.cache_bytes,
+                classname_index=args.classnames,
+                metrics_enabled=args.metrics,
+                max_upload_bytes=args.max_upload_mb * 1024 * 1024,
+                upload_budget_bytes=args.upload_budget_mb * 1024 * 1024,
+                job_workers=args.job_workers,
+                max_queued_jobs=args.max_queued_jobs,
+                jobs_dir=args.jobs_dir,
+                # In web mode --profile samples single requests that send an X-Profile header.
+                profile_dir=Path(args.profile or "profiles") if args.profile is not None else None,
+                metrics_dir=metrics_dir,
+            )
+
         start_url = f"http://{args.host}:{args.port}"
         if args.dry_run:
+            app_factory()
+            if os.environ.get("ARMA_TRACE_STARTUP") == "1":
+                from app.profiling import startup_mark
+
+                startup_mark("create_app")
             print(f"Web UI ready to run at {start_url} (dry run, server not started).")
             return
+        if args.workers is not None:
+            from app.server import run_server
+
+            try:
+                run_server(
+                    app_factory,
+                    args.host,
+                    args.port,
+                    args.workers,
+                    args.threads,
+                    args.timeout,
+                    args.backlog,
+                    keep_alive=args.keep_alive,
+                )
+            finally:
+                if metrics_dir is not None and args.metrics_dir is None:
+                    shutil.rmtree(metrics_dir, ignore_errors=True)
+            return
         print(f"Starting web UI at {start_url} ...")
-        app.run(host=args.host, port=args.port, debug=False)
+        app_factory().run(host=args.host, port=args.port, debug=False)
     else:
         parser.print_help()
 
@@ -0,0 +1,246 @@
+"""Low-overhead request/stage metrics with per-thread aggregation and Prometheus text output.
+
+Under the pre-fork server each worker process has its own shards. Given a shared ``directory``, every
+process writes a snapshot of its totals there about once a second, and a scrape of any worker merges all
+snapshots. That way counters add up across workers and stay monotonic when workers are replaced."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+Labels = Tuple[Tuple[str, str], ...]
+FLUSH_INTERVAL = 1.0
+
+HELP = {
+    "arma_http_request_duration_seconds": ("histogram", "Time to produce response headers, per route."),
+    "arma_http_requests_total": ("counter", "Requests handled, per route, method and status."),
+    "arma_http_response_bytes_total": ("counter", "Response body bytes sent, per route."),
+    "arma_scaffold_stage_duration_seconds": ("histogram", "Time spent in each stage of the scaffold view."),
+    "arma_scaffold_archives_built_total": ("counter", "Scaffold zips assembled (cache misses)."),
+    "arma_scaffold_upload_bytes_total": ("counter", "Uploaded asset bytes passed through into scaffold zips."),
+    "arma_scaffold_jobs_total": ("counter", "Batch scaffold jobs submitted to /api/scaffold, by outcome."),
+}
+
+_NULL = nullcontext()
+
+
+class _Histogram:
+    __slots__ = ("buckets", "total", "count")
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = 0
+        for bound in LATENCY_BUCKETS:
+            if value <= bound:
+                break
+            index += 1
+        self.buckets[index] += 1
+        self.total += value
+        self.count += 1
+
+
+class _Shard:
+    """One thread's private metric storage; only its owner thread ever writes to it."""
+
+    def __init__(self) -> None:
+        self.histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        self.counters: Dict[Tuple[str, Labels], int] = {}
+
+
+class Metrics:
+    def __init__(self, enabled: bool = True, directory: Optional[Path] = None) -> None:
+        self.enabled = enabled
+        self.directory = Path(directory) if directory is not None else None
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._register_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._snapshot: Optional[Path] = None
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            with self._register_lock:
+                if self._pid != os.getpid():
+                    # A forked worker: the parent's shards belong to the parent's snapshot, not ours.
+                    self._pid, self._shards, self._snapshot = os.getpid(), [], None
+                self._shards.append(shard)
+                self._start_flusher()
+            self._local.shard = shard
+        return shard
+
+    def _start_flusher(self) -> None:
+        # Called with _register_lock held, once per process that records anything.
+        if self.directory is None or self._snapshot is not None:
+            return
+        self._snapshot = self.directory / f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+        threading.Thread(target=self._flush_forever, name="metrics-flush", daemon=True).start()
+
+    def _flush_forever(self) -> None:
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self) -> None:
+        """Write this process's totals to its snapshot file (atomically, so readers never see half a file)."""
+        with self._register_lock:
+            snapshot = self._snapshot
+        if snapshot is None:
+            return
+        histograms, counters = self._merged()
+        payload = {
+            "histograms": [[name, labels, h.buckets, h.total, h.count] for (name, labels), h in histograms.items()],
+            "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+        }
+        temp = snapshot.with_name(f".{snapshot.name}.tmp")
+        try:
+            temp.write_text(json.dumps(payload), encoding="utf-8")
+            os.replace(temp, snapshot)
+        except OSError:
+            pass  # a full or vanished metrics directory must never break request handling
+
+    def observe(self, name: str, labels: Labels, seconds: float) -> None:
+        if not self.enabled:
+            return
+        histograms = self._shard().histograms
+        histogram = histograms.get((name, labels))
+        if histogram is None:
+            histogram = histograms[(name, labels)] = _Histogram()
+        histogram.observe(seconds)
+
+    def inc(self, name: str, labels: Labels = (), amount: int = 1) -> None:
+        if not self.enabled:
+            return
+        counters = self._shard().counters
+        counters[(name, labels)] = counters.get((name, labels), 0) + amount
+
+    def stage(self, name: str) -> ContextManager[None]:
+        if not self.enabled:
+            return _NULL
+        return self._timed_stage(name)
+
+    @contextmanager
+    def _timed_stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("arma_scaffold_stage_duration_seconds", (("stage", name),), time.perf_counter() - started)
+
+    def timed_iter(self, stage: str, chunks: Iterable[bytes], route: str) -> Iterator[bytes]:
+        """Time only the work of producing each chunk, and count the bytes sent."""
+        iterator = iter(chunks)
+        spent = 0.0
+        sent = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                spent += time.perf_counter() - started
+            sent += len(chunk)
+            yield chunk
+        self.observe("arma_scaffold_stage_duration_seconds", (("stage", stage),), spent)
+        self.inc("arma_http_response_bytes_total", (("route", route),), sent)
+
+    def _merged(self) -> Tuple[Dict[Tuple[str, Labels], _Histogram], Dict[Tuple[str, Labels], int]]:
+        histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        counters: Dict[Tuple[str, Labels], int] = {}
+        with self._register_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, source in list(shard.histograms.items()):
+                target = histograms.get(key)
+                if target is None:
+                    target = histograms[key] = _Histogram()
+                target.buckets = [a + b for a, b in zip(target.buckets, source.buckets)]
+                target.total += source.total
+                target.count += source.count
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + value
+        return histograms, counters
+
+    def _collected(self) -> Tuple[Dict[Tuple[str, Labels], _Histogram], Dict[Tuple[str, Labels], int]]:
+        """Totals of every process that has written a snapshot, including workers that have since exited."""
+        assert self.directory is not None
+        self.flush()
+        histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        counters: Dict[Tuple[str, Labels], int] = {}
+        for path in sorted(self.directory.glob("*.json")):
+            try:
+                payload = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            for name, labels, buckets, total, count in payload.get("histograms", []):
+                key = (name, tuple(tuple(pair) for pair in labels))
+                target = histograms.get(key)
+                if target is None:
+                    target = histograms[key] = _Histogram()
+                target.buckets = [a + b for a, b in zip(target.buckets, buckets)]
+                target.total += total
+                target.count += count
+            for name, labels, value in payload.get("counters", []):
+                key = (name, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+        return histograms, counters
+
+    def render(self) -> str:
+        if self.directory is not None:
+            # Aggregated across processes, so no per-process label.
+            histograms, counters = self._collected()
+            pid: Labels = ()
+        else:
+            histograms, counters = self._merged()
+            pid = (("pid", str(os.getpid())),)
+        lines: List[str] = []
+        for name, (kind, text) in HELP.items():
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (metric, labels), histogram in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), histogram.buckets):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels(labels + pid + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels + pid)} {histogram.total:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels + pid)} {histogram.count}")
+            else:
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels + pid)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+# Shared disabled instance for callers that take optional instrumentation.
+NO_METRICS = Metrics(enabled=False)
+
+
+__all__ = ["LATENCY_BUCKETS", "Metrics", "NO_METRICS"]
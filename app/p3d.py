@@ -0,0 +1,356 @@
+"""Memory-mapped P3D (MLOD/ODOL) inspector and model.cfg cross-check."""
+
+from __future__ import annotations
+
+import math
+import mmap
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from app.cfgparse import ConfigIndex, ConfigParseError, parse_file
+
+U32 = struct.Struct("<I")
+F32 = struct.Struct("<f")
+MLOD_LOD_HEADER = struct.Struct("<4s6I")
+FACE_FIXED_SIZE = 4 + 4 * 16 + 4  # vertex count, four (point, normal, u, v) slots, flags
+MAX_LODS = 64
+
+RESOLUTION_MEMORY = 1e15
+# Resolutions from 1e4 up are special LODs; below that a resolution is a visual LOD.
+SPECIAL_LODS = {
+    1e3: "View Gunner",
+    1.1e3: "View Pilot",
+    1.2e3: "View Cargo",
+    1e13: "Geometry",
+    1e15: "Memory",
+    2e15: "Land Contact",
+    3e15: "Roadway",
+    4e15: "Paths",
+    5e15: "Hit-points",
+    6e15: "View Geometry",
+    7e15: "Fire Geometry",
+    8e15: "View Cargo Geometry",
+    9e15: "View Cargo Fire Geometry",
+    1e16: "View Commander",
+    1.5e16: "View Gunner Geometry",
+    1.7e16: "Sub Parts",
+    2.1e16: "Wreck",
+}
+VISUAL_LOD_LIMIT = 1e3
+SHADOW_LOD_RANGE = (1e4, 2e4)
+
+# Memory points every rifle needs (see the model guide), on top of the axes model.cfg references.
+# They are required for models with a CfgModels class; optics and other parts are not weapons.
+REQUIRED_MEMORY_POINTS = ("usti hlavne", "konec hlavne", "nabojnicestart", "nabojniceend")
+
+
+class P3DError(ValueError):
+    """Raised for files that are not P3D models or are truncated."""
+
+
+@dataclass
+class Lod:
+    resolution: float
+    points: int = 0
+    faces: int = 0
+    selections: List[str] = field(default_factory=list)
+    properties: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        for value, label in SPECIAL_LODS.items():
+            if math.isclose(self.resolution, value, rel_tol=1e-4):
+                return label
+        if SHADOW_LOD_RANGE[0] <= self.resolution < SHADOW_LOD_RANGE[1]:
+            return f"Shadow Volume {self.resolution - SHADOW_LOD_RANGE[0]:g}"
+        return f"{self.resolution:g}"
+
+    @property
+    def is_visual(self) -> bool:
+        return self.resolution < VISUAL_LOD_LIMIT
+
+
+@dataclass
+class P3DModel:
+    path: Path
+    format: str  # "MLOD" (Object Builder source) or "ODOL" (binarized)
+    version: int
+    lods: List[Lod] = field(default_factory=list)
+
+    @property
+    def has_selections(self) -> bool:
+        return self.format == "MLOD"
+
+    def lod(self, resolution: float) -> Optional[Lod]:
+        for lod in self.lods:
+            if math.isclose(lod.resolution, resolution, rel_tol=1e-4):
+                return lod
+        return None
+
+    def memory_points(self) -> Set[str]:
+        memory = self.lod(RESOLUTION_MEMORY)
+        return {name.lower() for name in memory.selections} if memory else set()
+
+    def visual_selections(self) -> Set[str]:
+        return {name.lower() for lod in self.lods if lod.is_visual for name in lod.selections}
+
+
+def _asciiz(view: mmap.mmap, position: int) -> Tuple[str, int]:
+    end = view.find(b"\0", position)
+    if end < 0:
+        raise P3DError("unterminated string")
+    return view[position:end].decode("latin-1"), end + 1
+
+
+def _skip_faces(view: mmap.mmap, position: int, faces: int) -> int:
+    """Offset of the TAGG block after ``faces`` face records."""
+    # Face records end in two strings, so finding the TAGG marker is far cheaper than walking them;
+    # fall back to the exact walk if the marker is not where a tag list can start.
+    marker = view.find(b"TAGG", position)
+    if marker >= 0 and faces * (FACE_FIXED_SIZE + 2) <= marker - position and view[marker + 4:marker + 5] in (b"\0", b"\1"):
+        return marker
+    for _ in range(faces):
+        position = view.find(b"\0", position + FACE_FIXED_SIZE)
+        position = view.find(b"\0", position + 1)
+        if position < 0:
+            raise P3DError("truncated face data")
+        position += 1
+    return position
+
+
+def _read_mlod(view: mmap.mmap, model: P3DModel) -> None:
+    count = U32.unpack_from(view, 8)[0]
+    if count > MAX_LODS:
+        raise P3DError(f"implausible LOD count {count}")
+    position = 12
+    for _ in range(count):
+        magic, _major, _minor, points, normals, faces, _flags = MLOD_LOD_HEADER.unpack_from(view, position)
+        if magic != b"P3DM":
+            raise P3DError(f"expected P3DM LOD at offset {position}")
+        lod = Lod(0.0, points, faces)
+        # Point and normal arrays have fixed strides, so they are skipped without being read.
+        position += MLOD_LOD_HEADER.size + points * 16 + normals * 12
+        position = _skip_faces(view, position, faces)
+        if view[position:position + 4] != b"TAGG":
+            raise P3DError(f"expected TAGG block at offset {position}")
+        position += 4
+        while True:
+            position += 1  # active flag
+            name, position = _asciiz(view, position)
+            size = U32.unpack_from(view, position)[0]
+            position += 4
+            if name == "#EndOfFile#":
+                break
+            if name == "#Property#" and size == 128:
+                key = view[position:position + 64].split(b"\0", 1)[0].decode("latin-1")
+                value = view[position + 64:position + 128].split(b"\0", 1)[0].decode("latin-1")
+                lod.properties[key] = value
+            elif not name.startswith("#"):
+                lod.selections.append(name)
+            position += size
+        lod.resolution = F32.unpack_from(view, position)[0]
+        position += 4
+        model.lods.append(lod)
+
+
+def _read_odol(view: mmap.mmap, model: P3DModel) -> None:
+    """Binarized models: only the LOD table is read; named selections are not checked."""
+    position = 8
+    if model.version >= 59:
+        position += 4  # application id
+    if model.version >= 58:
+        _, position = _asciiz(view, position)  # model prefix
+    count = U32.unpack_from(view, position)[0]
+    if count > MAX_LODS:
+        raise P3DError(f"unsupported ODOL v{model.version} header")
+    resolutions = struct.unpack_from(f"<{count}f", view, position + 4)
+    if not all(math.isfinite(value) for value in resolutions):
+        raise P3DError(f"unsupported ODOL v{model.version} header")
+    model.lods = [Lod(resolution) for resolution in resolutions]
+
+
+def read_p3d(path: Path) -> P3DModel:
+    """Parse LODs, selections and memory points; vertex and face data are skipped in the mapping."""
+    path = Path(path)
+    with path.open("rb") as handle:
+        if os.fstat(handle.fileno()).st_size < 12:
+            raise P3DError("empty or truncated file (still a scaffold placeholder?)")
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            magic = view[:4]
+            if magic not in (b"MLOD", b"ODOL"):
+                raise P3DError(f"not a P3D model (signature {magic!r})")
+            model = P3DModel(path, magic.decode("ascii"), U32.unpack_from(view, 4)[0])
+            try:
+                (_read_mlod if magic == b"MLOD" else _read_odol)(view, model)
+            except struct.error:
+                raise P3DError("truncated model data") from None
+    return model
+
+
+# --- model.cfg cross-check ----------------------------------------------------------------------
+
+
+def model_cfg_requirements(model_cfg: Path, model_class: str) -> Optional[Tuple[Set[str], Set[str]]]:
+    """Selections and memory points (axes, begin/end points) that ``CfgModels/<model_class>`` uses.
+
+    Returns None when model.cfg has no class for the model.
+    """
+    index = ConfigIndex()
+    index.merge(parse_file(model_cfg).root)
+    index.build()
+    path = f"cfgmodels/{model_class.lower()}"
+    if index.get(path) is None:
+        return None
+    sections = index.property(path, "sections") or []
+    selections = {str(item).lower() for item in sections if isinstance(item, str) and item}
+    points: Set[str] = set()
+    seen: Set[str] = set()
+    for holder in index.chains.get(path, ()):
+        animations = index.get(f"{holder}/animations")
+        if animations is None:
+            continue
+        for key in animations.classes:
+            if key in seen:
+                continue
+            seen.add(key)
+            props = index.properties(f"{holder}/animations/{key}")
+            if isinstance(props.get("selection"), str) and props["selection"]:
+                selections.add(props["selection"].lower())
+            for name in ("axis", "begin", "end"):
+                if isinstance(props.get(name), str) and props[name]:
+                    points.add(props[name].lower())
+    return selections, points
+
+
+def find_model_cfg(p3d: Path, root: Path) -> Optional[Path]:
+    """Closest model.cfg in the model's folder or its parents, without leaving ``root``."""
+    folder = p3d.parent
+    root = root if root.is_dir() else root.parent
+    while True:
+        candidate = folder / "model.cfg"
+        if candidate.is_file():
+            return candidate
+        if folder == root or folder == folder.parent:
+            return None
+        folder = folder.parent
+
+
+@dataclass
+class CheckResult:
+    path: str
+    format: str = ""
+    lods: List[Tuple[str, int, int]] = field(default_factory=list)
+    selections: int = 0
+    memory_points: int = 0
+    missing_selections: List[str] = field(default_factory=list)
+    missing_points: List[str] = field(default_factory=list)
+    note: str = ""
+    error: str = ""
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not (self.error or self.missing_selections or self.missing_points)
+
+
+def check_model(p3d: Path, root: Path) -> CheckResult:
+    started = time.perf_counter()
+    result = CheckResult(str(p3d))
+    try:
+        model = read_p3d(p3d)
+        result.format = f"{model.format} v{model.version}"
+        result.lods = [(lod.name, lod.points, lod.faces) for lod in model.lods]
+        if not model.has_selections:
+            result.note = "binarized model: selections and memory points are not checked"
+        else:
+            selections, points = model.visual_selections(), model.memory_points()
+            result.selections, result.memory_points = len(selections), len(points)
+            model_cfg = find_model_cfg(p3d, root)
+            requirements = model_cfg_requirements(model_cfg, p3d.stem) if model_cfg else None
+            if requirements is None:
+                result.note = f"no CfgModels class '{p3d.stem}' in model.cfg; nothing to check against"
+            else:
+                wanted_selections, cfg_points = requirements
+                result.missing_selections = sorted(wanted_selections - selections)
+                result.missing_points = sorted((set(REQUIRED_MEMORY_POINTS) | cfg_points) - points)
+    except (P3DError, ConfigParseError, OSError) as exc:
+        result.error = str(exc)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def iter_models(paths: Sequence[Path]) -> Iterator[Tuple[Path, Path]]:
+    """``(p3d, root)`` pairs for every model given directly or found under the given folders."""
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            for model in sorted(path.rglob("*")):
+                if model.suffix.lower() == ".p3d" and model.is_file():
+                    yield model, path
+        else:
+            yield path, path
+
+
+def check_many(paths: Sequence[Path], jobs: int = 1) -> Iterator[CheckResult]:
+    targets = list(iter_models(paths))
+    if jobs <= 1 or len(targets) <= 1:
+        for model, root in targets:
+            yield check_model(model, root)
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(targets))) as pool:
+        futures = [pool.submit(check_model, model, root) for model, root in targets]
+        for future in futures:
+            yield future.result()
+
+
+def _report(result: CheckResult, verbose: bool) -> None:
+    status = "OK" if result.ok else "FAILED"
+    if result.error:
+        print(f"{result.path}: FAILED ({result.error})")
+        return
+    print(
+        f"{result.path}: {status} ({result.format}, {len(result.lods)} LODs, {result.selections} selections, "
+        f"{result.memory_points} memory points, {result.seconds * 1000:.1f} ms)"
+    )
+    if verbose:
+        for name, points, faces in result.lods:
+            print(f"    LOD {name}: {points} points, {faces} faces")
+    if result.missing_selections:
+        print("  missing selections: " + ", ".join(result.missing_selections))
+    if result.missing_points:
+        print("  missing memory points: " + ", ".join(result.missing_points))
+    if result.note:
+        print(f"  note: {result.note}")
+
+
+def action_check(paths: Sequence[Path], jobs: int = 1, verbose: bool = False) -> int:
+    started = time.perf_counter()
+    checked = failures = 0
+    for result in check_many(paths, jobs):
+        checked += 1
+        failures += not result.ok
+        _report(result, verbose)
+    if not checked:
+        print("No .p3d models found.")
+    else:
+        print(f"\nChecked {checked} models, {failures} with problems, in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return failures
+
+
+__all__ = [
+    "CheckResult",
+    "Lod",
+    "P3DError",
+    "P3DModel",
+    "REQUIRED_MEMORY_POINTS",
+    "action_check",
+    "check_many",
+    "check_model",
+    "model_cfg_requirements",
+    "read_p3d",
+]
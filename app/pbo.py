@@ -0,0 +1,308 @@
+"""Native PBO packer/unpacker with streamed, memory-mapped file I/O."""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence
+
+HEADER = struct.Struct("<5I")
+MIME_VERS = 0x56657273  # "Vers" product entry
+MIME_STORED = 0
+PREFIX_FILE = "$PBOPREFIX$"
+EXCLUDED_NAMES = {PREFIX_FILE, "$PBOPREFIX$.txt", "$PREFIX$", ".scaffold-manifest.json", ".textures-cache.json"}
+CHUNK_SIZE = 1024 * 1024
+MAX_ENTRY_SIZE = 0xFFFFFFFF
+
+
+class PboError(ValueError):
+    """Raised for malformed PBOs or addon folders that cannot be packed."""
+
+
+@dataclass
+class PboEntry:
+    name: str
+    method: int
+    original_size: int
+    reserved: int
+    timestamp: int
+    data_size: int
+    offset: int = 0
+
+
+@dataclass
+class PboArchive:
+    path: Path
+    headers: Dict[str, str] = field(default_factory=dict)
+    entries: List[PboEntry] = field(default_factory=list)
+    data_end: int = 0
+    checksum: bytes = b""
+
+    @property
+    def prefix(self) -> str:
+        return self.headers.get("prefix", "")
+
+
+@dataclass
+class PackResult:
+    source: Path
+    output: Path
+    files: int
+    bytes_written: int
+    seconds: float
+
+    @property
+    def mb_per_sec(self) -> float:
+        return self.bytes_written / (1024 * 1024) / self.seconds if self.seconds else 0.0
+
+
+def _asciiz(value: str) -> bytes:
+    return value.encode("utf-8") + b"\0"
+
+
+def read_prefix(addon_dir: Path) -> Optional[str]:
+    for name in (PREFIX_FILE, "$PBOPREFIX$.txt"):
+        candidate = addon_dir / name
+        if candidate.is_file():
+            for line in candidate.read_text(encoding="utf-8").splitlines():
+                line = line.strip()
+                if line and "=" not in line:
+                    return line.strip("\\")
+                if line.startswith("prefix="):
+                    return line.split("=", 1)[1].strip().strip("\\")
+    return None
+
+
+def collect_files(addon_dir: Path) -> List[Path]:
+    files = [
+        path
+        for path in addon_dir.rglob("*")
+        if path.is_file() and path.name not in EXCLUDED_NAMES
+    ]
+    return sorted(files, key=lambda path: path.relative_to(addon_dir).as_posix().lower())
+
+
+class _HashingWriter:
+    def __init__(self, handle: BinaryIO) -> None:
+        self.handle = handle
+        self.digest = hashlib.sha1()
+        self.written = 0
+
+    def write(self, data) -> None:
+        self.digest.update(data)
+        self.handle.write(data)
+        self.written += len(data)
+
+
+def _copy_into(writer: _HashingWriter, path: Path, size: int) -> None:
+    if size == 0:
+        return
+    with path.open("rb") as src, mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        for start in range(0, size, CHUNK_SIZE):
+            writer.write(view[start:start + CHUNK_SIZE])
+
+
+def pack_pbo(addon_dir: Path, output: Optional[Path] = None, prefix: Optional[str] = None) -> PackResult:
+    """Pack ``addon_dir`` into a PBO; file data is mapped and streamed, never fully loaded."""
+    started = time.perf_counter()
+    addon_dir = Path(addon_dir)
+    if not addon_dir.is_dir():
+        raise PboError(f"{addon_dir} is not a directory")
+    output = Path(output) if output else addon_dir.with_suffix(".pbo")
+    prefix = prefix or read_prefix(addon_dir) or addon_dir.name
+
+    files = collect_files(addon_dir)
+    stats = [path.stat() for path in files]
+    for path, stat in zip(files, stats):
+        if stat.st_size > MAX_ENTRY_SIZE:
+            raise PboError(f"{path} is larger than the 4 GiB PBO entry limit")
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    partial = output.with_name(output.name + ".part")
+    try:
+        with partial.open("wb") as handle:
+            writer = _HashingWriter(handle)
+            writer.write(b"\0" + HEADER.pack(MIME_VERS, 0, 0, 0, 0))
+            writer.write(_asciiz("prefix") + _asciiz(prefix) + b"\0")
+            for path, stat in zip(files, stats):
+                name = str(path.relative_to(addon_dir)).replace("/", "\\")
+                writer.write(_asciiz(name) + HEADER.pack(MIME_STORED, 0, 0, int(stat.st_mtime), stat.st_size))
+            writer.write(b"\0" + HEADER.pack(0, 0, 0, 0, 0))
+            for path, stat in zip(files, stats):
+                _copy_into(writer, path, stat.st_size)
+            checksum = writer.digest.digest()
+            handle.write(b"\0" + checksum)
+            total = writer.written + 1 + len(checksum)
+        os.replace(partial, output)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    return PackResult(addon_dir, output, len(files), total, time.perf_counter() - started)
+
+
+def _read_asciiz(view: mmap.mmap, offset: int) -> tuple[str, int]:
+    end = view.find(b"\0", offset)
+    if end < 0:
+        raise PboError("Unterminated string in PBO header")
+    return view[offset:end].decode("utf-8", errors="replace"), end + 1
+
+
+def parse_archive(view: mmap.mmap, path: Path) -> PboArchive:
+    archive = PboArchive(path)
+    offset = 0
+    first = True
+    while True:
+        name, offset = _read_asciiz(view, offset)
+        if offset + HEADER.size > len(view):
+            raise PboError(f"{path} is truncated")
+        method, original, reserved, timestamp, data_size = HEADER.unpack_from(view, offset)
+        offset += HEADER.size
+        if first and not name and method == MIME_VERS:
+            while True:
+                key, offset = _read_asciiz(view, offset)
+                if not key:
+                    break
+                archive.headers[key], offset = _read_asciiz(view, offset)
+            first = False
+            continue
+        first = False
+        if not name:
+            break
+        archive.entries.append(PboEntry(name, method, original, reserved, timestamp, data_size))
+    for entry in archive.entries:
+        entry.offset = offset
+        offset += entry.data_size
+    if offset > len(view):
+        raise PboError(f"{path} is truncated")
+    archive.data_end = offset
+    if len(view) >= offset + 21 and view[offset] == 0:
+        archive.checksum = bytes(view[offset + 1:offset + 21])
+    return archive
+
+
+def read_pbo(path: Path) -> PboArchive:
+    path = Path(path)
+    with path.open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        return parse_archive(view, path)
+
+
+def verify_pbo(path: Path) -> bool:
+    path = Path(path)
+    with path.open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        archive = parse_archive(view, path)
+        digest = hashlib.sha1()
+        for start in range(0, archive.data_end, CHUNK_SIZE):
+            digest.update(view[start:min(start + CHUNK_SIZE, archive.data_end)])
+    return digest.digest() == archive.checksum
+
+
+def unpack_pbo(path: Path, destination: Path) -> PboArchive:
+    path = Path(path)
+    destination = Path(destination)
+    with path.open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        archive = parse_archive(view, path)
+        root = destination.resolve()
+        for entry in archive.entries:
+            if entry.method != MIME_STORED:
+                raise PboError(f"{entry.name}: compressed PBO entries are not supported")
+            target = (destination / entry.name.replace("\\", "/")).resolve()
+            if root not in target.parents:
+                raise PboError(f"{entry.name}: refusing to extract outside {destination}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with target.open("wb") as out:
+                end = entry.offset + entry.data_size
+                for start in range(entry.offset, end, CHUNK_SIZE):
+                    out.write(view[start:min(start + CHUNK_SIZE, end)])
+            if entry.timestamp:
+                os.utime(target, (entry.timestamp, entry.timestamp))
+    if archive.prefix:
+        (destination / PREFIX_FILE).write_text(archive.prefix + "\n", encoding="utf-8")
+    return archive
+
+
+def pack_many(addon_dirs: Sequence[Path], output_dir: Optional[Path] = None, jobs: int = 1) -> Iterator[PackResult]:
+    targets = [
+        (Path(addon), Path(output_dir) / f"{Path(addon).name}.pbo" if output_dir else None)
+        for addon in addon_dirs
+    ]
+    if jobs <= 1 or len(targets) <= 1:
+        for addon, output in targets:
+            yield pack_pbo(addon, output)
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(targets))) as pool:
+        futures = [pool.submit(pack_pbo, addon, output) for addon, output in targets]
+        for future in futures:
+            yield future.result()
+
+
+def action_pack(
+    addon_dirs: Sequence[Path],
+    output_dir: Optional[Path] = None,
+    prefix: Optional[str] = None,
+    jobs: int = 1,
+    store: Optional[Path] = None,
+    link_mode: str = "hardlink",
+) -> None:
+    started = time.perf_counter()
+    if store is not None:
+        from app.store import AssetStore, dedupe_report
+
+        asset_store = AssetStore(store, link_mode)
+        for addon in addon_dirs:
+            print(dedupe_report(asset_store.dedupe_addon(Path(addon))))
+    if prefix:
+        if len(addon_dirs) != 1:
+            raise PboError("--prefix can only be used when packing a single addon")
+        output = Path(output_dir) / f"{Path(addon_dirs[0]).name}.pbo" if output_dir else None
+        results = iter([pack_pbo(addon_dirs[0], output, prefix)])
+    else:
+        results = pack_many(addon_dirs, output_dir, jobs)
+    total_bytes = 0
+    for result in results:
+        total_bytes += result.bytes_written
+        print(
+            f"Packed {result.source} -> {result.output} "
+            f"({result.files} files, {result.bytes_written / 1024:.1f} KiB, {result.mb_per_sec:.1f} MB/s)"
+        )
+    elapsed = time.perf_counter() - started
+    if len(addon_dirs) > 1 and elapsed:
+        print(f"\nTotal: {total_bytes / (1024 * 1024):.2f} MB in {elapsed:.2f}s ({total_bytes / (1024 * 1024) / elapsed:.1f} MB/s)")
+
+
+def action_list(path: Path) -> None:
+    archive = read_pbo(path)
+    print(f"{path} (prefix: {archive.prefix or '-'})")
+    for entry in archive.entries:
+        print(f"  {entry.data_size:>12}  {entry.name}")
+    print(f"{len(archive.entries)} files, SHA1 {archive.checksum.hex() or 'missing'}")
+
+
+def action_unpack(path: Path, destination: Optional[Path] = None) -> None:
+    destination = Path(destination) if destination else Path(path).with_suffix("")
+    if not verify_pbo(path):
+        print(f"Warning: {path} SHA1 trailer does not match its contents.")
+    archive = unpack_pbo(path, destination)
+    print(f"Extracted {len(archive.entries)} files from {path} into {destination}")
+
+
+__all__ = [
+    "PackResult",
+    "PboArchive",
+    "PboEntry",
+    "PboError",
+    "action_list",
+    "action_pack",
+    "action_unpack",
+    "pack_many",
+    "pack_pbo",
+    "parse_archive",
+    "read_pbo",
+    "unpack_pbo",
+    "verify_pbo",
+]
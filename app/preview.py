@@ -0,0 +1,111 @@
+"""Incremental config previews for the scaffold form.
+
+Each browser session keeps its last form values, template kwargs and rendered segments here. A keystroke
+sends only the changed form fields. Only kwargs whose values actually changed are looked at, and only the
+template segments that read them are re-rendered. The reply carries just the segments whose text changed.
+"""
+
+from __future__ import annotations
+
+import secrets
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Mapping, Optional
+
+from app.main import CONFIG_TEMPLATE, MODEL_CFG_TEMPLATE, ScaffoldContext
+from app.templating import CompiledTemplate
+
+PREVIEW_TEMPLATES: Dict[str, CompiledTemplate] = {"config.cpp": CONFIG_TEMPLATE, "model.cfg": MODEL_CFG_TEMPLATE}
+DEFAULT_MAX_SESSIONS = 4096
+
+
+class UnknownSession(KeyError):
+    """The session expired or lives in another worker process; the client must resend every field."""
+
+
+@dataclass
+class PreviewState:
+    values: Dict[str, str]
+    kwargs: Dict[str, object] = field(default_factory=dict)
+    segments: Dict[str, List[str]] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+@dataclass
+class PreviewUpdate:
+    session: str
+    full: bool
+    # file -> every segment (full) or {segment index: text} for the segments that changed
+    files: Dict[str, object]
+    error: str = ""
+
+
+class PreviewSessions:
+    """LRU of preview sessions; a session's state is only touched under its own lock."""
+
+    def __init__(
+        self, build_context: Callable[[Mapping[str, str]], ScaffoldContext], max_sessions: int = DEFAULT_MAX_SESSIONS
+    ) -> None:
+        self.build_context = build_context
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, PreviewState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, session: str) -> PreviewState:
+        with self._lock:
+            state = self._sessions.get(session)
+            if state is None:
+                raise UnknownSession(session)
+            self._sessions.move_to_end(session)
+            return state
+
+    def _store(self, state: PreviewState) -> str:
+        session = secrets.token_urlsafe(12)
+        with self._lock:
+            self._sessions[session] = state
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def update(self, session: Optional[str], fields: Mapping[str, str]) -> PreviewUpdate:
+        """Apply changed form ``fields``; without a ``session`` they are the complete form."""
+        if not session:
+            state = PreviewState(dict(fields))
+            error = self._render_full(state)
+            return PreviewUpdate(self._store(state), True, dict(state.segments), error)
+        state = self._lookup(session)
+        with state.lock:
+            state.values.update(fields)
+            if not state.kwargs:
+                # The last full render failed validation, so there is nothing to diff against yet.
+                error = self._render_full(state)
+                return PreviewUpdate(session, True, dict(state.segments), error)
+            try:
+                kwargs = self.build_context(state.values).to_format_kwargs()
+            except ValueError as exc:
+                return PreviewUpdate(session, False, {}, str(exc))
+            changed = {key for key, value in kwargs.items() if state.kwargs.get(key) != value}
+            state.kwargs = kwargs
+            files: Dict[str, object] = {}
+            for name, template in PREVIEW_TEMPLATES.items():
+                if not template.fields & changed:
+                    continue
+                updates = template.rerender(kwargs, state.segments[name], changed)
+                for index, text in updates.items():
+                    state.segments[name][index] = text
+                if updates:
+                    files[name] = updates
+            return PreviewUpdate(session, False, files)
+
+    def _render_full(self, state: PreviewState) -> str:
+        try:
+            state.kwargs = self.build_context(state.values).to_format_kwargs()
+        except ValueError as exc:
+            state.kwargs, state.segments = {}, {}
+            return str(exc)
+        state.segments = {name: template.render_segments(state.kwargs) for name, template in PREVIEW_TEMPLATES.items()}
+        return ""
+
+
+__all__ = ["PREVIEW_TEMPLATES", "PreviewSessions", "PreviewUpdate", "UnknownSession"]
@@ -0,0 +1,206 @@
+"""Opt-in profiling for CLI subcommands and sampled web requests, plus a startup/import breakdown.
+
+Nothing here is imported unless ``--profile`` or ``--trace-startup`` is given, so normal runs pay nothing.
+A profile is written as ``<out>.pstats`` (cProfile, for ``pstats``/snakeviz) and ``<out>.collapsed``
+(sampled stacks, one ``frame;frame;frame count`` line each, for flamegraph.pl or speedscope).
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple, TypeVar
+
+SAMPLE_INTERVAL = 0.001
+PROFILE_HEADER = "X-Profile"
+STARTUP_TRACE_ENV = "ARMA_TRACE_STARTUP"
+STARTUP_MARK = "arma-startup"
+IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+T = TypeVar("T")
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack every ``interval`` seconds into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL) -> None:
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{getattr(code, 'co_qualname', code.co_name)} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class Profiler:
+    """cProfile for exact call counts plus a stack sampler for flame graphs, both on the calling thread.
+
+    The sampler also sees cProfile's own per-call overhead, so call-heavy code looks a little wider in the
+    flame graph than it would unprofiled."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL) -> None:
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), interval)
+
+    def start(self) -> None:
+        self.sampler.start()
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+        self.sampler.stop()
+
+    def write(self, out: Path) -> Tuple[Path, Path]:
+        out = Path(out)
+        if out.suffix in (".pstats", ".collapsed"):
+            out = out.with_suffix("")
+        out.parent.mkdir(parents=True, exist_ok=True)
+        stats_path = out.with_name(out.name + ".pstats")
+        collapsed_path = out.with_name(out.name + ".collapsed")
+        self.profile.dump_stats(stats_path)
+        collapsed_path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in sorted(self.sampler.stacks.items())), encoding="utf-8"
+        )
+        return stats_path, collapsed_path
+
+
+def profile_call(function: Callable[[], T], out: Path, top: int = 15) -> T:
+    """Run ``function`` under a profiler, write the profile even if it raises, and print the top entries."""
+    profiler = Profiler()
+    profiler.start()
+    try:
+        return function()
+    finally:
+        profiler.stop()
+        stats_path, collapsed_path = profiler.write(out)
+        report = io.StringIO()
+        pstats.Stats(str(stats_path), stream=report).sort_stats("cumulative").print_stats(top)
+        print(report.getvalue(), file=sys.stderr)
+        print(
+            f"Profile written to {stats_path} and {collapsed_path} "
+            f"({sum(profiler.sampler.stacks.values())} samples)",
+            file=sys.stderr,
+        )
+
+
+class ProfilingMiddleware:
+    """Profiles single requests that carry an ``X-Profile`` header, including their streamed bodies.
+
+    Profiles are written to ``directory`` and named in an ``X-Profile-Output`` response header."""
+
+    def __init__(self, app: Callable, directory: Path) -> None:
+        self.app = app
+        self.directory = Path(directory)
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _output(self, environ: Dict[str, object]) -> Path:
+        with self._lock:
+            self._counter += 1
+            counter = self._counter
+        route = re.sub(r"[^A-Za-z0-9]+", "_", str(environ.get("PATH_INFO", "/"))).strip("_") or "index"
+        return self.directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{counter}-{environ.get('REQUEST_METHOD', 'GET')}-{route}"
+
+    def __call__(self, environ: Dict[str, object], start_response: Callable) -> Iterable[bytes]:
+        if "HTTP_X_PROFILE" not in environ:
+            return self.app(environ, start_response)
+        out = self._output(environ)
+
+        def start_with_header(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            return start_response(status, headers + [("X-Profile-Output", out.name)], exc_info)
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            body = self.app(environ, start_with_header)
+        except BaseException:
+            profiler.stop()
+            profiler.write(out)
+            raise
+        return self._profiled_body(body, profiler, out)
+
+    @staticmethod
+    def _profiled_body(body: Iterable[bytes], profiler: Profiler, out: Path) -> Iterable[bytes]:
+        try:
+            yield from body
+        finally:
+            close = getattr(body, "close", None)
+            if close is not None:
+                close()
+            profiler.stop()
+            profiler.write(out)
+
+
+def startup_mark(phase: str) -> None:
+    """Report a startup phase to a parent ``--trace-startup`` run (only called when it is tracing)."""
+    print(f"{STARTUP_MARK} {phase} {time.time():.6f}", file=sys.stderr, flush=True)
+
+
+def trace_startup(argv: List[str], top: int = 20) -> int:
+    """Re-run the command under ``-X importtime`` and break its startup down into phases and imports."""
+    argv = [arg for arg in argv if arg != "--trace-startup"]
+    env = dict(os.environ, **{STARTUP_TRACE_ENV: "1"})
+    started = time.time()
+    child = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "app", *argv], env=env, stderr=subprocess.PIPE, text=True
+    )
+    finished = time.time()
+    marks: List[Tuple[str, float]] = []
+    imports: List[Tuple[int, int, str]] = []
+    for line in child.stderr.splitlines():
+        if line.startswith(STARTUP_MARK):
+            _, phase, stamp = line.split()
+            marks.append((phase, float(stamp)))
+        elif match := IMPORT_TIME.match(line):
+            self_us, cumulative_us, indent, name = match.groups()
+            # importtime indents nested imports by two spaces per level; only top-level ones add up.
+            if len(indent) == 1:
+                imports.append((int(cumulative_us), int(self_us), name))
+        elif not line.startswith("import time:"):
+            print(line, file=sys.stderr)
+
+    print("\nStartup phases (wall clock from process spawn):", file=sys.stderr)
+    previous = started
+    for phase, stamp in marks + [("exit", finished)]:
+        print(f"  {phase:<18} +{(stamp - previous) * 1000:8.1f} ms  (at {(stamp - started) * 1000:8.1f} ms)", file=sys.stderr)
+        previous = stamp
+    total_imports = sum(cumulative for cumulative, _, _ in imports)
+    print(f"\nImports: {total_imports / 1000:.1f} ms across {len(imports)} top-level modules; slowest:", file=sys.stderr)
+    for cumulative, own, name in sorted(imports, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  (self {own / 1000:6.1f} ms)  {name}", file=sys.stderr)
+    return child.returncode
+
+
+__all__ = [
+    "PROFILE_HEADER",
+    "Profiler",
+    "ProfilingMiddleware",
+    "STARTUP_TRACE_ENV",
+    "StackSampler",
+    "profile_call",
+    "startup_mark",
+    "trace_startup",
+]
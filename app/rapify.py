@@ -0,0 +1,376 @@
+"""Rapify parsed configs into binary ``config.bin`` (raP) and derapify them back to text."""
+
+from __future__ import annotations
+
+import ast
+import io
+import math
+import operator
+import os
+import re
+import struct
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+
+from app.cfgparse import ConfigClass, ConfigParseError, Expression, Value, parse_file, parse_text
+
+SIGNATURE = b"\0raP"
+HEADER = struct.Struct("<4sIII")
+U32 = struct.Struct("<I")
+I32 = struct.Struct("<i")
+F32 = struct.Struct("<f")
+
+ENTRY_CLASS, ENTRY_VALUE, ENTRY_ARRAY, ENTRY_EXTERN, ENTRY_DELETE, ENTRY_APPEND = range(6)
+TYPE_STRING, TYPE_FLOAT, TYPE_LONG, TYPE_ARRAY, TYPE_VARIABLE = range(5)
+
+DB_RE = re.compile(r"db\s*([+-]?\s*\d+(?:\.\d*)?)\Z", re.IGNORECASE)
+BOOLEANS = {"true": 1, "false": 0}
+_OPERATORS: Dict[type, Callable] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+
+class RapifyError(ValueError):
+    """Raised for malformed config.bin files."""
+
+
+# --- writing ------------------------------------------------------------------------------------
+
+
+def _compressed_int(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _asciiz(text: str) -> bytes:
+    return text.encode("utf-8") + b"\0"
+
+
+def _arithmetic(node: ast.AST) -> float:
+    if isinstance(node, ast.Expression):
+        return _arithmetic(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+        return _OPERATORS[type(node.op)](_arithmetic(node.left), _arithmetic(node.right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _OPERATORS:
+        return _OPERATORS[type(node.op)](_arithmetic(node.operand))
+    raise ValueError("not a constant expression")
+
+
+def evaluate(expression: str) -> Optional[Union[int, float]]:
+    """Fold the constant expressions the binarizer evaluates (``db-5``, ``true``, ``1/3``); None otherwise."""
+    text = expression.strip()
+    if text.lower() in BOOLEANS:
+        return BOOLEANS[text.lower()]
+    match = DB_RE.match(text)
+    if match:
+        return 10 ** (float(match.group(1).replace(" ", "")) / 20)
+    try:
+        value = _arithmetic(ast.parse(text, mode="eval"))
+    except (SyntaxError, ValueError, ZeroDivisionError, RecursionError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _scalar(value: Value) -> Tuple[int, bytes]:
+    if isinstance(value, Expression):
+        folded = evaluate(value)
+        value = str(value) if folded is None else folded
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        if -0x80000000 <= value <= 0x7FFFFFFF:
+            return TYPE_LONG, I32.pack(value)
+        value = float(value)
+    if isinstance(value, float):
+        return TYPE_FLOAT, F32.pack(value)
+    return TYPE_STRING, _asciiz(str(value))
+
+
+def _array(items: List[Value]) -> bytes:
+    parts = [_compressed_int(len(items))]
+    for item in items:
+        if isinstance(item, list):
+            parts.append(bytes([TYPE_ARRAY]) + _array(item))
+        else:
+            kind, data = _scalar(item)
+            parts.append(bytes([kind]) + data)
+    return b"".join(parts)
+
+
+class _Writer:
+    """Writes class bodies depth-first, patching each class entry's offset once its body is placed."""
+
+    def __init__(self, out: BinaryIO) -> None:
+        self.out = out
+        self.base = out.tell()
+
+    def position(self) -> int:
+        return self.out.tell() - self.base
+
+    def body(self, cls: ConfigClass) -> None:
+        entries: List[bytes] = []
+        for name, value in cls.properties.items():
+            if isinstance(value, list):
+                if name in cls.appends:
+                    entries.append(bytes([ENTRY_APPEND]) + U32.pack(1) + _asciiz(name) + _array(value))
+                else:
+                    entries.append(bytes([ENTRY_ARRAY]) + _asciiz(name) + _array(value))
+            else:
+                kind, data = _scalar(value)
+                entries.append(bytes([ENTRY_VALUE, kind]) + _asciiz(name) + data)
+        pending: List[Tuple[ConfigClass, int]] = []
+        self.out.write(_asciiz(cls.parent or ""))
+        count = len(entries) + len(cls.classes) + len(cls.deletes)
+        self.out.write(_compressed_int(count))
+        for entry in entries:
+            self.out.write(entry)
+        for child in cls.classes.values():
+            if child.external:
+                self.out.write(bytes([ENTRY_EXTERN]) + _asciiz(child.name))
+                continue
+            self.out.write(bytes([ENTRY_CLASS]) + _asciiz(child.name))
+            pending.append((child, self.position()))
+            self.out.write(U32.pack(0))
+        for name in cls.deletes:
+            self.out.write(bytes([ENTRY_DELETE]) + _asciiz(name))
+        for child, slot in pending:
+            start = self.position()
+            self.out.seek(self.base + slot)
+            self.out.write(U32.pack(start))
+            self.out.seek(self.base + start)
+            self.body(child)
+
+
+def rapify(root: ConfigClass, out: BinaryIO) -> int:
+    """Write ``root`` as raP to a seekable stream; returns the number of bytes written."""
+    writer = _Writer(out)
+    out.write(HEADER.pack(SIGNATURE, 0, 8, 0))
+    writer.body(root)
+    enums = writer.position()
+    out.write(U32.pack(0))  # no enums
+    end = writer.position()
+    out.seek(writer.base + 12)
+    out.write(U32.pack(enums))
+    out.seek(writer.base + end)
+    return end
+
+
+def rapify_text(text: str, source: str = "config.cpp") -> bytes:
+    buffer = io.BytesIO()
+    rapify(parse_text(text, source), buffer)
+    return buffer.getvalue()
+
+
+def rapify_file(source: Path, output: Optional[Path] = None) -> Path:
+    """Parse ``source`` and stream its binary form straight into ``output`` (default: ``config.bin`` beside it)."""
+    source = Path(source)
+    output = Path(output) if output else source.with_suffix(".bin")
+    root = parse_file(source, include_dirs=[source.parent]).root
+    temp = output.with_name(f".{output.name}.tmp")
+    try:
+        with temp.open("wb") as handle:
+            rapify(root, handle)
+        os.replace(temp, output)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    return output
+
+
+# --- reading ------------------------------------------------------------------------------------
+
+
+class _Reader:
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+
+    def asciiz(self, position: int) -> Tuple[str, int]:
+        end = self.data.find(b"\0", position)
+        if end < 0:
+            raise RapifyError(f"unterminated string at offset {position}")
+        return self.data[position:end].decode("utf-8", "replace"), end + 1
+
+    def compressed_int(self, position: int) -> Tuple[int, int]:
+        value = shift = 0
+        while True:
+            byte = self.data[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return value, position
+            shift += 7
+
+    def scalar(self, kind: int, position: int) -> Tuple[Value, int]:
+        if kind in (TYPE_STRING, TYPE_VARIABLE):
+            text, position = self.asciiz(position)
+            return (Expression(text) if kind == TYPE_VARIABLE else text), position
+        if kind == TYPE_FLOAT:
+            return F32.unpack_from(self.data, position)[0], position + 4
+        if kind == TYPE_LONG:
+            return I32.unpack_from(self.data, position)[0], position + 4
+        raise RapifyError(f"unknown value type {kind} at offset {position}")
+
+    def array(self, position: int) -> Tuple[List[Value], int]:
+        count, position = self.compressed_int(position)
+        items: List[Value] = []
+        for _ in range(count):
+            kind = self.data[position]
+            if kind == TYPE_ARRAY:
+                item, position = self.array(position + 1)
+            else:
+                item, position = self.scalar(kind, position + 1)
+            items.append(item)
+        return items, position
+
+    def body(self, cls: ConfigClass, position: int, depth: int = 0) -> None:
+        if depth > 64:
+            raise RapifyError("class nesting too deep")
+        parent, position = self.asciiz(position)
+        cls.parent = parent or None
+        count, position = self.compressed_int(position)
+        for _ in range(count):
+            kind = self.data[position]
+            position += 1
+            if kind == ENTRY_CLASS:
+                name, position = self.asciiz(position)
+                offset = U32.unpack_from(self.data, position)[0]
+                position += 4
+                child = ConfigClass(name)
+                self.body(child, offset, depth + 1)
+                cls.classes[name.lower()] = child
+            elif kind == ENTRY_VALUE:
+                subtype = self.data[position]
+                name, position = self.asciiz(position + 1)
+                cls.properties[name], position = self.scalar(subtype, position)
+            elif kind in (ENTRY_ARRAY, ENTRY_APPEND):
+                if kind == ENTRY_APPEND:
+                    position += 4
+                name, position = self.asciiz(position)
+                cls.properties[name], position = self.array(position)
+                if kind == ENTRY_APPEND:
+                    cls.appends.add(name)
+            elif kind == ENTRY_EXTERN:
+                name, position = self.asciiz(position)
+                cls.classes[name.lower()] = ConfigClass(name, external=True)
+            elif kind == ENTRY_DELETE:
+                name, position = self.asciiz(position)
+                cls.deletes.append(name)
+            else:
+                raise RapifyError(f"unknown entry type {kind} at offset {position - 1}")
+
+
+def derapify(data: bytes) -> ConfigClass:
+    if len(data) < HEADER.size or data[:4] != SIGNATURE:
+        raise RapifyError("not a rapified config (missing raP signature)")
+    root = ConfigClass("")
+    try:
+        _Reader(data).body(root, HEADER.size)
+    except (IndexError, struct.error):
+        raise RapifyError("truncated config.bin") from None
+    return root
+
+
+def _float_text(value: float) -> str:
+    """Shortest decimal that reads back to the same float32."""
+    packed = F32.pack(value)
+    for digits in range(6, 10):
+        text = f"{value:.{digits}g}"
+        if F32.pack(float(text)) == packed:
+            break
+    if "e" not in text and "." not in text and "n" not in text:
+        text += ".0"
+    return text
+
+
+def _value_text(value: Value) -> str:
+    if isinstance(value, list):
+        return "{" + ", ".join(_value_text(item) for item in value) + "}"
+    if isinstance(value, Expression):
+        return str(value)
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    if isinstance(value, float):
+        return _float_text(value)
+    return str(value)
+
+
+def config_text(cls: ConfigClass, indent: int = 0) -> str:
+    """Config source for a class body (the root's entries when ``cls`` is the root)."""
+    pad = "    " * indent
+    lines: List[str] = []
+    for name, value in cls.properties.items():
+        if isinstance(value, list):
+            operator_text = "+=" if name in cls.appends else "="
+            lines.append(f"{pad}{name}[] {operator_text} {_value_text(value)};")
+        else:
+            lines.append(f"{pad}{name} = {_value_text(value)};")
+    for child in cls.classes.values():
+        header = f"class {child.name}" + (f": {child.parent}" if child.parent else "")
+        if child.external:
+            lines.append(f"{pad}{header};")
+        else:
+            lines.append(f"{pad}{header} {{")
+            body = config_text(child, indent + 1)
+            if body:
+                lines.append(body)
+            lines.append(f"{pad}}};")
+    for name in cls.deletes:
+        lines.append(f"{pad}delete {name};")
+    return "\n".join(lines)
+
+
+def derapify_file(source: Path, output: Optional[Path] = None) -> Path:
+    source = Path(source)
+    output = Path(output) if output else source.with_suffix(".cpp")
+    output.write_text(config_text(derapify(source.read_bytes())) + "\n", encoding="utf-8")
+    return output
+
+
+def action_rapify(paths: List[Path], output: Optional[Path] = None) -> None:
+    if output and len(paths) > 1:
+        raise RapifyError("--output can only be used with a single input file")
+    for path in paths:
+        started = time.perf_counter()
+        try:
+            target = rapify_file(path, output)
+        except (ConfigParseError, OSError) as exc:
+            raise RapifyError(f"{path}: {exc}") from None
+        size = target.stat().st_size
+        print(f"Rapified {path} -> {target} ({size / 1024:.1f} KiB in {(time.perf_counter() - started) * 1000:.1f} ms)")
+
+
+def action_derapify(paths: List[Path], output: Optional[Path] = None) -> None:
+    if output and len(paths) > 1:
+        raise RapifyError("--output can only be used with a single input file")
+    for path in paths:
+        target = derapify_file(path, output)
+        print(f"Derapified {path} -> {target}")
+
+
+__all__ = [
+    "RapifyError",
+    "action_derapify",
+    "action_rapify",
+    "config_text",
+    "derapify",
+    "derapify_file",
+    "evaluate",
+    "rapify",
+    "rapify_file",
+    "rapify_text",
+]
@@ -0,0 +1,466 @@
+"""Pre-fork WSGI server: N worker processes x M threads sharing one listening socket."""
+
+from __future__ import annotations
+
+import os
+import selectors
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from werkzeug.exceptions import InternalServerError
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler, connection_dropped_errors
+from werkzeug.wsgi import LimitedStream
+
+DEFAULT_BACKLOG = 128
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_KEEP_ALIVE = 5.0
+MAX_DRAIN_BYTES = 64 * 1024
+MAX_DISCARD_BYTES = 1024 * 1024 * 1024
+DEFAULT_GRACE = 20.0
+
+
+class KeepAliveHandler(WSGIRequestHandler):
+    """HTTP/1.1 handler with persistent connections, serving one request per call to ``handle``.
+
+    Werkzeug's own ``run_wsgi`` always answers ``Connection: close``, because it cannot tell where a request
+    body ends. This one reads bodies through a ``LimitedStream`` and drains what the app left unread, so the
+    next request line is where it should be. ``timeout`` bounds every socket read and write; it is not a limit
+    on how long the app may take to produce a response."""
+
+    protocol_version = "HTTP/1.1"
+    timeout: Optional[float] = DEFAULT_TIMEOUT
+
+    def handle(self) -> None:
+        try:
+            self.handle_one_request()
+        except (ConnectionError, socket.timeout) as exc:
+            self.close_connection = True
+            self.connection_dropped(exc)
+        if getattr(self.server, "draining", False):
+            self.close_connection = True
+
+    def run_wsgi(self) -> None:
+        if self.headers.get("Expect", "").lower().strip(" \t") == "100-continue":
+            self.wfile.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        environ = self.environ = self.make_environ()
+        body: Optional[LimitedStream] = None
+        if environ.get("wsgi.input_terminated"):
+            # Chunked request bodies cannot be drained cheaply; answer them and close.
+            self.close_connection = True
+        else:
+            try:
+                length = max(int(environ.get("CONTENT_LENGTH") or 0), 0)
+            except ValueError:
+                length, self.close_connection = 0, True
+            body = LimitedStream(self.rfile, length)
+            environ["wsgi.input"] = body
+        state: Dict[str, object] = {"status": None, "headers": None, "sent": False, "chunked": False, "body": body}
+
+        def write(data: bytes) -> None:
+            if not state["sent"]:
+                self._send_head(environ, state)
+            if data:
+                if state["chunked"]:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                else:
+                    self.wfile.write(data)
+            self.wfile.flush()
+
+        def start_response(status, headers, exc_info=None):  # type: ignore[no-untyped-def]
+            if exc_info:
+                try:
+                    if state["sent"]:
+                        raise exc_info[1].with_traceback(exc_info[2])
+                finally:
+                    exc_info = None
+            elif state["headers"] is not None:
+                raise AssertionError("Headers already set")
+            state["status"], state["headers"] = status, headers
+            return write
+
+        def execute(app) -> None:  # type: ignore[no-untyped-def]
+            iterable = app(environ, start_response)
+            try:
+                for data in iterable:
+                    write(data)
+                if not state["sent"]:
+                    write(b"")
+                if state["chunked"]:
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+            finally:
+                if hasattr(iterable, "close"):
+                    iterable.close()
+
+        try:
+            execute(self.server.app)
+        except connection_dropped_errors as exc:
+            self.close_connection = True
+            self.connection_dropped(exc, environ)
+            return
+        except Exception as exc:
+            if self.server.passthrough_errors:
+                raise
+            self.server.log("error", f"Error on request {self.command} {self.path}: {exc!r}")
+            if state["sent"]:
+                # Half a response is on the wire; the only way to tell the client is to hang up.
+                self.close_connection = True
+                return
+            state["status"] = state["headers"] = None
+            try:
+                execute(InternalServerError())
+            except Exception:
+                self.close_connection = True
+                return
+        if body is not None:
+            self._drain(body)
+
+    def _send_head(self, environ: Dict[str, object], state: Dict[str, object]) -> None:
+        status, headers = str(state["status"]), list(state["headers"])  # type: ignore[arg-type]
+        code_text, _, message = status.partition(" ")
+        code = int(code_text)
+        names = {name.lower() for name, _ in headers}
+        body = state["body"]
+        if isinstance(body, LimitedStream) and body.limit - body.tell() > MAX_DRAIN_BYTES:
+            # The app left most of a large body unread (a rejected upload): not worth draining.
+            self.close_connection = True
+        bodiless = environ["REQUEST_METHOD"] == "HEAD" or 100 <= code < 200 or code in (204, 304)
+        if "content-length" not in names and not bodiless:
+            if self.request_version == "HTTP/1.1":
+                state["chunked"] = True
+                headers.append(("Transfer-Encoding", "chunked"))
+            else:
+                # HTTP/1.0 has no chunking: the end of the body is the end of the connection.
+                self.close_connection = True
+        if self.close_connection:
+            headers.append(("Connection", "close"))
+        elif self.request_version != "HTTP/1.1":
+            headers.append(("Connection", "keep-alive"))
+        self.send_response(code, message)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        state["sent"] = True
+
+    def _drain(self, body: LimitedStream) -> None:
+        """Skip request body bytes the app did not read, so the next request line is next on the socket.
+
+        Large leftovers (a rejected upload) close the connection instead. Like Werkzeug, whatever the client
+        is still sending is read and discarded for a moment first, so it sees the response and not a reset."""
+        remaining = body.limit - body.tell()
+        if not remaining:
+            return
+        if remaining <= MAX_DRAIN_BYTES and not self.close_connection:
+            body.exhaust()
+            return
+        self.close_connection = True
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.connection, selectors.EVENT_READ)
+            discarded = 0
+            while discarded < MAX_DISCARD_BYTES and selector.select(timeout=0.01):
+                data = self.connection.recv(1024 * 1024)
+                if not data:
+                    break
+                discarded += len(data)
+
+
+def handler_with_timeout(timeout: float) -> type:
+    return type("TimedKeepAliveHandler", (KeepAliveHandler,), {"timeout": timeout})
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Hands each request to a fixed thread pool; accepting pauses while all threads are busy.
+
+    A connection holds a thread only while a request is being served. Between requests, keep-alive
+    connections wait in a selector for up to ``keep_alive`` seconds (0 closes after every response), so
+    idle clients cannot starve the pool."""
+
+    multithread = True
+    daemon_threads = True
+
+    def __init__(self, *args, threads: int = 4, keep_alive: float = DEFAULT_KEEP_ALIVE, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+        self.slots = threading.BoundedSemaphore(threads)
+        self.keep_alive = keep_alive
+        self.draining = False
+        self._idle = selectors.DefaultSelector()
+        self._idle_lock = threading.Lock()
+        self._wake_read, self._wake_write = socket.socketpair()
+        self._idle.register(self._wake_read, selectors.EVENT_READ)
+        threading.Thread(target=self._watch_idle, name="http-idle", daemon=True).start()
+
+    def process_request(self, request, client_address) -> None:  # type: ignore[override]
+        # Excess connections wait in the kernel accept queue (bounded by the listen backlog).
+        self.slots.acquire()
+        try:
+            handler = self._open(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+            self.shutdown_request(request)
+            self.slots.release()
+            return
+        self.pool.submit(self._serve, handler)
+
+    def _open(self, request, client_address) -> WSGIRequestHandler:
+        # BaseRequestHandler.__init__ would serve exactly one connection start to finish; the handler is
+        # kept across requests instead so its buffered reader survives while the connection is idle.
+        handler = self.RequestHandlerClass.__new__(self.RequestHandlerClass)
+        handler.request, handler.client_address, handler.server = request, client_address, self
+        handler.setup()
+        return handler
+
+    def _serve(self, handler: WSGIRequestHandler) -> None:
+        parked = False
+        try:
+            while True:
+                handler.close_connection = True
+                handler.handle()
+                if handler.close_connection or self.keep_alive <= 0:
+                    break
+                if not self._buffered(handler):
+                    parked = self._park(handler)
+                    break
+        except Exception:
+            self.handle_error(handler.request, handler.client_address)
+        finally:
+            if not parked:
+                self._close(handler)
+            self.slots.release()
+
+    @staticmethod
+    def _buffered(handler: WSGIRequestHandler) -> bool:
+        """Whether a pipelined request is already sitting in the handler's read buffer."""
+        connection = handler.connection
+        timeout = connection.gettimeout()
+        connection.settimeout(0)
+        try:
+            return bool(handler.rfile.peek(1))
+        except (BlockingIOError, OSError):
+            return False
+        finally:
+            connection.settimeout(timeout)
+
+    def _park(self, handler: WSGIRequestHandler) -> bool:
+        with self._idle_lock:
+            if self.draining:
+                return False
+            self._idle.register(handler.connection, selectors.EVENT_READ, (handler, time.monotonic() + self.keep_alive))
+        self._wake_write.send(b"\0")
+        return True
+
+    def _watch_idle(self) -> None:
+        while True:
+            ready = self._idle.select(timeout=0.5)
+            now = time.monotonic()
+            resume = []
+            with self._idle_lock:
+                for key, _ in ready:
+                    if key.fileobj is self._wake_read:
+                        self._wake_read.recv(4096)
+                        continue
+                    self._idle.unregister(key.fileobj)
+                    resume.append(key.data[0])
+                for key in list(self._idle.get_map().values()):
+                    if key.fileobj is not self._wake_read and (key.data[1] <= now or self.draining):
+                        self._idle.unregister(key.fileobj)
+                        self._close(key.data[0])
+            for handler in resume:
+                self.slots.acquire()
+                self.pool.submit(self._serve, handler)
+
+    def _close(self, handler: WSGIRequestHandler) -> None:
+        try:
+            handler.finish()
+        except OSError:
+            pass
+        self.shutdown_request(handler.request)
+
+    def shutdown(self) -> None:
+        # Stop accepting, close idle connections, and have in-flight requests answer with Connection: close.
+        self.draining = True
+        self._wake_write.send(b"\0")
+        super().shutdown()
+
+    def drain(self) -> None:
+        self.pool.shutdown(wait=True)
+
+
+def serve_worker(
+    app, listener: socket.socket, threads: int, timeout: float, keep_alive: float = DEFAULT_KEEP_ALIVE
+) -> None:
+    host, port = listener.getsockname()[:2]
+    server = PooledWSGIServer(
+        host,
+        port,
+        app,
+        handler=handler_with_timeout(timeout),
+        fd=listener.fileno(),
+        threads=threads,
+        keep_alive=keep_alive,
+    )
+    server.socket.setblocking(False)  # several workers select() on the same socket; losers just retry
+
+    def stop(signum, frame) -> None:
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is handled by the master
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    server.serve_forever(poll_interval=0.5)
+    server.drain()
+    server.server_close()
+
+
+class PreforkServer:
+    """Master process: forks workers, respawns crashed ones, reloads on SIGHUP, stops on SIGTERM/SIGINT."""
+
+    def __init__(
+        self,
+        app_factory: Callable[[], object],
+        host: str,
+        port: int,
+        workers: int = 2,
+        threads: int = 4,
+        timeout: float = DEFAULT_TIMEOUT,
+        backlog: int = DEFAULT_BACKLOG,
+        grace: float = DEFAULT_GRACE,
+        keep_alive: float = DEFAULT_KEEP_ALIVE,
+    ) -> None:
+        self.app_factory = app_factory
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.threads = threads
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.backlog = backlog
+        self.grace = grace
+        self.children: Dict[int, int] = {}  # pid -> generation
+        self.generation = 0
+        self._stopping = False
+        self._reloading = False
+
+    def _spawn(self, app, listener: socket.socket) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                serve_worker(app, listener, self.threads, self.timeout, self.keep_alive)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = self.generation
+
+    def _signal_generation(self, generation: Optional[int], signum: int) -> None:
+        for pid, child_generation in list(self.children.items()):
+            if generation is None or child_generation == generation:
+                try:
+                    os.kill(pid, signum)
+                except ProcessLookupError:
+                    self.children.pop(pid, None)
+
+    def _reap(self) -> Dict[int, int]:
+        reaped = {}
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                break
+            if pid == 0:
+                break
+            generation = self.children.pop(pid, None)
+            if generation is not None:
+                reaped[pid] = generation
+        return reaped
+
+    def serve_forever(self) -> None:
+        listener = socket.create_server((self.host, self.port), backlog=self.backlog)
+        listener.set_inheritable(True)
+        # Build the app (templates, pre-rendered pages, indexes) before forking so workers share it copy-on-write.
+        app = self.app_factory()
+        for _ in range(self.workers):
+            self._spawn(app, listener)
+        print(f"Master {os.getpid()} serving http://{self.host}:{self.port} with {self.workers} workers x {self.threads} threads")
+
+        def request_stop(signum, frame) -> None:
+            self._stopping = True
+
+        def request_reload(signum, frame) -> None:
+            self._reloading = True
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGHUP, request_reload)
+
+        try:
+            while not self._stopping:
+                time.sleep(0.2)
+                for pid, generation in self._reap().items():
+                    if generation == self.generation and not self._stopping:
+                        print(f"Worker {pid} exited unexpectedly; respawning")
+                        self._spawn(app, listener)
+                if self._reloading:
+                    self._reloading = False
+                    app = self.app_factory()
+                    previous = self.generation
+                    self.generation += 1
+                    for _ in range(self.workers):
+                        self._spawn(app, listener)
+                    self._signal_generation(previous, signal.SIGTERM)
+                    print(f"Reloaded: generation {self.generation} started, generation {previous} draining")
+        finally:
+            self._signal_generation(None, signal.SIGTERM)
+            deadline = time.monotonic() + self.grace
+            while self.children and time.monotonic() < deadline:
+                self._reap()
+                time.sleep(0.1)
+            self._signal_generation(None, signal.SIGKILL)
+            self._reap()
+            listener.close()
+            print("Server stopped.")
+
+
+def run_server(
+    app_factory: Callable[[], object],
+    host: str,
+    port: int,
+    workers: int,
+    threads: int,
+    timeout: float = DEFAULT_TIMEOUT,
+    backlog: int = DEFAULT_BACKLOG,
+    keep_alive: float = DEFAULT_KEEP_ALIVE,
+) -> None:
+    if workers > 0 and hasattr(os, "fork"):
+        PreforkServer(app_factory, host, port, workers, threads, timeout, backlog, keep_alive=keep_alive).serve_forever()
+        return
+    # No fork() (Windows): a single in-process worker with the same thread pool and timeouts.
+    listener = socket.create_server((host, port), backlog=backlog)
+    server = PooledWSGIServer(
+        host,
+        port,
+        app_factory(),
+        handler=handler_with_timeout(timeout),
+        fd=listener.fileno(),
+        threads=threads,
+        keep_alive=keep_alive,
+    )
+    print(f"Serving http://{host}:{port} with {threads} threads (single process)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.drain()
+        server.server_close()
+        listener.close()
+
+
+__all__ = ["KeepAliveHandler", "PooledWSGIServer", "PreforkServer", "run_server", "serve_worker"]
@@ -0,0 +1,371 @@
+"""BI key generation and PBO signing (.biprivatekey/.bikey/.bisign) in pure Python."""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import secrets
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from math import gcd
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple
+
+from app.pbo import CHUNK_SIZE, PboError, parse_archive
+
+PUBLIC_BLOB_HEADER = b"\x06\x02\x00\x00\x00\x24\x00\x00RSA1"
+PRIVATE_BLOB_HEADER = b"\x07\x02\x00\x00\x00\x24\x00\x00RSA2"
+PUBLIC_EXPONENT = 65537
+DEFAULT_KEY_BITS = 1024
+SIGNATURE_VERSION = 3
+SHA1_DIGEST_INFO = b"\x00\x30\x21\x30\x09\x06\x05\x2b\x0e\x03\x02\x1a\x05\x00\x04\x14"
+
+# Extensions whose contents feed the file hash, per signature version.
+V2_EXCLUDED = {"paa", "jpg", "p3d", "tga", "rvmat", "lip", "ogg", "wss", "png", "rtm", "pac", "fxy", "wrp"}
+V3_INCLUDED = {"sqf", "inc", "bikb", "ext", "fsm", "sqm", "hpp", "cfg", "sqs", "h", "sqfc"}
+
+_SMALL_PRIMES = [p for p in range(3, 2000, 2) if all(p % d for d in range(3, int(p ** 0.5) + 1, 2))]
+
+
+class SigningError(ValueError):
+    """Raised for unreadable keys or signatures."""
+
+
+@dataclass(frozen=True)
+class PublicKey:
+    authority: str
+    bits: int
+    exponent: int
+    modulus: int
+
+    def to_bytes(self) -> bytes:
+        blob = PUBLIC_BLOB_HEADER + struct.pack("<II", self.bits, self.exponent)
+        blob += self.modulus.to_bytes(self.bits // 8, "little")
+        return self.authority.encode("utf-8") + b"\0" + struct.pack("<I", len(blob)) + blob
+
+
+@dataclass(frozen=True)
+class PrivateKey:
+    authority: str
+    bits: int
+    exponent: int
+    modulus: int
+    prime1: int
+    prime2: int
+    exponent1: int
+    exponent2: int
+    coefficient: int
+    private_exponent: int
+
+    @property
+    def public(self) -> PublicKey:
+        return PublicKey(self.authority, self.bits, self.exponent, self.modulus)
+
+    def to_bytes(self) -> bytes:
+        full, half = self.bits // 8, self.bits // 16
+        blob = PRIVATE_BLOB_HEADER + struct.pack("<II", self.bits, self.exponent)
+        blob += self.modulus.to_bytes(full, "little")
+        for value in (self.prime1, self.prime2, self.exponent1, self.exponent2, self.coefficient):
+            blob += value.to_bytes(half, "little")
+        blob += self.private_exponent.to_bytes(full, "little")
+        return self.authority.encode("utf-8") + b"\0" + struct.pack("<I", len(blob)) + blob
+
+
+@dataclass(frozen=True)
+class Signature:
+    key: PublicKey
+    version: int
+    signatures: Tuple[int, int, int]
+
+    def to_bytes(self) -> bytes:
+        size = self.key.bits // 8
+        sig1, sig2, sig3 = (value.to_bytes(size, "little") for value in self.signatures)
+        return (
+            self.key.to_bytes()
+            + struct.pack("<I", size) + sig1
+            + struct.pack("<II", self.version, size) + sig2
+            + struct.pack("<I", size) + sig3
+        )
+
+
+def _read_exact(handle: BinaryIO, size: int) -> bytes:
+    data = handle.read(size)
+    if len(data) != size:
+        raise SigningError("Truncated key or signature file")
+    return data
+
+
+def _read_uint32(handle: BinaryIO) -> int:
+    (value,) = struct.unpack("<I", _read_exact(handle, 4))
+    return value
+
+
+def _read_asciiz(handle: BinaryIO) -> str:
+    raw = bytearray()
+    while (byte := handle.read(1)) not in (b"", b"\0"):
+        raw += byte
+    if byte != b"\0":
+        raise SigningError("Not a BI key or signature file (no authority name)")
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        raise SigningError("Not a BI key or signature file (authority name is not UTF-8)") from None
+
+
+def _read_blob(handle: BinaryIO, private: bool) -> Tuple[str, List[int], int, int]:
+    authority = _read_asciiz(handle)
+    length = _read_uint32(handle)
+    header = PRIVATE_BLOB_HEADER if private else PUBLIC_BLOB_HEADER
+    if length < len(header) + 8:
+        raise SigningError("Not a BI RSA key blob")
+    blob = _read_exact(handle, length)
+    if blob[:12] != header:
+        raise SigningError("Not a BI RSA key blob")
+    bits, exponent = struct.unpack_from("<II", blob, 12)
+    full, half = bits // 8, bits // 16
+    sizes = [full] + ([half] * 5 + [full] if private else [])
+    if not bits or bits % 16 or length != 20 + sum(sizes):
+        raise SigningError(f"Key blob length {length} does not match a {bits}-bit key")
+    values, offset = [], 20
+    for size in sizes:
+        values.append(int.from_bytes(blob[offset:offset + size], "little"))
+        offset += size
+    return authority, values, bits, exponent
+
+
+def _load_blob(path: Path, private: bool) -> Tuple[str, List[int], int, int]:
+    with Path(path).open("rb") as handle:
+        try:
+            return _read_blob(handle, private)
+        except SigningError as exc:
+            raise SigningError(f"{path}: {exc}") from None
+
+
+def load_public_key(path: Path) -> PublicKey:
+    authority, values, bits, exponent = _load_blob(path, private=False)
+    return PublicKey(authority, bits, exponent, values[0])
+
+
+def load_private_key(path: Path) -> PrivateKey:
+    authority, values, bits, exponent = _load_blob(path, private=True)
+    return PrivateKey(authority, bits, exponent, *values)
+
+
+def load_signature(path: Path) -> Signature:
+    with Path(path).open("rb") as handle:
+        try:
+            authority, values, bits, exponent = _read_blob(handle, private=False)
+            size = bits // 8
+
+            def read_sig() -> int:
+                length = _read_uint32(handle)
+                if length != size:
+                    raise SigningError(f"unexpected signature length {length}")
+                return int.from_bytes(_read_exact(handle, length), "little")
+
+            sig1 = read_sig()
+            version = _read_uint32(handle)
+            sig2 = read_sig()
+            sig3 = read_sig()
+        except SigningError as exc:
+            raise SigningError(f"{path}: {exc}") from None
+    return Signature(PublicKey(authority, bits, exponent, values[0]), version, (sig1, sig2, sig3))
+
+
+def _is_probable_prime(candidate: int, rounds: int = 40) -> bool:
+    for prime in _SMALL_PRIMES:
+        if candidate % prime == 0:
+            return candidate == prime
+    d, r = candidate - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        r += 1
+    for _ in range(rounds):
+        x = pow(secrets.randbelow(candidate - 3) + 2, d, candidate)
+        if x in (1, candidate - 1):
+            continue
+        for _ in range(r - 1):
+            x = pow(x, 2, candidate)
+            if x == candidate - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _random_prime(bits: int, exponent: int) -> int:
+    while True:
+        # Top two bits set so the product has exactly 2 * bits bits.
+        candidate = secrets.randbits(bits) | (0b11 << (bits - 2)) | 1
+        if gcd(exponent, candidate - 1) == 1 and _is_probable_prime(candidate):
+            return candidate
+
+
+def generate_key(authority: str, bits: int = DEFAULT_KEY_BITS) -> PrivateKey:
+    if bits % 16:
+        raise SigningError("Key size must be a multiple of 16 bits")
+    exponent = PUBLIC_EXPONENT
+    while True:
+        prime1 = _random_prime(bits // 2, exponent)
+        prime2 = _random_prime(bits // 2, exponent)
+        if prime1 != prime2:
+            break
+    if prime1 < prime2:
+        prime1, prime2 = prime2, prime1
+    private_exponent = pow(exponent, -1, (prime1 - 1) * (prime2 - 1))
+    return PrivateKey(
+        authority=authority,
+        bits=bits,
+        exponent=exponent,
+        modulus=prime1 * prime2,
+        prime1=prime1,
+        prime2=prime2,
+        exponent1=private_exponent % (prime1 - 1),
+        exponent2=private_exponent % (prime2 - 1),
+        coefficient=pow(prime2, -1, prime1),
+        private_exponent=private_exponent,
+    )
+
+
+def _hashes_file_contents(name: str, version: int) -> bool:
+    extension = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+    if version == 2:
+        return extension not in V2_EXCLUDED
+    return extension in V3_INCLUDED
+
+
+def pbo_hashes(path: Path, version: int = SIGNATURE_VERSION) -> Tuple[bytes, bytes, bytes]:
+    """Compute the three BI signature hashes in one streaming pass over the mapped PBO."""
+    with Path(path).open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        archive = parse_archive(view, Path(path))
+        whole = hashlib.sha1()
+        files = hashlib.sha1()
+        hashed_any = False
+        position = 0
+        for entry in archive.entries:
+            if entry.offset > position:
+                whole.update(view[position:entry.offset])
+            end = entry.offset + entry.data_size
+            include = _hashes_file_contents(entry.name, version)
+            hashed_any = hashed_any or include
+            for start in range(entry.offset, end, CHUNK_SIZE):
+                chunk = view[start:min(start + CHUNK_SIZE, end)]
+                whole.update(chunk)
+                if include:
+                    files.update(chunk)
+            position = max(position, end)
+        if archive.data_end > position:
+            whole.update(view[position:archive.data_end])
+    hash1 = whole.digest()
+    if archive.checksum and archive.checksum != hash1:
+        raise PboError(f"{path}: SHA1 trailer does not match contents")
+    if not hashed_any:
+        files.update(b"nothing" if version == 2 else b"gnihton")
+
+    names = hashlib.sha1()
+    for name in sorted(entry.name.lower() for entry in archive.entries if entry.data_size):
+        names.update(name.encode("utf-8"))
+    prefix = archive.prefix.encode("utf-8")
+    if prefix and not prefix.endswith(b"\\"):
+        prefix += b"\\"
+    name_digest = names.digest()
+    hash2 = hashlib.sha1(hash1 + name_digest + prefix).digest()
+    hash3 = hashlib.sha1(files.digest() + name_digest + prefix).digest()
+    return hash1, hash2, hash3
+
+
+def _pad(digest: bytes, bits: int) -> int:
+    size = bits // 8
+    padded = b"\x00\x01" + b"\xff" * (size - 2 - len(SHA1_DIGEST_INFO) - len(digest)) + SHA1_DIGEST_INFO + digest
+    return int.from_bytes(padded, "big")
+
+
+def signature_path(pbo: Path, authority: str) -> Path:
+    return Path(pbo).with_name(f"{Path(pbo).name}.{authority}.bisign")
+
+
+def sign_pbo(pbo: Path, key: PrivateKey, version: int = SIGNATURE_VERSION) -> Path:
+    hashes = pbo_hashes(pbo, version)
+    signatures = tuple(pow(_pad(digest, key.bits), key.private_exponent, key.modulus) for digest in hashes)
+    output = signature_path(pbo, key.authority)
+    output.write_bytes(Signature(key.public, version, signatures).to_bytes())  # type: ignore[arg-type]
+    return output
+
+
+def verify_pbo_signature(pbo: Path, key: PublicKey, signature: Optional[Path] = None) -> bool:
+    loaded = load_signature(signature or signature_path(pbo, key.authority))
+    if loaded.key.modulus != key.modulus or loaded.key.exponent != key.exponent:
+        return False
+    try:
+        hashes = pbo_hashes(pbo, loaded.version)
+    except PboError:
+        return False
+    return all(
+        pow(value, key.exponent, key.modulus) == _pad(digest, key.bits)
+        for value, digest in zip(loaded.signatures, hashes)
+    )
+
+
+def _run_parallel(func, pbos: Sequence[Path], key, jobs: int) -> Iterator[Tuple[Path, object]]:
+    if jobs <= 1 or len(pbos) <= 1:
+        for pbo in pbos:
+            yield pbo, func(pbo, key)
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(pbos))) as pool:
+        futures = [pool.submit(func, pbo, key) for pbo in pbos]
+        for pbo, future in zip(pbos, futures):
+            yield pbo, future.result()
+
+
+def action_keys_new(authority: str, output_dir: Path, bits: int = DEFAULT_KEY_BITS) -> None:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    private_path = output_dir / f"{authority}.biprivatekey"
+    if private_path.exists():
+        raise SigningError(f"{private_path} already exists; refusing to overwrite a private key")
+    key = generate_key(authority, bits)
+    private_path.write_bytes(key.to_bytes())
+    private_path.chmod(0o600)
+    public_path = output_dir / f"{authority}.bikey"
+    public_path.write_bytes(key.public.to_bytes())
+    print(f"Created {private_path} (keep private)")
+    print(f"Created {public_path} (ship in @MyWeaponMod/keys)")
+
+
+def action_sign(pbos: Sequence[Path], key_path: Path, jobs: int = 1, version: int = SIGNATURE_VERSION) -> None:
+    key = load_private_key(key_path)
+    started = time.perf_counter()
+    signer = partial(sign_pbo, version=version)
+    for pbo, output in _run_parallel(signer, pbos, key, jobs):
+        print(f"Signed {pbo} -> {output}")
+    elapsed = time.perf_counter() - started
+    print(f"\nSigned {len(pbos)} PBOs in {elapsed:.2f}s ({len(pbos) / elapsed if elapsed else 0:.1f} PBOs/sec)")
+
+
+def action_verify(pbos: Sequence[Path], key_path: Path, jobs: int = 1) -> int:
+    key = load_public_key(key_path)
+    failures = 0
+    for pbo, ok in _run_parallel(verify_pbo_signature, pbos, key, jobs):
+        failures += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {pbo}")
+    return failures
+
+
+__all__ = [
+    "PrivateKey",
+    "PublicKey",
+    "Signature",
+    "SigningError",
+    "action_keys_new",
+    "action_sign",
+    "action_verify",
+    "generate_key",
+    "load_private_key",
+    "load_public_key",
+    "load_signature",
+    "pbo_hashes",
+    "sign_pbo",
+    "verify_pbo_signature",
+]
@@ -0,0 +1,288 @@
+"""Content-addressed asset store that deduplicates identical assets across addon folders.
+
+Objects live under ``objects/<2 hex>/<sha256>`` and are materialised into addon folders as hard links
+(or reflinks), so every copy of an optic model or RVMAT shares one set of disk blocks. Each addon records
+what it references in ``refs/<key>.json``; those files are the reference counts that ``gc`` walks.
+"""
+
+from __future__ import annotations
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+import stat
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+ASSET_SUFFIXES = {".p3d", ".paa", ".rvmat", ".rtm", ".wss", ".ogg"}
+LINK_MODES = ("hardlink", "reflink")
+CHUNK_SIZE = 1024 * 1024
+# Objects younger than this are never collected: a concurrent scaffold may not have written its refs yet.
+GC_GRACE_SECONDS = 300
+FICLONE = 0x40049409  # Linux ioctl: share the source file's extents (btrfs, XFS)
+
+
+class StoreError(OSError):
+    """Raised when an asset cannot be placed in or materialised from the store."""
+
+
+@dataclass
+class DedupeResult:
+    addon_dir: Path
+    assets: int = 0
+    linked: int = 0
+    new_objects: int = 0
+    copied: int = 0
+    bytes_reused: int = 0
+
+
+@dataclass
+class GcResult:
+    objects_removed: int = 0
+    bytes_freed: int = 0
+    refs_dropped: int = 0
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        while block := handle.read(CHUNK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_assets(addon_dir: Path) -> Iterator[Path]:
+    for path in sorted(addon_dir.rglob("*")):
+        if path.suffix.lower() in ASSET_SUFFIXES and path.is_file() and not path.is_symlink():
+            yield path
+
+
+def _reflink(source: Path, target: Path) -> None:
+    import fcntl
+
+    with source.open("rb") as src, target.open("wb") as dest:
+        try:
+            fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+        except OSError:
+            target.unlink(missing_ok=True)
+            raise
+
+
+class AssetStore:
+    def __init__(self, root: Path, link_mode: str = "hardlink") -> None:
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"Unknown link mode {link_mode!r}; choose from {', '.join(LINK_MODES)}")
+        self.root = Path(root)
+        self.link_mode = link_mode
+        self.objects_dir = self.root / "objects"
+        self.refs_dir = self.root / "refs"
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+    def _ref_path(self, addon_dir: Path) -> Path:
+        key = hashlib.sha1(str(addon_dir.resolve()).encode("utf-8")).hexdigest()
+        return self.refs_dir / f"{key}.json"
+
+    def _materialise(self, source: Path, target: Path) -> bool:
+        """Place a link (or reflink) to ``source`` at ``target`` atomically; returns False if it had to copy."""
+        temp = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            if self.link_mode == "hardlink":
+                os.link(source, temp)
+            else:
+                _reflink(source, temp)
+            shared = True
+        except OSError as exc:
+            if exc.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL):
+                raise StoreError(exc.errno, f"Cannot link {source} to {target}: {exc.strerror}") from exc
+            # Different filesystem or no link support: fall back to a plain copy.
+            shutil.copyfile(source, temp)
+            shared = False
+        os.replace(temp, target)
+        return shared
+
+    def put(self, path: Path, digest: Optional[str] = None) -> tuple[str, bool]:
+        """Add ``path`` to the store (sharing its blocks where possible); returns ``(digest, created)``."""
+        digest = digest or file_digest(path)
+        target = self.object_path(digest)
+        if target.exists():
+            return digest, False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        self._materialise(path, target)
+        # Objects are shared by every addon that links them, so they must never be edited in place.
+        os.chmod(target, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        return digest, True
+
+    def _evict(self, digest: str, inode: int) -> None:
+        """Forget an object that was edited in place through a hard link; it no longer matches its digest."""
+        target = self.object_path(digest)
+        try:
+            if target.stat().st_ino == inode:
+                target.unlink()
+        except FileNotFoundError:
+            pass
+
+    def load_refs(self, addon_dir: Path) -> Dict[str, Dict[str, int | str]]:
+        try:
+            return json.loads(self._ref_path(addon_dir).read_text(encoding="utf-8"))["files"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def _write_refs(self, addon_dir: Path, files: Dict[str, Dict[str, int | str]]) -> None:
+        path = self._ref_path(addon_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        payload = {"addon": str(addon_dir.resolve()), "files": files}
+        temp.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        os.replace(temp, path)
+
+    def dedupe_addon(self, addon_dir: Path) -> DedupeResult:
+        """Replace every asset in ``addon_dir`` with a link to its store object and record the references.
+
+        Files still linked to the object recorded last time are recognised by inode and not re-hashed, so
+        repeat runs cost one ``stat`` per asset."""
+        addon_dir = Path(addon_dir)
+        result = DedupeResult(addon_dir)
+        previous = self.load_refs(addon_dir)
+        files: Dict[str, Dict[str, int | str]] = {}
+        for path in iter_assets(addon_dir):
+            info = path.stat()
+            if not info.st_size:
+                # Untouched placeholders: nothing to share, and users overwrite them in place.
+                continue
+            relative = path.relative_to(addon_dir).as_posix()
+            result.assets += 1
+            known = previous.get(relative)
+            if known and known["ino"] == info.st_ino:
+                if known["size"] == info.st_size and known["mtime_ns"] == info.st_mtime_ns:
+                    files[relative] = known
+                    result.bytes_reused += info.st_size
+                    continue
+                self._evict(str(known["digest"]), info.st_ino)
+            digest, created = self.put(path)
+            if created:
+                # The object was made from this very file, so it already shares its blocks.
+                result.new_objects += 1
+            else:
+                result.bytes_reused += info.st_size
+                if not os.path.samefile(path, self.object_path(digest)):
+                    if self._materialise(self.object_path(digest), path):
+                        result.linked += 1
+                    else:
+                        result.copied += 1
+                info = path.stat()
+            files[relative] = {"digest": digest, "ino": info.st_ino, "size": info.st_size, "mtime_ns": info.st_mtime_ns}
+        self._write_refs(addon_dir, files)
+        return result
+
+    def _live_refs(self) -> Iterator[tuple[Path, str, Dict[str, Dict[str, int | str]]]]:
+        for ref in sorted(self.refs_dir.glob("*.json")):
+            try:
+                payload = json.loads(ref.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            yield ref, payload.get("addon", ""), payload.get("files", {})
+
+    def refcounts(self) -> Counter:
+        """Number of addon files referencing each object digest."""
+        counts: Counter = Counter()
+        for _, _, files in self._live_refs():
+            counts.update(record["digest"] for record in files.values())
+        return counts
+
+    def gc(self, dry_run: bool = False, grace: float = GC_GRACE_SECONDS) -> GcResult:
+        """Drop references from deleted or edited addon files, then delete objects nobody references."""
+        result = GcResult()
+        live: set[str] = set()
+        for ref, addon, files in self._live_refs():
+            kept = {}
+            for relative, record in files.items():
+                try:
+                    info = (Path(addon) / relative).stat()
+                except OSError:
+                    continue
+                if (info.st_ino, info.st_size, info.st_mtime_ns) == (record["ino"], record["size"], record["mtime_ns"]):
+                    kept[relative] = record
+            result.refs_dropped += len(files) - len(kept)
+            live.update(record["digest"] for record in kept.values())
+            if dry_run or len(kept) == len(files):
+                continue
+            if kept:
+                self._write_refs(Path(addon), kept)
+            else:
+                ref.unlink(missing_ok=True)
+        cutoff = time.time() - grace
+        for path in self.iter_objects():
+            if path.name in live:
+                continue
+            info = path.stat()
+            if info.st_ctime > cutoff:
+                continue
+            result.objects_removed += 1
+            result.bytes_freed += info.st_size
+            if not dry_run:
+                path.unlink()
+        return result
+
+    def iter_objects(self) -> Iterator[Path]:
+        if self.objects_dir.is_dir():
+            yield from sorted(path for path in self.objects_dir.glob("??/*") if not path.name.endswith(".tmp"))
+
+    def stats(self) -> Dict[str, int]:
+        counts = self.refcounts()
+        sizes = {path.name: path.stat().st_size for path in self.iter_objects()}
+        return {
+            "objects": len(sizes),
+            "stored_bytes": sum(sizes.values()),
+            "references": sum(counts.values()),
+            "referenced_bytes": sum(sizes.get(digest, 0) * count for digest, count in counts.items()),
+            "unreferenced_objects": sum(digest not in counts for digest in sizes),
+        }
+
+
+def dedupe_report(result: DedupeResult) -> str:
+    copied = f", {result.copied} copied (no link support)" if result.copied else ""
+    return (
+        f"Asset store: {result.assets} assets in {result.addon_dir}, {result.new_objects} new objects, "
+        f"{result.linked} relinked{copied}, {result.bytes_reused / 1024:.1f} KiB reused"
+    )
+
+
+def action_store_stats(root: Path) -> None:
+    stats = AssetStore(root).stats()
+    saved = stats["referenced_bytes"] - stats["stored_bytes"]
+    print(
+        f"{root}: {stats['objects']} objects ({stats['stored_bytes'] / (1024 * 1024):.2f} MB), "
+        f"{stats['references']} references ({stats['referenced_bytes'] / (1024 * 1024):.2f} MB across addons), "
+        f"{max(saved, 0) / (1024 * 1024):.2f} MB saved, {stats['unreferenced_objects']} unreferenced"
+    )
+
+
+def action_store_gc(root: Path, dry_run: bool = False) -> None:
+    result = AssetStore(root).gc(dry_run=dry_run)
+    verb = "Would remove" if dry_run else "Removed"
+    print(
+        f"{verb} {result.objects_removed} objects ({result.bytes_freed / 1024:.1f} KiB); "
+        f"{result.refs_dropped} stale references dropped"
+    )
+
+
+__all__ = [
+    "ASSET_SUFFIXES",
+    "AssetStore",
+    "DedupeResult",
+    "GcResult",
+    "StoreError",
+    "action_store_gc",
+    "action_store_stats",
+    "dedupe_report",
+    "file_digest",
+    "iter_assets",
+]
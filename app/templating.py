@@ -0,0 +1,253 @@
+"""Config template engine: ``${name}`` placeholders plus ``{% for %}``/``{% if %}`` blocks, compiled once."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Set, Tuple, Union
+
+IDENTIFIER = r"[_a-zA-Z][_a-zA-Z0-9]*"
+PATH = re.compile(rf"{IDENTIFIER}(?:\.{IDENTIFIER})*\Z")
+# A block tag alone on its line swallows the indentation and newline, so blocks do not leave blank lines.
+TOKEN = re.compile(
+    rf"""
+    (?P<line_tag>^[ \t]*\{{%(?P<line_body>(?:(?!%\}}).)*)%\}}[ \t]*(?:\n|\Z))
+    | \{{%(?P<tag_body>(?:(?!%\}}).)*)%\}}
+    | \$(?:
+        (?P<escaped>\$)
+        | \{{(?P<braced>[^}}]*)\}}
+        | (?P<named>{IDENTIFIER})
+        | (?P<invalid>)
+    )
+    """,
+    re.MULTILINE | re.VERBOSE,
+)
+
+
+class TemplateSyntaxError(ValueError):
+    pass
+
+
+@dataclass
+class _Var:
+    path: Tuple[str, ...]
+
+
+@dataclass
+class _For:
+    name: str
+    items: Tuple[str, ...]
+    body: List["_Node"] = field(default_factory=list)
+
+
+@dataclass
+class _If:
+    test: Tuple[str, ...]
+    negate: bool
+    body: List["_Node"] = field(default_factory=list)
+    orelse: List["_Node"] = field(default_factory=list)
+
+
+_Node = Union[str, _Var, _For, _If]
+
+
+def _path(expression: str, line: int) -> Tuple[str, ...]:
+    expression = expression.strip()
+    if not PATH.match(expression):
+        raise TemplateSyntaxError(f"line {line}: invalid expression {expression!r}")
+    return tuple(expression.split("."))
+
+
+def _parse(source: str) -> List[_Node]:
+    root: List[_Node] = []
+    # Each frame: (block node, list currently receiving children, opening tag name, line)
+    stack: List[Tuple[Optional[Union[_For, _If]], List[_Node], str, int]] = [(None, root, "", 0)]
+    position = 0
+    for match in TOKEN.finditer(source):
+        target = stack[-1][1]
+        if match.start() > position:
+            target.append(source[position:match.start()])
+        position = match.end()
+        line = source.count("\n", 0, match.start()) + 1
+        if match.group("escaped") is not None:
+            target.append("$")
+        elif match.group("braced") is not None:
+            target.append(_Var(_path(match.group("braced"), line)))
+        elif match.group("named") is not None:
+            target.append(_Var((match.group("named"),)))
+        elif match.group("invalid") is not None:
+            raise TemplateSyntaxError(f"line {line}: invalid placeholder after '$'")
+        else:
+            body = match.group("line_body") if match.group("line_tag") else match.group("tag_body")
+            words = body.split()
+            keyword = words[0] if words else ""
+            if keyword == "for" and len(words) == 4 and words[2] == "in" and re.fullmatch(IDENTIFIER, words[1]):
+                node: Union[_For, _If] = _For(words[1], _path(words[3], line))
+                target.append(node)
+                stack.append((node, node.body, "for", line))
+            elif keyword == "if" and len(words) in (2, 3) and (len(words) == 2 or words[1] == "not"):
+                node = _If(_path(words[-1], line), negate=len(words) == 3)
+                target.append(node)
+                stack.append((node, node.body, "if", line))
+            elif keyword == "else" and len(words) == 1 and stack[-1][2] == "if":
+                block, _, _, opened = stack.pop()
+                stack.append((block, block.orelse, "else", opened))  # type: ignore[union-attr]
+            elif keyword in ("endfor", "endif") and len(words) == 1:
+                closes = ("for",) if keyword == "endfor" else ("if", "else")
+                if stack[-1][2] not in closes:
+                    raise TemplateSyntaxError(f"line {line}: unexpected {{% {keyword} %}}")
+                stack.pop()
+            else:
+                raise TemplateSyntaxError(f"line {line}: unknown block tag {{%{body}%}}")
+    if position < len(source):
+        stack[-1][1].append(source[position:])
+    if len(stack) > 1:
+        raise TemplateSyntaxError(f"line {stack[-1][3]}: {{% {stack[-1][2]} %}} is never closed")
+    return root
+
+
+def _get(value: Any, key: str) -> Any:
+    if isinstance(value, Mapping):
+        return value[key]
+    return getattr(value, key)
+
+
+class _Compiler:
+    """Turns the node tree into Python source; runs of text and placeholders become one f-string."""
+
+    def __init__(self) -> None:
+        self.constants: Dict[str, Any] = {}
+        self.lines: List[str] = []
+        self.fields: Set[str] = set()
+
+    def constant(self, value: Any) -> str:
+        name = f"_c{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def expression(self, path: Tuple[str, ...], scope: Dict[str, str]) -> str:
+        head, *rest = path
+        if head in scope:
+            code = scope[head]
+        else:
+            self.fields.add(head)
+            code = f"v[{head!r}]"
+        for key in rest:
+            code = f"_get({code}, {key!r})"
+        return code
+
+    def emit(self, nodes: List[_Node], scope: Dict[str, str], depth: int) -> None:
+        indent = "    " * depth
+        run: List[_Node] = []
+
+        def flush() -> None:
+            if not run:
+                return
+            chunks = [
+                "{%s}" % (self.constant(item) if isinstance(item, str) else self.expression(item.path, scope))
+                for item in run
+            ]
+            self.lines.append(f"{indent}append(f{''.join(chunks)!r})")
+            run.clear()
+
+        for node in nodes:
+            if isinstance(node, (str, _Var)):
+                run.append(node)
+                continue
+            flush()
+            if isinstance(node, _For):
+                local = f"_l{depth}_{node.name}"
+                self.lines.append(f"{indent}for {local} in {self.expression(node.items, scope)}:")
+                self.block(node.body, {**scope, node.name: local}, depth + 1)
+            else:
+                test = self.expression(node.test, scope)
+                self.lines.append(f"{indent}if {'not ' if node.negate else ''}{test}:")
+                self.block(node.body, scope, depth + 1)
+                if node.orelse:
+                    self.lines.append(f"{indent}else:")
+                    self.block(node.orelse, scope, depth + 1)
+        flush()
+
+    def block(self, nodes: List[_Node], scope: Dict[str, str], depth: int) -> None:
+        before = len(self.lines)
+        self.emit(nodes, scope, depth)
+        if len(self.lines) == before:
+            self.lines.append("    " * depth + "pass")
+
+
+def _segments(nodes: List[_Node]) -> List[List[_Node]]:
+    """Split top-level nodes into lines of text/placeholders, with every block as a segment of its own."""
+    segments: List[List[_Node]] = []
+    current: List[_Node] = []
+    for node in nodes:
+        if isinstance(node, _Var):
+            current.append(node)
+        elif isinstance(node, str):
+            for piece in node.splitlines(keepends=True):
+                current.append(piece)
+                if piece.endswith("\n"):
+                    segments.append(current)
+                    current = []
+        else:
+            if current:
+                segments.append(current)
+                current = []
+            segments.append([node])
+    if current:
+        segments.append(current)
+    return segments
+
+
+def _compile(nodes: List[_Node], name: str) -> Tuple[Callable[[Mapping[str, Any]], str], FrozenSet[str]]:
+    compiler = _Compiler()
+    compiler.lines = ["def render(v):", "    parts = []", "    append = parts.append"]
+    compiler.emit(nodes, {}, 1)
+    compiler.lines.append("    return ''.join(parts)")
+    namespace: Dict[str, Any] = {"_get": _get, **compiler.constants}
+    exec(compile("\n".join(compiler.lines), name, "exec"), namespace)
+    return namespace["render"], frozenset(compiler.fields)
+
+
+class CompiledTemplate:
+    """A drop-in for ``string.Template`` that is parsed and compiled to a render function once.
+
+    Placeholders use the ``string.Template`` syntax (``$name``, ``${name}``, ``$$``) and may reach into
+    loop items with dots (``${mode.name}``). Blocks are ``{% for item in items %}...{% endfor %}`` and
+    ``{% if [not] name %}...{% else %}...{% endif %}``.
+    """
+
+    def __init__(self, template: str) -> None:
+        self.template = template
+        self._nodes = _parse(template)
+        self._render, self.fields = _compile(self._nodes, "<config template>")
+        self._segments: Optional[List[Tuple[Callable[[Mapping[str, Any]], str], FrozenSet[str]]]] = None
+
+    def render(self, values: Mapping[str, Any]) -> str:
+        return self._render(values)
+
+    @property
+    def segments(self) -> List[Tuple[Callable[[Mapping[str, Any]], str], FrozenSet[str]]]:
+        """``(render, fields)`` per output line or block; compiled on first use (only previews need them)."""
+        if self._segments is None:
+            self._segments = [_compile(nodes, "<config template segment>") for nodes in _segments(self._nodes)]
+        return self._segments
+
+    def render_segments(self, values: Mapping[str, Any]) -> List[str]:
+        """Render every segment separately; ``"".join()`` of the result equals ``render(values)``."""
+        return [render(values) for render, _ in self.segments]
+
+    def rerender(self, values: Mapping[str, Any], previous: List[str], changed: Set[str]) -> Dict[int, str]:
+        """Re-render only segments that read a field in ``changed``; returns those whose text differs."""
+        updates: Dict[int, str] = {}
+        for index, (render, fields) in enumerate(self.segments):
+            if fields & changed:
+                text = render(values)
+                if text != previous[index]:
+                    updates[index] = text
+        return updates
+
+    def substitute(self, mapping: Optional[Mapping[str, Any]] = None, **kwargs: Any) -> str:
+        return self._render({**mapping, **kwargs} if mapping else kwargs)
+
+
+__all__ = ["CompiledTemplate", "TemplateSyntaxError"]
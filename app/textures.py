@@ -0,0 +1,472 @@
+"""PNG/TGA to PAA conversion with vectorized DXT1/DXT5 block compression and mipmaps."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow only speeds up decoding; the built-in PNG/TGA readers cover the rest.
+    Image = None
+
+SOURCE_SUFFIXES = {".png", ".tga"}
+CACHE_NAME = ".textures-cache.json"
+# Bump when the encoder output changes so cached hashes stop matching.
+ENCODER_VERSION = 2
+
+PAA_DXT1 = 0xFF01
+PAA_DXT5 = 0xFF05
+MIN_MIP_SIZE = 4
+MAX_MIPMAPS = 16
+ALPHA_FLAG_INTERPOLATED = 1
+BLOCK_BATCH = 16384
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# Suffix -> format. `_co` only switches to DXT5 when the source actually uses its alpha channel.
+SUFFIX_FORMATS = {"_ca": "DXT5", "_nohq": "DXT5", "_smdi": "DXT5", "_co": "DXT1"}
+
+
+class TextureError(ValueError):
+    """Raised for unreadable source images or sizes a PAA cannot hold."""
+
+
+@dataclass
+class ConvertResult:
+    source: Path
+    output: Path
+    fmt: str
+    width: int
+    height: int
+    mipmaps: int
+    bytes_written: int
+    seconds: float
+    skipped: bool = False
+    error: str = ""
+
+
+# --- decoding -----------------------------------------------------------------------------------
+
+
+def _png_unfilter(raw: bytes, width: int, height: int, bpp: int) -> np.ndarray:
+    stride = width * bpp
+    rows = np.frombuffer(raw, dtype=np.uint8)[: height * (stride + 1)].reshape(height, stride + 1)
+    filters = rows[:, 0]
+    data = rows[:, 1:]
+    if filters.max(initial=0) > 4:
+        raise TextureError(f"invalid PNG filter type {filters.max()}")
+    if not filters.any():
+        return data.copy()
+    if not np.isin(filters, (3, 4)).any():
+        # None, Sub and Up only need the previous row, so each row is one vectorized step.
+        out = np.zeros((height, stride), dtype=np.uint8)
+        prev = np.zeros(stride, dtype=np.uint8)
+        for y in range(height):
+            line = data[y]
+            if filters[y] == 1:
+                line = np.cumsum(line.reshape(width, bpp), axis=0, dtype=np.uint32).astype(np.uint8).ravel()
+            elif filters[y] == 2:
+                line = line + prev
+            out[y] = line
+            prev = out[y]
+        return out
+    return _unfilter_wavefront(data.reshape(height, width, bpp), filters)
+
+
+def _unfilter_wavefront(data: np.ndarray, filters: np.ndarray) -> np.ndarray:
+    """Undo any mix of filters one anti-diagonal at a time.
+
+    Average and Paeth read the decoded pixels to the left, above and above-left, so every pixel on the
+    diagonal ``x + y == d`` depends only on earlier diagonals. The image is stored sheared, with diagonal
+    ``d`` in row ``d + 2``, so each step works on contiguous slices: width + height vectorized steps in
+    place of a Python loop per byte."""
+    height, width, bpp = data.shape
+    sheared = np.zeros((height + width - 1, height, bpp), dtype=np.int16)
+    for y in range(height):
+        sheared[y:y + width, y] = data[y]
+    # Two leading diagonals and one leading column of zeros stand in for neighbours outside the image.
+    out = np.zeros((height + width + 1, height + 1, bpp), dtype=np.int16)
+    kinds = [(filters == kind)[:, None] for kind in (1, 2, 3, 4)]
+    for diagonal in range(height + width - 1):
+        lo, hi = max(0, diagonal - width + 1), min(height, diagonal + 1)
+        left = out[diagonal + 1, lo + 1:hi + 1]
+        up = out[diagonal + 1, lo:hi]
+        upper_left = out[diagonal, lo:hi]
+        pa, pb, pc = np.abs(up - upper_left), np.abs(left - upper_left), np.abs(left + up - 2 * upper_left)
+        paeth = np.where((pa <= pb) & (pa <= pc), left, np.where(pb <= pc, up, upper_left))
+        sub, above, average, paeth_rows = (kind[lo:hi] for kind in kinds)
+        predictor = np.where(
+            sub, left, np.where(above, up, np.where(average, (left + up) >> 1, np.where(paeth_rows, paeth, 0)))
+        )
+        out[diagonal + 2, lo + 1:hi + 1] = (sheared[diagonal, lo:hi] + predictor) & 0xFF
+    pixels = np.empty((height, width, bpp), dtype=np.uint8)
+    for y in range(height):
+        pixels[y] = out[y + 2:y + width + 2, y + 1]
+    return pixels.reshape(height, width * bpp)
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    if not data.startswith(PNG_SIGNATURE):
+        raise TextureError("not a PNG file")
+    position = len(PNG_SIGNATURE)
+    header = None
+    palette = transparency = None
+    idat = []
+    while position + 8 <= len(data):
+        length, kind = struct.unpack_from(">I4s", data, position)
+        chunk = data[position + 8:position + 8 + length]
+        position += 12 + length
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", chunk)
+        elif kind == b"PLTE":
+            palette = np.frombuffer(chunk, dtype=np.uint8).reshape(-1, 3)
+        elif kind == b"tRNS":
+            transparency = np.frombuffer(chunk, dtype=np.uint8)
+        elif kind == b"IDAT":
+            idat.append(chunk)
+        elif kind == b"IEND":
+            break
+    if header is None:
+        raise TextureError("PNG has no IHDR chunk")
+    width, height, depth, color_type, _, _, interlace = header
+    if color_type not in PNG_CHANNELS or depth not in (8, 16) or interlace:
+        raise TextureError(f"unsupported PNG (color type {color_type}, {depth}-bit, interlace {interlace}); re-save as 8-bit non-interlaced")
+    channels = PNG_CHANNELS[color_type]
+    bpp = channels * depth // 8
+    pixels = _png_unfilter(zlib.decompress(b"".join(idat)), width, height, bpp)
+    pixels = pixels.reshape(height, width, bpp)
+    if depth == 16:
+        pixels = pixels[:, :, 0::2]
+    if color_type == 3:
+        if palette is None:
+            raise TextureError("palette PNG without PLTE chunk")
+        alpha = np.full(len(palette), 255, dtype=np.uint8)
+        if transparency is not None:
+            alpha[: len(transparency)] = transparency
+        indices = pixels[:, :, 0]
+        return np.dstack([palette[indices], alpha[indices]])
+    return _to_rgba(pixels)
+
+
+def decode_tga(data: bytes) -> np.ndarray:
+    if len(data) < 18:
+        raise TextureError("truncated TGA header")
+    id_length, colormap_type, image_type = data[0], data[1], data[2]
+    width, height, depth, descriptor = struct.unpack_from("<HHBB", data, 12)
+    if colormap_type or image_type not in (2, 3, 10, 11) or depth not in (8, 24, 32):
+        raise TextureError(f"unsupported TGA (type {image_type}, {depth}-bit); use 24/32-bit true colour")
+    pixel_size = depth // 8
+    count = width * height
+    body = memoryview(data)[18 + id_length:]
+    if image_type in (2, 3):
+        pixels = np.frombuffer(body[: count * pixel_size], dtype=np.uint8)
+    else:
+        out = bytearray()
+        position = 0
+        while len(out) < count * pixel_size:
+            packet = body[position]
+            run = (packet & 0x7F) + 1
+            if packet & 0x80:
+                out += bytes(body[position + 1:position + 1 + pixel_size]) * run
+                position += 1 + pixel_size
+            else:
+                out += body[position + 1:position + 1 + run * pixel_size]
+                position += 1 + run * pixel_size
+        pixels = np.frombuffer(bytes(out[: count * pixel_size]), dtype=np.uint8)
+    if pixels.size < count * pixel_size:
+        raise TextureError("truncated TGA pixel data")
+    pixels = pixels.reshape(height, width, pixel_size)
+    if pixel_size >= 3:
+        pixels = pixels[:, :, [2, 1, 0, 3][:pixel_size]]  # BGR(A) -> RGB(A)
+    if not descriptor & 0x20:  # bottom-left origin
+        pixels = pixels[::-1]
+    return _to_rgba(np.ascontiguousarray(pixels))
+
+
+def _to_rgba(pixels: np.ndarray) -> np.ndarray:
+    height, width, channels = pixels.shape
+    if channels == 4:
+        return pixels
+    rgba = np.empty((height, width, 4), dtype=np.uint8)
+    rgba[:, :, 3] = 255
+    if channels in (1, 2):
+        rgba[:, :, :3] = pixels[:, :, :1]
+        if channels == 2:
+            rgba[:, :, 3] = pixels[:, :, 1]
+    else:
+        rgba[:, :, :3] = pixels
+    return rgba
+
+
+def load_image(path: Path) -> np.ndarray:
+    """RGBA ``uint8`` array of shape (height, width, 4)."""
+    if Image is not None:
+        with Image.open(path) as image:
+            return np.asarray(image.convert("RGBA"))
+    data = Path(path).read_bytes()
+    if path.suffix.lower() == ".png":
+        return decode_png(data)
+    return decode_tga(data)
+
+
+# --- encoding -----------------------------------------------------------------------------------
+
+
+def texture_format(path: Path, rgba: np.ndarray) -> str:
+    stem = path.stem.lower()
+    for suffix, fmt in SUFFIX_FORMATS.items():
+        if stem.endswith(suffix):
+            if fmt == "DXT1" and (rgba[:, :, 3] < 255).any():
+                return "DXT5"
+            return fmt
+    return "DXT5" if (rgba[:, :, 3] < 255).any() else "DXT1"
+
+
+def mipmap_chain(rgba: np.ndarray) -> List[np.ndarray]:
+    """Box-filtered levels from full size down to 4px on the shorter side."""
+    levels = [rgba]
+    current = rgba.astype(np.uint16)
+    while min(current.shape[:2]) >= MIN_MIP_SIZE * 2 and len(levels) < MAX_MIPMAPS:
+        height, width = current.shape[0] // 2, current.shape[1] // 2
+        current = current.reshape(height, 2, width, 2, 4).sum(axis=(1, 3), dtype=np.uint16)
+        current = (current + 2) >> 2
+        levels.append(current.astype(np.uint8))
+    return levels
+
+
+def _blocks(rgba: np.ndarray) -> np.ndarray:
+    """(blocks, 16, 4) float32 view of 4x4 tiles in row-major block order."""
+    height, width = rgba.shape[:2]
+    tiles = rgba.reshape(height // 4, 4, width // 4, 4, 4).swapaxes(1, 2)
+    return tiles.reshape(-1, 16, 4).astype(np.float32)
+
+
+def _pack_565(rgb: np.ndarray) -> np.ndarray:
+    r = np.clip(np.rint(rgb[..., 0] * 31 / 255), 0, 31).astype(np.uint16)
+    g = np.clip(np.rint(rgb[..., 1] * 63 / 255), 0, 63).astype(np.uint16)
+    b = np.clip(np.rint(rgb[..., 2] * 31 / 255), 0, 31).astype(np.uint16)
+    return (r << 11) | (g << 5) | b
+
+
+def _unpack_565(packed: np.ndarray) -> np.ndarray:
+    r = (packed >> 11) & 31
+    g = (packed >> 5) & 63
+    b = packed & 31
+    return np.stack([r * 255 / 31, g * 255 / 63, b * 255 / 31], axis=-1).astype(np.float32)
+
+
+def _nearest(values: np.ndarray, palette: np.ndarray) -> np.ndarray:
+    """Index of the closest palette entry per pixel; values (n, 16, c), palette (n, k, c)."""
+    distance = ((values[:, :, None, :] - palette[:, None, :, :]) ** 2).sum(axis=-1)
+    return distance.argmin(axis=-1).astype(np.uint32)
+
+
+def _pack_indices(indices: np.ndarray, bits: int) -> np.ndarray:
+    shifts = np.arange(16, dtype=np.uint64) * np.uint64(bits)
+    return (indices.astype(np.uint64) << shifts).sum(axis=1, dtype=np.uint64)
+
+
+def encode_color_blocks(blocks: np.ndarray) -> np.ndarray:
+    """DXT1 colour blocks (n, 8 bytes) using bounding-box endpoints inset by 1/16 of the range."""
+    rgb = blocks[:, :, :3]
+    low, high = rgb.min(axis=1), rgb.max(axis=1)
+    inset = (high - low) / 16
+    c0 = _pack_565(high - inset)
+    c1 = _pack_565(low + inset)
+    # Four-colour mode needs c0 > c1; equal endpoints fall back to index 0 everywhere.
+    swap = c0 < c1
+    c0, c1 = np.where(swap, c1, c0), np.where(swap, c0, c1)
+    e0, e1 = _unpack_565(c0), _unpack_565(c1)
+    palette = np.stack([e0, e1, (2 * e0 + e1) / 3, (e0 + 2 * e1) / 3], axis=1)
+    indices = _nearest(rgb, palette)
+    indices[c0 == c1] = 0
+    out = np.empty((len(blocks), 8), dtype=np.uint8)
+    out[:, 0:2] = c0.astype("<u2").view(np.uint8).reshape(-1, 2)
+    out[:, 2:4] = c1.astype("<u2").view(np.uint8).reshape(-1, 2)
+    out[:, 4:8] = _pack_indices(indices, 2).astype("<u4").view(np.uint8).reshape(-1, 4)
+    return out
+
+
+def encode_alpha_blocks(blocks: np.ndarray) -> np.ndarray:
+    """DXT5 alpha blocks (n, 8 bytes) in eight-value mode (a0 > a1)."""
+    alpha = blocks[:, :, 3]
+    a0 = alpha.max(axis=1).astype(np.uint8)
+    a1 = alpha.min(axis=1).astype(np.uint8)
+    weights = np.array([[7, 0], [0, 7], [6, 1], [5, 2], [4, 3], [3, 4], [2, 5], [1, 6]], dtype=np.float32) / 7
+    palette = weights[None, :, 0] * a0[:, None] + weights[None, :, 1] * a1[:, None]
+    indices = np.abs(alpha[:, :, None] - palette[:, None, :]).argmin(axis=-1).astype(np.uint32)
+    indices[a0 == a1] = 0
+    packed = _pack_indices(indices, 3).astype("<u8").view(np.uint8).reshape(-1, 8)
+    out = np.empty((len(blocks), 8), dtype=np.uint8)
+    out[:, 0] = a0
+    out[:, 1] = a1
+    out[:, 2:8] = packed[:, :6]
+    return out
+
+
+def compress(rgba: np.ndarray, fmt: str) -> bytes:
+    """Block-compress one level; blocks are encoded in batches to bound the temporary arrays."""
+    blocks = _blocks(rgba)
+    parts = []
+    for start in range(0, len(blocks), BLOCK_BATCH):
+        batch = blocks[start:start + BLOCK_BATCH]
+        colour = encode_color_blocks(batch)
+        parts.append(colour if fmt == "DXT1" else np.hstack([encode_alpha_blocks(batch), colour]))
+    return b"".join(part.tobytes() for part in parts)
+
+
+def _tagg(name: bytes, payload: bytes) -> bytes:
+    return b"GGAT" + name[::-1] + struct.pack("<I", len(payload)) + payload
+
+
+def encode_paa(rgba: np.ndarray, fmt: str) -> Tuple[bytes, int]:
+    """Serialized PAA file and its mipmap count."""
+    height, width = rgba.shape[:2]
+    for size in (width, height):
+        if size < MIN_MIP_SIZE or size & (size - 1):
+            raise TextureError(f"{width}x{height}: PAA textures need power-of-two sides of at least {MIN_MIP_SIZE}px")
+    levels = mipmap_chain(rgba)
+    average = rgba.reshape(-1, 4).mean(axis=0).round().astype(np.uint8)
+    taggs = _tagg(b"AVGC", bytes([average[2], average[1], average[0], average[3]]))
+    taggs += _tagg(b"MAXC", b"\xff\xff\xff\xff")
+    if fmt == "DXT5":
+        taggs += _tagg(b"FLAG", struct.pack("<I", ALPHA_FLAG_INTERPOLATED))
+    def header(offsets: List[int]) -> bytes:
+        offs = _tagg(b"OFFS", struct.pack(f"<{MAX_MIPMAPS}I", *offsets, *[0] * (MAX_MIPMAPS - len(offsets))))
+        return struct.pack("<H", PAA_DXT1 if fmt == "DXT1" else PAA_DXT5) + taggs + offs + struct.pack("<H", 0)
+
+    # The OFFS payload has a fixed size, so a header with zero offsets has the final length.
+    header_size = len(header([]))
+    offsets = []
+    mips = bytearray()
+    for level in levels:
+        data = compress(level, fmt)
+        offsets.append(header_size + len(mips))
+        mips += struct.pack("<HH", level.shape[1], level.shape[0]) + len(data).to_bytes(3, "little") + data
+    mips += b"\0" * 6
+    return header(offsets) + bytes(mips), len(levels)
+
+
+# --- batch conversion ---------------------------------------------------------------------------
+
+
+def source_digest(path: Path) -> str:
+    digest = hashlib.sha256(f"paa-v{ENCODER_VERSION}\0".encode("utf-8"))
+    with Path(path).open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def convert_texture(source: Path, output: Path) -> ConvertResult:
+    started = time.perf_counter()
+    try:
+        rgba = load_image(source)
+        fmt = texture_format(source, rgba)
+        data, mipmaps = encode_paa(rgba, fmt)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        temp = output.with_name(f".{output.name}.tmp")
+        temp.write_bytes(data)
+        os.replace(temp, output)
+    except (TextureError, OSError, zlib.error) as exc:
+        return ConvertResult(source, output, "", 0, 0, 0, 0, time.perf_counter() - started, error=str(exc))
+    height, width = rgba.shape[:2]
+    return ConvertResult(source, output, fmt, width, height, mipmaps, len(data), time.perf_counter() - started)
+
+
+def find_sources(src_dir: Path) -> List[Path]:
+    return sorted(path for path in Path(src_dir).rglob("*") if path.is_file() and path.suffix.lower() in SOURCE_SUFFIXES)
+
+
+def _load_cache(output_dir: Path) -> Dict[str, str]:
+    try:
+        return json.loads((output_dir / CACHE_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def convert_many(
+    src_dir: Path, output_dir: Optional[Path] = None, jobs: int = 1, force: bool = False
+) -> Iterator[ConvertResult]:
+    """Convert every PNG/TGA under ``src_dir`` (or ``src_dir`` itself when it names one texture); sources whose
+    hash matches the cache are skipped. Raises TextureError when there is nothing to convert."""
+    src_dir = Path(src_dir)
+    if src_dir.is_file():
+        if src_dir.suffix.lower() not in SOURCE_SUFFIXES:
+            raise TextureError(f"{src_dir} is not a PNG or TGA texture")
+        sources, src_dir = [src_dir], src_dir.parent
+    else:
+        sources = find_sources(src_dir)
+        if not sources:
+            raise TextureError(f"No PNG or TGA textures found under {src_dir}")
+    output_dir = Path(output_dir) if output_dir else src_dir
+    cache = {} if force else _load_cache(output_dir)
+    pending = []
+    digests: Dict[str, str] = {}
+    for source in sources:
+        relative = source.relative_to(src_dir)
+        output = output_dir / relative.with_suffix(".paa")
+        key = relative.as_posix()
+        digests[key] = source_digest(source)
+        if cache.get(key) == digests[key] and output.exists():
+            yield ConvertResult(source, output, "", 0, 0, 0, 0, 0.0, skipped=True)
+        else:
+            pending.append((key, source, output))
+
+    def record(key: str) -> None:
+        cache[key] = digests[key]
+        output_dir.mkdir(parents=True, exist_ok=True)
+        temp = output_dir / f".{CACHE_NAME}.tmp"
+        temp.write_text(json.dumps(cache, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        os.replace(temp, output_dir / CACHE_NAME)
+
+    if jobs <= 1 or len(pending) <= 1:
+        for key, source, output in pending:
+            result = convert_texture(source, output)
+            if not result.error:
+                record(key)
+            yield result
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+        futures = [(key, pool.submit(convert_texture, source, output)) for key, source, output in pending]
+        for key, future in futures:
+            result = future.result()
+            if not result.error:
+                record(key)
+            yield result
+
+
+def action_textures(src_dir: Path, output_dir: Optional[Path] = None, jobs: int = 1, force: bool = False) -> int:
+    started = time.perf_counter()
+    converted = skipped = failures = 0
+    for result in convert_many(src_dir, output_dir, jobs=jobs, force=force):
+        if result.skipped:
+            skipped += 1
+            continue
+        if result.error:
+            failures += 1
+            print(f"{result.source}: FAILED ({result.error})")
+            continue
+        converted += 1
+        print(
+            f"Converted {result.source} -> {result.output} "
+            f"({result.fmt}, {result.width}x{result.height}, {result.mipmaps} mipmaps, "
+            f"{result.bytes_written / 1024:.1f} KiB, {result.seconds:.2f}s)"
+        )
+    print(f"{converted} converted, {skipped} unchanged, {failures} failed in {time.perf_counter() - started:.2f}s")
+    return failures
+
+
+__all__ = ["TextureError", "action_textures", "convert_many", "convert_texture", "encode_paa"]
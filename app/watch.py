@@ -0,0 +1,182 @@
+"""Watch a scaffold spec (JSON/TOML) and re-render only the outputs its edits affect."""
+
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+from app.main import (
+    CONFIG_TEMPLATE,
+    MODEL_CFG_TEMPLATE,
+    ScaffoldContext,
+    add_binarized,
+    addon_directory,
+    display_path,
+    sync_scaffold,
+)
+from app.templating import CompiledTemplate
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python 3.10
+    tomllib = None  # type: ignore[assignment]
+
+DEFAULT_TEMPLATES: Dict[str, CompiledTemplate] = {"config.cpp": CONFIG_TEMPLATE, "model.cfg": MODEL_CFG_TEMPLATE}
+PREFIX_FIELDS = {"addon_prefix", "addon_folder"}
+
+
+class WatchSpecError(ValueError):
+    """Raised when a watch spec cannot be decoded or names unknown fields."""
+
+
+def template_fields(template: CompiledTemplate) -> Set[str]:
+    return set(template.fields)
+
+
+@dataclass
+class WatchSpec:
+    context: ScaffoldContext
+    output: Optional[Path] = None
+    templates: Dict[str, Path] = field(default_factory=dict)
+
+
+def load_spec(path: Path) -> WatchSpec:
+    raw = path.read_bytes()
+    if path.suffix.lower() == ".toml" and tomllib is None:
+        raise WatchSpecError("TOML specs need Python 3.11+; use a JSON spec instead")
+    try:
+        # JSON, TOML and UTF-8 decode errors are all ValueErrors.
+        if path.suffix.lower() == ".toml":
+            data = tomllib.loads(raw.decode("utf-8"))
+        else:
+            data = json.loads(raw.decode("utf-8"))
+        if not isinstance(data, dict):
+            raise ValueError("the spec must be a table of scaffold fields")
+        output = data.pop("output", None)
+        templates = data.pop("templates", {}) or {}
+        unknown = set(templates) - set(DEFAULT_TEMPLATES)
+        if unknown:
+            raise ValueError(f"Unknown template overrides: {', '.join(sorted(unknown))}")
+        context = ScaffoldContext.from_mapping(data)
+    except ValueError as exc:
+        raise WatchSpecError(f"{path}: {exc}") from None
+    return WatchSpec(
+        context,
+        (path.parent / output) if output else None,
+        {name: path.parent / value for name, value in templates.items()},
+    )
+
+
+class ScaffoldWatcher:
+    """Keeps the last rendered state warm so each cycle only re-renders what changed."""
+
+    def __init__(self, spec_path: Path, default_output: Path) -> None:
+        self.spec_path = spec_path
+        self.default_output = default_output
+        self.kwargs: Dict[str, object] = {}
+        self.templates: Dict[str, CompiledTemplate] = dict(DEFAULT_TEMPLATES)
+        self.template_sources: Dict[str, str] = {}
+        self.addon_dir: Optional[Path] = None
+        self.binarize = False
+
+    def watched_files(self) -> Set[Path]:
+        files = {self.spec_path}
+        try:
+            files |= set(load_spec(self.spec_path).templates.values())
+        except (OSError, ValueError):
+            pass
+        return files
+
+    def _load_templates(self, spec: WatchSpec) -> Set[str]:
+        changed = set()
+        for name, default in DEFAULT_TEMPLATES.items():
+            override = spec.templates.get(name)
+            source = override.read_text(encoding="utf-8") if override else default.template
+            if self.template_sources.get(name) != source:
+                self.template_sources[name] = source
+                self.templates[name] = CompiledTemplate(source) if override else default
+                changed.add(name)
+        return changed
+
+    def cycle(self) -> Tuple[Dict[str, str], Path]:
+        """Reload the spec and return the outputs that need rewriting."""
+        spec = load_spec(self.spec_path)
+        ctx = spec.context
+        kwargs = ctx.to_format_kwargs()
+        addon_dir = addon_directory(spec.output or self.default_output, ctx)
+        outputs = self._load_templates(spec)
+        if addon_dir != self.addon_dir:
+            outputs = set(DEFAULT_TEMPLATES) | {"$PBOPREFIX$"}
+        else:
+            changed_keys = {key for key, value in kwargs.items() if self.kwargs.get(key) != value}
+            outputs |= {name for name, tpl in self.templates.items() if template_fields(tpl) & changed_keys}
+            if changed_keys & PREFIX_FIELDS:
+                outputs.add("$PBOPREFIX$")
+        rendered = {
+            name: self.templates[name].render(kwargs).strip() + "\n"
+            for name in sorted(outputs)
+            if name in self.templates
+        }
+        if ctx.binarize and ("config.cpp" in rendered or not self.binarize):
+            rendered.setdefault("config.cpp", self.templates["config.cpp"].render(kwargs).strip() + "\n")
+            add_binarized(rendered)
+        if "$PBOPREFIX$" in outputs:
+            rendered["$PBOPREFIX$"] = ctx.pbo_prefix + "\n"
+        if rendered or addon_dir != self.addon_dir:
+            addon_dir.mkdir(parents=True, exist_ok=True)
+            sync_scaffold(addon_dir, ctx, rendered=rendered)
+        self.kwargs = kwargs
+        self.binarize = ctx.binarize
+        self.addon_dir = addon_dir
+        return rendered, addon_dir
+
+
+def _mtimes(paths: Set[Path]) -> Dict[Path, int]:
+    stamps = {}
+    for path in paths:
+        try:
+            stamps[path] = path.stat().st_mtime_ns
+        except OSError:
+            stamps[path] = -1
+    return stamps
+
+
+def action_watch(spec_path: Path, output: Path, interval: float = 0.2, debounce: float = 0.3) -> None:
+    watcher = ScaffoldWatcher(spec_path, output)
+    # A spec that is broken at startup ends the command with its error; later edits are retried.
+    rendered, addon_dir = watcher.cycle()
+    print(f"Watching {display_path(spec_path)} -> {display_path(addon_dir)} ({len(rendered)} files rendered). Ctrl+C to stop.")
+    stamps = _mtimes(watcher.watched_files())
+    try:
+        while True:
+            time.sleep(interval)
+            current = _mtimes(set(stamps) | watcher.watched_files())
+            if current == stamps:
+                continue
+            # Debounce: wait until the files stop changing before re-rendering.
+            while True:
+                time.sleep(debounce)
+                settled = _mtimes(set(current))
+                if settled == current:
+                    break
+                current = settled
+            stamps = current
+            edited_at = max(stamp for stamp in current.values() if stamp >= 0) / 1e9
+            started = time.perf_counter()
+            try:
+                rendered, addon_dir = watcher.cycle()
+            except (OSError, ValueError, KeyError) as exc:
+                print(f"[{time.strftime('%H:%M:%S')}] Spec not applied: {exc}")
+                continue
+            render_ms = (time.perf_counter() - started) * 1000
+            latency_ms = (time.time() - edited_at) * 1000
+            names = ", ".join(rendered) or "nothing"
+            print(f"[{time.strftime('%H:%M:%S')}] Re-rendered {names} in {render_ms:.1f} ms (edit-to-written {latency_ms:.0f} ms)")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+
+__all__ = ["ScaffoldWatcher", "WatchSpec", "WatchSpecError", "action_watch", "load_spec", "template_fields"]
@@ -2,14 +2,38 @@
 
 from __future__ import annotations
 
+import gzip
+import hashlib
 import io
-from pathlib import Path
-from typing import Dict
-from zipfile import ZipFile
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import IO, Callable, Dict, Iterator, List, Mapping, Tuple
 
-from flask import Flask, render_template_string, request, send_file, url_for
+from flask import Flask, Request, Response, current_app, g, jsonify, render_template, request, send_file, url_for
+from jinja2 import DictLoader
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.wsgi import ClosingIterator
 
-from app.main import MODEL_CFG_TEMPLATE, CONFIG_TEMPLATE, ScaffoldContext, STEP_OVERVIEW
+from app.archive import ZipSource, build_zip, iter_zip
+from app.cache import ByteLRUCache, context_key
+from app.classnames import ClassnameIndex, validate_context
+from app.jobs import DEFAULT_JOB_WORKERS, DEFAULT_MAX_QUEUED_JOBS, MAX_BATCH_SIZE, JobQueue, QueueFull
+from app.main import MODEL_CFG_TEMPLATE, CONFIG_TEMPLATE, ScaffoldContext, STEP_OVERVIEW, placeholder_files
+from app.metrics import NO_METRICS, Metrics
+from app.preview import PreviewSessions, UnknownSession
+from app.rapify import rapify_text
+
+
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+DEFAULT_MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+DEFAULT_UPLOAD_BUDGET_BYTES = 2 * 1024 * 1024 * 1024
+# Multipart file parts larger than this spool to a temporary file instead of memory.
+UPLOAD_SPOOL_BYTES = 256 * 1024
+DEFAULT_JOBS_DIR = Path(tempfile.gettempdir()) / "arma_scaffold_jobs"
 
 
 PAGE_BASE = """
@@ -33,6 +57,7 @@ PAGE_BASE = """
     form .row { display: grid; grid-template-columns: repeat(auto-fit, minmax(240px, 1fr)); gap: 1rem; }
     ul { padding-left: 1.1rem; }
     code { background: #0b1325; padding: 0.2rem 0.4rem; border-radius: 6px; }
+    pre { background: #0b1325; padding: 1rem; border-radius: 8px; overflow-x: auto; max-height: 28rem; }
   </style>
 </head>
 <body>
@@ -50,7 +75,7 @@ PAGE_BASE = """
     </div>
   </header>
   <main>
-    {{ body|safe }}
+    {% block body %}{{ body|safe }}{% endblock %}
   </main>
 </body>
 </html>
@@ -108,7 +133,7 @@ SCAFFOLD_FORM = """
 <div class="card">
   <h2>Scaffold generator</h2>
   <p>Provide the names you want baked into config.cpp/model.cfg. The download includes placeholders for the model, optic, textures, and UI icons.</p>
-  <form method="post">
+  <form method="post" enctype="multipart/form-data">
     <div class="row">
       <div>
         <label for="addon_prefix">Mod prefix (folder)</label>
@@ -155,7 +180,7 @@ SCAFFOLD_FORM = """
     </div>
     <div class="row" style="margin-top:1rem;">
       <div>
-        <label for="optic_class">Optic classname</label>
+        <label for="optic_class">Optic classnames (comma-separated, empty for none)</label>
         <input id="optic_class" name="optic_class" value="{{ defaults.optic_class }}">
       </div>
       <div>
@@ -173,101 +198,691 @@ SCAFFOLD_FORM = """
         <input id="optic_icon" name="optic_icon" value="{{ defaults.optic_icon }}">
       </div>
     </div>
+    <div class="row" style="margin-top:1rem;">
+      <div>
+        <label for="fire_modes">Fire modes (Single, Burst, FullAuto)</label>
+        <input id="fire_modes" name="fire_modes" value="{{ defaults.fire_modes }}">
+      </div>
+      <div>
+        <label for="magazine_class">Custom magazine classname (optional)</label>
+        <input id="magazine_class" name="magazine_class" value="{{ defaults.magazine_class }}">
+      </div>
+      <div>
+        <label for="ammo_class">Custom ammo classname (optional)</label>
+        <input id="ammo_class" name="ammo_class" value="{{ defaults.ammo_class }}">
+      </div>
+    </div>
+    <div style="margin-top:1rem;">
+      <label for="variants">Variants, one per line: classname | display name | textures (comma-separated) | model</label>
+      <textarea id="variants" name="variants" rows="3">{{ defaults.variants }}</textarea>
+    </div>
     <div style="margin-top:1rem;">
       <label for="required_addons">Required addons (comma-separated)</label>
       <input id="required_addons" name="required_addons" value="{{ defaults.required_addons }}">
     </div>
+    <div class="row" style="margin-top:1rem;">
+      {% for field, label in upload_fields %}
+      <div>
+        <label for="{{ field }}">{{ label }} (optional upload)</label>
+        <input id="{{ field }}" name="{{ field }}" type="file">
+      </div>
+      {% endfor %}
+    </div>
+    <div style="margin-top:1rem;">
+      <label><input type="checkbox" name="binarize" value="1" style="width:auto;"> Also include a binarized config.bin</label>
+    </div>
     <div style="margin-top:1.5rem;display:flex;gap:0.75rem;align-items:center;">
       <button class="button" type="submit">Download scaffold zip</button>
-      <p style="color:#9ca3af;margin:0;">Includes config.cpp, model.cfg, placeholder .p3d/.paa/.rvmat files.</p>
+      <p style="color:#9ca3af;margin:0;">Includes config.cpp, model.cfg, and your uploads or placeholder .p3d/.paa/.rvmat files.</p>
     </div>
   </form>
+  <datalist id="classname-suggestions"></datalist>
+</div>
+<div class="card">
+  <h2>Preview</h2>
+  <p id="preview-error" style="color:#f87171;margin:0 0 1rem;" hidden></p>
+  <h3>config.cpp</h3>
+  <pre id="preview-config.cpp"></pre>
+  <h3>model.cfg</h3>
+  <pre id="preview-model.cfg"></pre>
+</div>
+<script>
+  // Live preview via /api/preview: debounced, sends only fields changed since the last request and
+  // patches the rendered segments the server says changed.
+  const previewForm = document.querySelector("form");
+  const previewInputs = [...previewForm.querySelectorAll("input:not([type=file]):not([type=checkbox]), textarea")];
+  const previewError = document.getElementById("preview-error");
+  const previewSegments = {};
+  let previewSession = null;
+  let previewSent = {};
+  let previewTimer = null;
+  let previewBusy = false;
+  let previewAgain = false;
+
+  function previewChanges(all) {
+    const fields = {};
+    for (const input of previewInputs) {
+      if (all || previewSent[input.name] !== input.value) fields[input.name] = input.value;
+    }
+    return fields;
+  }
+
+  async function sendPreview(all = false) {
+    if (previewBusy) { previewAgain = true; return; }
+    const fields = previewChanges(all || !previewSession);
+    if (!Object.keys(fields).length) return;
+    previewBusy = true;
+    try {
+      const response = await fetch("{{ url_for('api_preview') }}", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ session: all ? null : previewSession, fields }),
+      });
+      const data = await response.json();
+      if (response.status === 409 && data.resync) {
+        previewSession = null;
+        previewAgain = true;
+        return;
+      }
+      if (!response.ok) { previewError.textContent = data.error; previewError.hidden = false; return; }
+      Object.assign(previewSent, fields);
+      previewSession = data.session;
+      previewError.textContent = data.error;
+      previewError.hidden = !data.error;
+      for (const [name, patch] of Object.entries(data.files)) {
+        if (data.full) previewSegments[name] = patch;
+        else for (const [index, text] of Object.entries(patch)) previewSegments[name][index] = text;
+        document.getElementById(`preview-${name}`).textContent = previewSegments[name].join("");
+      }
+    } finally {
+      previewBusy = false;
+      if (previewAgain) { previewAgain = false; sendPreview(!previewSession); }
+    }
+  }
+
+  previewForm.addEventListener("input", () => {
+    clearTimeout(previewTimer);
+    previewTimer = setTimeout(sendPreview, 150);
+  });
+  sendPreview(true);
+</script>
+<script>
+  // Suggest classnames for the last comma-separated item via /api/complete.
+  const completeKinds = { magazines: "magazine", magazine_wells: "magazine_well", required_addons: "patch" };
+  const suggestions = document.getElementById("classname-suggestions");
+  for (const [field, kind] of Object.entries(completeKinds)) {
+    const input = document.getElementById(field);
+    input.setAttribute("list", "classname-suggestions");
+    input.setAttribute("autocomplete", "off");
+    input.addEventListener("input", async () => {
+      const parts = input.value.split(",");
+      const prefix = parts.pop().trim();
+      if (prefix.length < 2) return;
+      const response = await fetch(`{{ url_for('api_complete') }}?kind=${kind}&q=${encodeURIComponent(prefix)}`);
+      const data = await response.json();
+      const head = parts.length ? parts.join(",") + "," : "";
+      suggestions.replaceChildren(...data.results.map((item) => new Option(head + item.name)));
+    });
+  }
+</script>
+"""
+
+
+VALIDATION_BODY = """
+<div class="card">
+  <h2>Please fix these classnames</h2>
+  <ul>
+    {% for problem in problems %}
+    <li>{{ problem }}</li>
+    {% endfor %}
+  </ul>
+  <p><a href="{{ url_for('scaffold') }}">← Back to the scaffold form</a></p>
 </div>
 """
 
 
-def create_app() -> Flask:
+def _first_optic(key: str) -> Callable[[ScaffoldContext], str]:
+    def path(ctx: ScaffoldContext) -> str:
+        optics = ctx.optic_list()
+        if not optics or not optics[0][key]:
+            return ""
+        return f"data/UI/{optics[0][key]}" if key == "icon" else optics[0][key]
+
+    return path
+
+
+# Form file field -> (label, addon-relative path of the placeholder it replaces; "" when unused).
+UPLOAD_FIELDS: Dict[str, Tuple[str, Callable[[ScaffoldContext], str]]] = {
+    "model_upload": ("Weapon model .p3d", lambda ctx: ctx.model_filename),
+    "optic_model_upload": ("Optic model .p3d", _first_optic("model")),
+    "texture_co_upload": ("Color texture _co.paa", lambda ctx: "data/rifle_dmr_co.paa"),
+    "texture_nohq_upload": ("Normal map _nohq.paa", lambda ctx: "data/rifle_dmr_nohq.paa"),
+    "texture_smdi_upload": ("Specular map _smdi.paa", lambda ctx: "data/rifle_dmr_smdi.paa"),
+    "rvmat_upload": ("Material .rvmat", lambda ctx: "data/rifle_dmr.rvmat"),
+    "weapon_icon_upload": ("Weapon icon .paa", lambda ctx: f"data/UI/{ctx.weapon_icon}"),
+    "optic_icon_upload": ("Optic icon .paa", _first_optic("icon")),
+}
+
+
+class UploadRequest(Request):
+    """Spools multipart file parts to disk past ``UPLOAD_SPOOL_BYTES`` so large models never sit in memory.
+
+    The first non-empty file part reserves the request's size in the app's ``UploadBudget``; forms whose
+    file inputs were left empty never touch it. ``upload_reserved`` is what the view must release."""
+
+    upload_reserved = 0
+
+    def _get_file_stream(
+        self, total_content_length: int | None, content_type: str | None, filename: str | None = None,
+        content_length: int | None = None,
+    ) -> IO[bytes]:
+        if filename and not self.upload_reserved:
+            # Chunked bodies have no declared length, so they hold the full per-request allowance.
+            size = total_content_length if total_content_length is not None else current_app.config["MAX_CONTENT_LENGTH"]
+            if not current_app.extensions["upload_budget"].reserve(size):
+                busy = Response("Too many uploads in progress; try again shortly.", status=503)
+                busy.headers["Retry-After"] = "5"
+                raise ServiceUnavailable(response=busy)
+            self.upload_reserved = size
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, mode="rb+")
+
+    def hand_off_files(self) -> Callable[[], None]:
+        """Keep uploaded files open past the request context; the returned callable closes them."""
+        self._files_handed_off = True
+        return super().close
+
+    def close(self) -> None:
+        if not getattr(self, "_files_handed_off", False):
+            super().close()
+
+
+class UploadBudget:
+    """Bytes of request bodies currently being received or streamed back, across all threads."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, size: int) -> bool:
+        with self._lock:
+            if self.in_flight + size > self.limit:
+                return False
+            self.in_flight += size
+            return True
+
+    def release(self, size: int) -> None:
+        with self._lock:
+            self.in_flight -= size
+
+
+def _page(body: str) -> str:
+    return '{% extends "base.html" %}{% block body %}' + body + "{% endblock %}"
+
+
+TEMPLATES: Dict[str, str] = {
+    "base.html": PAGE_BASE,
+    "index.html": _page(INDEX_BODY),
+    "guides.html": _page(GUIDE_BODY),
+    "plan.html": _page(PLAN_BODY),
+    "scaffold.html": _page(SCAFFOLD_FORM),
+    "validation.html": _page(VALIDATION_BODY),
+}
+STATIC_CACHE_CONTROL = "public, max-age=300"
+
+
+@dataclass(frozen=True)
+class StaticPage:
+    """A page rendered once at startup, kept as identity and gzip bodies."""
+
+    body: bytes
+    gzipped: bytes
+    etag: str
+
+    @classmethod
+    def from_html(cls, html: str) -> "StaticPage":
+        body = html.encode("utf-8")
+        return cls(body, gzip.compress(body, compresslevel=9, mtime=0), hashlib.sha256(body).hexdigest()[:32])
+
+    def respond(self) -> Response:
+        use_gzip = request.accept_encodings["gzip"] > 0
+        etag = f"{self.etag}-gz" if use_gzip else self.etag
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.gzipped if use_gzip else self.body, mimetype="text/html")
+            if use_gzip:
+                response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = STATIC_CACHE_CONTROL
+        response.vary.add("Accept-Encoding")
+        return response
+
+
+def form_defaults() -> Dict[str, str]:
+    defaults = ScaffoldContext()
+    return {
+        "addon_prefix": defaults.addon_prefix,
+        "addon_folder": defaults.addon_folder,
+        "author": defaults.author,
+        "weapon_class": defaults.weapon_class,
+        "weapon_name": defaults.weapon_name,
+        "magazine_wells": defaults.magazine_wells,
+        "magazines": defaults.magazines,
+        "model_filename": defaults.model_filename,
+        "weapon_icon": defaults.weapon_icon,
+        "optic_class": defaults.optic_class,
+        "optic_name": defaults.optic_name,
+        "optic_model": defaults.optic_model,
+        "optic_icon": defaults.optic_icon,
+        "fire_modes": defaults.fire_modes,
+        "magazine_class": defaults.magazine_class,
+        "ammo_class": defaults.ammo_class,
+        "variants": "",
+        "required_addons": ",".join(defaults.required_addons),
+    }
+
+
+def render_static_pages(app: Flask) -> Dict[str, StaticPage]:
+    """Render every request-independent page once, inside a throwaway request context."""
+    pages = {
+        "index": ("index.html", {}),
+        "guides": ("guides.html", {}),
+        "plan": ("plan.html", {"steps": STEP_OVERVIEW}),
+        "scaffold": (
+            "scaffold.html",
+            {"defaults": form_defaults(), "upload_fields": [(field, label) for field, (label, _) in UPLOAD_FIELDS.items()]},
+        ),
+    }
+    with app.test_request_context("/"):
+        return {
+            endpoint: StaticPage.from_html(render_template(template, **context))
+            for endpoint, (template, context) in pages.items()
+        }
+
+
+def scaffold_entries(
+    ctx: ScaffoldContext, metrics: Metrics = NO_METRICS, uploads: Dict[str, FileStorage] | None = None
+) -> List[Tuple[str, ZipSource]]:
+    """Zip entries for a scaffold; ``uploads`` (addon-relative path -> file) replace matching placeholders."""
+    addon_root = f"@MyWeaponMod/addons/{ctx.addon_folder}"
+    with metrics.stage("to_format_kwargs"):
+        kwargs = ctx.to_format_kwargs()
+    with metrics.stage("template_substitution"):
+        entries: List[Tuple[str, ZipSource]] = [
+            (f"{addon_root}/config.cpp", CONFIG_TEMPLATE.render(kwargs)),
+            (f"{addon_root}/model.cfg", MODEL_CFG_TEMPLATE.render(kwargs)),
+            (f"{addon_root}/$PBOPREFIX$", ctx.pbo_prefix + "\n"),
+        ]
+    if ctx.binarize:
+        with metrics.stage("rapify"):
+            entries.insert(1, (f"{addon_root}/config.bin", rapify_text(entries[0][1])))  # type: ignore[arg-type]
+    placeholders = placeholder_files(PurePosixPath(addon_root), ctx)  # type: ignore[arg-type]
+    uploads = uploads or {}
+    root = PurePosixPath(addon_root)
+    for path in placeholders:
+        upload = uploads.get(PurePosixPath(path).relative_to(root).as_posix())
+        entries.append((path.as_posix(), upload.stream if upload is not None else ""))
+    return entries
+
+
+def build_scaffold_zip(ctx: ScaffoldContext) -> bytes:
+    return build_zip(scaffold_entries(ctx))
+
+
+def wants_buffered_download() -> bool:
+    if request.values.get("buffered", "").lower() in {"1", "true", "yes"}:
+        return True
+    # HTTP/1.0 clients cannot receive chunked transfer encoding.
+    return request.environ.get("SERVER_PROTOCOL") == "HTTP/1.0"
+
+
+def uploads_from_form(ctx: ScaffoldContext) -> Dict[str, FileStorage]:
+    """Uploaded files keyed by the addon-relative placeholder path they replace.
+
+    Raises ValueError when a file's extension does not match its target."""
+    uploads: Dict[str, FileStorage] = {}
+    for field, (label, target) in UPLOAD_FIELDS.items():
+        upload = request.files.get(field)
+        if upload is None or not upload.filename:
+            continue
+        path = target(ctx)
+        if not path:
+            raise ValueError(f"{label} was uploaded but the form does not name a file for it.")
+        expected = PurePosixPath(path).suffix.lower()
+        if PurePosixPath(upload.filename).suffix.lower() != expected:
+            raise ValueError(f"{label} must be a {expected} file, got {upload.filename!r}.")
+        uploads[path] = upload
+    return uploads
+
+
+def scaffold_context_from_values(values: Mapping[str, str]) -> ScaffoldContext:
+    """Build a context from scaffold form fields; missing fields keep their defaults."""
+    defaults = ScaffoldContext()
+    return ScaffoldContext(
+        addon_prefix=values.get("addon_prefix", defaults.addon_prefix),
+        addon_folder=values.get("addon_folder", defaults.addon_folder),
+        author=values.get("author", defaults.author),
+        weapon_class=values.get("weapon_class", defaults.weapon_class),
+        weapon_name=values.get("weapon_name", defaults.weapon_name),
+        magazine_wells=values.get("magazine_wells", defaults.magazine_wells),
+        magazines=values.get("magazines", defaults.magazines),
+        model_filename=values.get("model_filename", defaults.model_filename),
+        weapon_icon=values.get("weapon_icon", defaults.weapon_icon),
+        optic_class=values.get("optic_class", defaults.optic_class),
+        optic_name=values.get("optic_name", defaults.optic_name),
+        optic_model=values.get("optic_model", defaults.optic_model),
+        optic_icon=values.get("optic_icon", defaults.optic_icon),
+        fire_modes=values.get("fire_modes", defaults.fire_modes),
+        magazine_class=values.get("magazine_class", defaults.magazine_class),
+        ammo_class=values.get("ammo_class", defaults.ammo_class),
+        variants=values.get("variants", ""),
+        binarize=values.get("binarize", ""),
+        required_addons=[addon.strip() for addon in values.get("required_addons", ",".join(defaults.required_addons)).split(",") if addon.strip()],
+    )
+
+
+def scaffold_context_from_form() -> ScaffoldContext:
+    return scaffold_context_from_values(request.form)
+
+
+def create_app(
+    cache_bytes: int = DEFAULT_CACHE_BYTES,
+    classname_index: Path | None = None,
+    metrics_enabled: bool = True,
+    max_upload_bytes: int = DEFAULT_MAX_UPLOAD_BYTES,
+    upload_budget_bytes: int = DEFAULT_UPLOAD_BUDGET_BYTES,
+    jobs_dir: Path | None = None,
+    job_workers: int = DEFAULT_JOB_WORKERS,
+    max_queued_jobs: int = DEFAULT_MAX_QUEUED_JOBS,
+    profile_dir: Path | None = None,
+    metrics_dir: Path | None = None,
+) -> Flask:
     app = Flask(__name__)
+    app.request_class = UploadRequest
+    # Per-request cap (413); the budget below caps the sum across concurrent uploads (503).
+    app.config["MAX_CONTENT_LENGTH"] = max_upload_bytes
+    upload_budget = UploadBudget(upload_budget_bytes)
+    app.extensions["upload_budget"] = upload_budget
+    app.jinja_loader = DictLoader(TEMPLATES)  # type: ignore[assignment]
+    metrics = Metrics(directory=metrics_dir) if metrics_enabled else NO_METRICS
+    app.extensions["metrics"] = metrics
+    classnames = ClassnameIndex(classname_index) if classname_index else None
+    app.extensions["classnames"] = classnames
+    zip_cache = ByteLRUCache(cache_bytes)
+    app.extensions["scaffold_cache"] = zip_cache
+    # Streamed archives are also captured for the cache, but only while they stay small.
+    tee_limit = cache_bytes // 4
+
+    def stream_and_cache(key: str, entries: List[Tuple[str, ZipSource]]) -> Iterator[bytes]:
+        captured: List[bytes] | None = []
+        captured_bytes = 0
+        for chunk in iter_zip(entries):
+            if captured is not None:
+                captured_bytes += len(chunk)
+                if captured_bytes <= tee_limit:
+                    captured.append(chunk)
+                else:
+                    captured = None
+            yield chunk
+        if captured is not None:
+            zip_cache.put(key, b"".join(captured))
+
+    if metrics.enabled:
+
+        @app.before_request
+        def start_timer():
+            g.request_started = time.perf_counter()
 
-    def render_page(body: str, **context: Dict[str, str]):
-        return render_template_string(PAGE_BASE, body=body, **context)
+        @app.after_request
+        def record_request(response: Response) -> Response:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            labels = (("route", route), ("method", request.method))
+            metrics.observe("arma_http_request_duration_seconds", labels, time.perf_counter() - g.request_started)
+            metrics.inc("arma_http_requests_total", labels + (("status", str(response.status_code)),))
+            # Streamed bodies have no length yet; their bytes are counted as they are sent.
+            if response.content_length:
+                metrics.inc("arma_http_response_bytes_total", (("route", route),), response.content_length)
+            return response
+
+        @app.get("/metrics")
+        def metrics_text():
+            return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
     @app.get("/")
     def index():
-        return render_page(INDEX_BODY)
+        return static_pages["index"].respond()
 
     @app.get("/guides")
     def guides():
-        return render_page(GUIDE_BODY)
+        return static_pages["guides"].respond()
 
     @app.get("/plan")
     def plan():  # type: ignore[override]
-        return render_page(PLAN_BODY, steps=STEP_OVERVIEW)
+        return static_pages["plan"].respond()
 
     @app.route("/scaffold", methods=["GET", "POST"])
     def scaffold():  # type: ignore[override]
-        defaults = ScaffoldContext()
         if request.method == "GET":
-            return render_page(
-                SCAFFOLD_FORM,
-                defaults={
-                    "addon_prefix": defaults.addon_prefix,
-                    "addon_folder": defaults.addon_folder,
-                    "author": defaults.author,
-                    "weapon_class": defaults.weapon_class,
-                    "weapon_name": defaults.weapon_name,
-                    "magazine_wells": defaults.magazine_wells,
-                    "magazines": defaults.magazines,
-                    "model_filename": defaults.model_filename,
-                    "weapon_icon": defaults.weapon_icon,
-                    "optic_class": defaults.optic_class,
-                    "optic_name": defaults.optic_name,
-                    "optic_model": defaults.optic_model,
-                    "optic_icon": defaults.optic_icon,
-                    "required_addons": ",".join(defaults.required_addons),
-                },
-            )
-
-        ctx = ScaffoldContext(
-            addon_prefix=request.form.get("addon_prefix", defaults.addon_prefix),
-            addon_folder=request.form.get("addon_folder", defaults.addon_folder),
-            author=request.form.get("author", defaults.author),
-            weapon_class=request.form.get("weapon_class", defaults.weapon_class),
-            weapon_name=request.form.get("weapon_name", defaults.weapon_name),
-            magazine_wells=request.form.get("magazine_wells", defaults.magazine_wells),
-            magazines=request.form.get("magazines", defaults.magazines),
-            model_filename=request.form.get("model_filename", defaults.model_filename),
-            weapon_icon=request.form.get("weapon_icon", defaults.weapon_icon),
-            optic_class=request.form.get("optic_class", defaults.optic_class),
-            optic_name=request.form.get("optic_name", defaults.optic_name),
-            optic_model=request.form.get("optic_model", defaults.optic_model),
-            optic_icon=request.form.get("optic_icon", defaults.optic_icon),
-            required_addons=[addon.strip() for addon in request.form.get("required_addons", ",".join(defaults.required_addons)).split(",") if addon.strip()],
+            return static_pages["scaffold"].respond()
+
+        if request.mimetype == "multipart/form-data" and (request.content_length or 0) > max_upload_bytes:
+            return render_template("validation.html", problems=["The upload is too large."]), 413
+        # The budget is reserved while the form is parsed, and only if it carries a file (UploadRequest).
+        try:
+            response = scaffold_response()
+        except BaseException:
+            upload_budget.release(request.upload_reserved)  # type: ignore[attr-defined]
+            raise
+        return release_when_sent(response, request.upload_reserved)  # type: ignore[attr-defined]
+
+    def release_when_sent(response: Response, reserved: int) -> Response:
+        """Hand the reservation back once the body no longer needs the uploads.
+
+        Buffered bodies (including ``send_file``'s passthrough files, whose close hooks the server never
+        runs) are complete already; streamed bodies release when the server closes their iterator."""
+        if not reserved:
+            return response
+        if response.is_streamed and not response.direct_passthrough:
+            response.response = ClosingIterator(response.response, lambda: upload_budget.release(reserved))
+        else:
+            upload_budget.release(reserved)
+        return response
+
+    def scaffold_response() -> Response:
+        with metrics.stage("form_parsing"):
+            try:
+                ctx = scaffold_context_from_form()
+                uploads = uploads_from_form(ctx)
+            except ValueError as exc:
+                return app.response_class(render_template("validation.html", problems=[str(exc)]), status=422)
+
+        if classnames is not None:
+            problems = validate_context(ctx, classnames)
+            if problems:
+                return app.response_class(render_template("validation.html", problems=problems), status=422)
+
+        download_name = f"{ctx.addon_folder}_scaffold.zip"
+        if uploads:
+            # Uploaded content makes the archive unique, so it skips the ETag and zip cache entirely.
+            metrics.inc("arma_scaffold_archives_built_total")
+            metrics.inc("arma_scaffold_upload_bytes_total", amount=sum(upload.stream.seek(0, io.SEEK_END) for upload in uploads.values()))
+            entries = scaffold_entries(ctx, metrics, uploads)
+            if wants_buffered_download():
+                spooled = tempfile.TemporaryFile()
+                with metrics.stage("zip_assembly"):
+                    for chunk in iter_zip(entries):
+                        spooled.write(chunk)
+                size = spooled.tell()
+                spooled.seek(0)
+                response = send_file(spooled, as_attachment=True, download_name=download_name, mimetype="application/zip")
+                # send_file cannot size an anonymous file, and a sized body is the point of this fallback.
+                response.content_length = size
+                return response
+            # The spooled files are read while the body streams, after the request context is gone.
+            response_close = request.hand_off_files()  # type: ignore[attr-defined]
+            chunks: Iterator[bytes] = iter_zip(entries)
+            if metrics.enabled:
+                chunks = metrics.timed_iter("zip_assembly", chunks, request.url_rule.rule)
+            response = app.response_class(chunks, mimetype="application/zip")
+            response.headers.set("Content-Disposition", "attachment", filename=download_name)
+            response.headers["X-Scaffold-Cache"] = "bypass"
+            response.call_on_close(response_close)
+            return response
+
+        key = context_key(ctx)
+        if request.if_none_match.contains(key):
+            response = app.response_class(status=304)
+            response.set_etag(key)
+            return response
+
+        archive = zip_cache.get(key)
+        if archive is None and not wants_buffered_download():
+            metrics.inc("arma_scaffold_archives_built_total")
+            chunks = stream_and_cache(key, scaffold_entries(ctx, metrics))
+            if metrics.enabled:
+                chunks = metrics.timed_iter("zip_assembly", chunks, request.url_rule.rule)
+            response = app.response_class(chunks, mimetype="application/zip")
+            response.headers.set("Content-Disposition", "attachment", filename=download_name)
+            response.set_etag(key)
+            response.headers["X-Scaffold-Cache"] = "miss"
+            return response
+
+        cache_state = "hit"
+        if archive is None:
+            cache_state = "miss"
+            metrics.inc("arma_scaffold_archives_built_total")
+            entries = scaffold_entries(ctx, metrics)
+            with metrics.stage("zip_assembly"):
+                archive = build_zip(entries)
+            zip_cache.put(key, archive)
+
+        response = send_file(
+            io.BytesIO(archive), as_attachment=True, download_name=download_name, mimetype="application/zip"
         )
+        response.set_etag(key)
+        response.headers["X-Scaffold-Cache"] = cache_state
+        return response
 
-        zip_bytes = io.BytesIO()
-        addon_root = f"@MyWeaponMod/addons/{ctx.addon_folder}"
-        kwargs = ctx.to_format_kwargs()
-        with ZipFile(zip_bytes, "w") as bundle:
-            bundle.writestr(f"{addon_root}/config.cpp", CONFIG_TEMPLATE.substitute(**kwargs))
-            bundle.writestr(f"{addon_root}/model.cfg", MODEL_CFG_TEMPLATE.substitute(**kwargs))
-            placeholder_paths = [
-                f"{addon_root}/{ctx.model_filename}",
-                f"{addon_root}/{ctx.optic_model}",
-                f"{addon_root}/data/rifle_dmr_co.paa",
-                f"{addon_root}/data/rifle_dmr_nohq.paa",
-                f"{addon_root}/data/rifle_dmr_smdi.paa",
-                f"{addon_root}/data/rifle_dmr.rvmat",
-                f"{addon_root}/data/UI/{ctx.weapon_icon}",
-                f"{addon_root}/data/UI/{ctx.optic_icon}",
+    @app.get("/api/complete")
+    def api_complete():
+        if classnames is None:
+            return jsonify({"available": False, "results": []})
+        kind = request.args.get("kind") or None
+        limit = min(request.args.get("limit", 20, type=int), 100)
+        results = classnames.complete(request.args.get("q", ""), kind, limit)
+        return jsonify({"available": True, "results": [{"name": name, "kind": kind} for name, kind in results]})
+
+    jobs_lock = threading.Lock()
+
+    def job_queue() -> JobQueue:
+        # Opened on first use so pages-only deployments never touch the jobs directory.
+        with jobs_lock:
+            if "scaffold_jobs" not in app.extensions:
+                app.extensions["scaffold_jobs"] = JobQueue(
+                    jobs_dir or DEFAULT_JOBS_DIR, lambda ctx: scaffold_entries(ctx, metrics), job_workers, max_queued_jobs
+                )
+            return app.extensions["scaffold_jobs"]
+
+    def job_json(job) -> Dict[str, object]:
+        data = job.to_json()
+        data["status_url"] = url_for("api_job", job_id=job.id)
+        if job.status == "done":
+            data["download_url"] = url_for("api_job_archive", job_id=job.id)
+        return data
+
+    @app.post("/api/scaffold")
+    def api_scaffold():
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, list) or not payload:
+            return jsonify({"error": "Expected a non-empty JSON array of scaffold contexts."}), 400
+        if len(payload) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"At most {MAX_BATCH_SIZE} contexts per job."}), 413
+        contexts: List[ScaffoldContext] = []
+        for index, item in enumerate(payload):
+            if not isinstance(item, dict):
+                return jsonify({"error": f"Item {index}: expected a JSON object."}), 400
+            try:
+                contexts.append(ScaffoldContext.from_mapping(item))
+            except (TypeError, ValueError) as exc:
+                return jsonify({"error": f"Item {index}: {exc}"}), 400
+        folders = [ctx.addon_folder for ctx in contexts]
+        duplicates = sorted({folder for folder in folders if folders.count(folder) > 1})
+        if duplicates:
+            return jsonify({"error": f"Duplicate addon folders: {', '.join(duplicates)}"}), 400
+        if classnames is not None:
+            problems = [
+                f"Item {index}: {problem}"
+                for index, ctx in enumerate(contexts)
+                for problem in validate_context(ctx, classnames)
             ]
-            for path in placeholder_paths:
-                bundle.writestr(path, "")
-        zip_bytes.seek(0)
+            if problems:
+                return jsonify({"error": "Unknown classnames.", "problems": problems}), 422
+        try:
+            job = job_queue().submit(contexts)
+        except QueueFull as exc:
+            metrics.inc("arma_scaffold_jobs_total", (("outcome", "rejected"),))
+            response = jsonify({"error": str(exc)})
+            response.status_code = 429
+            response.headers["Retry-After"] = "10"
+            return response
+        metrics.inc("arma_scaffold_jobs_total", (("outcome", "queued"),))
+        response = jsonify(job_json(job))
+        response.status_code = 202
+        response.headers["Location"] = url_for("api_job", job_id=job.id)
+        return response
 
-        download_name = f"{ctx.addon_folder}_scaffold.zip"
-        return send_file(zip_bytes, as_attachment=True, download_name=download_name, mimetype="application/zip")
+    @app.get("/api/jobs/<job_id>")
+    def api_job(job_id: str):
+        job = job_queue().get(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown job."}), 404
+        return jsonify(job_json(job))
+
+    @app.get("/api/jobs/<job_id>/archive")
+    def api_job_archive(job_id: str):
+        job = job_queue().get(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown job."}), 404
+        if job.status != "done":
+            return jsonify({"error": f"Job is {job.status}.", "status": job.status}), 409
+        return send_file(
+            job.archive, as_attachment=True, download_name=f"scaffold_{job.id[:12]}.zip", mimetype="application/zip"
+        )
+
+    previews = PreviewSessions(scaffold_context_from_values)
+    app.extensions["previews"] = previews
+    preview_fields = set(form_defaults())
+
+    @app.post("/api/preview")
+    def api_preview():
+        payload = request.get_json(silent=True)
+        fields = payload.get("fields") if isinstance(payload, dict) else None
+        if not isinstance(fields, dict) or not all(isinstance(value, str) for value in fields.values()):
+            return jsonify({"error": 'Expected {"session": ..., "fields": {name: text}}.'}), 400
+        unknown = sorted(set(fields) - preview_fields)
+        if unknown:
+            return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+        with metrics.stage("preview"):
+            try:
+                update = previews.update(payload.get("session"), fields)
+            except UnknownSession:
+                # Expired, or created by another worker process: the client resends the whole form.
+                return jsonify({"error": "Unknown preview session.", "resync": True}), 409
+        return jsonify({"session": update.session, "full": update.full, "files": update.files, "error": update.error})
+
+    @app.get("/scaffold/cache")
+    def scaffold_cache_stats():
+        return jsonify(zip_cache.stats())
+
+    if profile_dir is not None:
+        from app.profiling import ProfilingMiddleware
+
+        app.wsgi_app = ProfilingMiddleware(app.wsgi_app, profile_dir)  # type: ignore[method-assign]
 
+    # Rendered last so url_for() can resolve every route; views read it at request time.
+    static_pages = render_static_pages(app)
+    app.extensions["static_pages"] = static_pages
     return app
 
 
@@ -0,0 +1,27 @@
+from string import Template
+
+from app.bench import bench_templates, block_free
+from app.main import MODEL_CFG_TEMPLATE, ScaffoldContext
+from app.templating import CompiledTemplate
+
+
+def test_block_free_strips_block_tags():
+    text = "a\n{% for mode in fire_modes %}\n  ${mode}\n{% endfor %}\nb ${x}\n  {% if y %}\nz\n  {% endif %}\nc\n"
+    assert block_free(text) == "a\nb ${x}\nc\n"
+
+
+def test_block_free_model_cfg_renders_with_string_template():
+    kwargs = ScaffoldContext().to_format_kwargs()
+    plain = block_free(MODEL_CFG_TEMPLATE.template)
+    assert "{%" not in plain
+    assert Template(plain).substitute(**kwargs) == CompiledTemplate(plain).render(kwargs)
+
+
+def test_bench_templates_runs():
+    results = bench_templates(iterations=2)
+    assert set(results) == {
+        "render.config_cpp",
+        "render.model_cfg",
+        "render.model_cfg.block_free",
+        "render.model_cfg.string_template",
+    }
@@ -0,0 +1,114 @@
+import json
+import pickle
+import random
+
+import pytest
+
+from app.cfgparse import ConfigIndexer, ConfigParseError, parse_text
+
+NAMES = ["A", "B", "C", "D", "E"]
+
+
+def _class(rng, depth):
+    name = rng.choice(NAMES)
+    if rng.random() < 0.15:
+        return f"class {name};"
+    parent = f": {rng.choice(NAMES)}" if rng.random() < 0.6 else ""
+    body = [f"p{rng.randint(0, 3)} = {rng.randint(0, 9)};" for _ in range(rng.randint(0, 2))]
+    if depth < 2:
+        body += [_class(rng, depth + 1) for _ in range(rng.randint(0, 2))]
+    if rng.random() < 0.1:
+        body.append(f"delete {rng.choice(NAMES)};")
+    return f"class {name}{parent} {{ {' '.join(body)} }};"
+
+
+def _config(rng):
+    items = [_class(rng, 0) for _ in range(rng.randint(1, 4))]
+    if rng.random() < 0.2:
+        items.append(f"delete {rng.choice(NAMES)};")
+    return "\n".join(items) + "\n"
+
+
+def _snapshot(index):
+    return (
+        {path: index.chains[path] for path in index.classes},
+        dict(index.unresolved),
+        {path: index.properties(path) for path in index.classes},
+        {path: (cls.name, cls.parent, cls.external) for path, cls in index.classes.items()},
+        {name: sorted(paths) for name, paths in index.by_name.items()},
+    )
+
+
+def _acyclic(snapshot):
+    return all(len(set(chain)) == len(chain) for chain in snapshot[0].values())
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_incremental_index_matches_full_rebuild(tmp_path, seed):
+    rng = random.Random(seed)
+    mods = [tmp_path / f"mod{index}" for index in range(4)]
+    for mod in mods:
+        mod.mkdir()
+        (mod / "config.cpp").write_text(_config(rng))
+    live = ConfigIndexer()
+    cache = tmp_path / "cache.json"
+    for _ in range(6):
+        config = rng.choice(mods) / "config.cpp"
+        if rng.random() < 0.75 or not config.exists():
+            config.write_text(_config(rng))
+        else:
+            config.unlink()
+        expected = _snapshot(ConfigIndexer().index([tmp_path]))
+        if not _acyclic(expected):
+            # Chains through an inheritance cycle depend on visiting order even in a full build.
+            continue
+        assert _snapshot(live.index([tmp_path])) == expected
+        assert _snapshot(ConfigIndexer(cache_path=cache).index([tmp_path])) == expected
+
+
+def test_unchanged_run_reuses_everything(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "config.cpp").write_text("class CfgWeapons { class Base; class Rifle: Base { mass = 1; }; };\n")
+    cache = tmp_path / "cache.json"
+    ConfigIndexer(cache_path=cache).index([tmp_path])
+
+    indexer = ConfigIndexer(cache_path=cache)
+    index = indexer.index([tmp_path])
+    assert (indexer.stats["parsed"], indexer.stats["reused"], indexer.stats["relinked"]) == (0, 1, 0)
+    assert index.property("CfgWeapons/Rifle", "mass") == 1
+    assert json.loads(cache.read_text(encoding="utf-8"))["version"] == ConfigIndexer.CACHE_VERSION
+
+
+def test_property_edit_relinks_nothing(tmp_path):
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+    (tmp_path / "a" / "config.cpp").write_text("class CfgWeapons { class Base { mass = 1; }; };\n")
+    (tmp_path / "b" / "config.cpp").write_text("class CfgWeapons { class Base; class Rifle: Base { speed = 2; }; };\n")
+    indexer = ConfigIndexer()
+    indexer.index([tmp_path])
+    assert indexer.merged.property("CfgWeapons/Rifle", "mass") == 1
+
+    (tmp_path / "a" / "config.cpp").write_text("class CfgWeapons { class Base { mass = 5; }; };\n")
+    index = indexer.index([tmp_path])
+    assert indexer.stats["relinked"] == 0
+    assert index.property("CfgWeapons/Rifle", "mass") == 5
+
+
+def test_pickle_cache_is_never_loaded(tmp_path):
+    class Boom:
+        def __reduce__(self):
+            return (exec, ("raise SystemExit('unpickled')",))
+
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "config.cpp").write_text("class A {};\n")
+    cache = tmp_path / "cache.bin"
+    cache.write_bytes(pickle.dumps((1, Boom())))
+    indexer = ConfigIndexer(cache_path=cache)
+    assert indexer.records == {}
+    indexer.index([tmp_path])
+    assert indexer.stats["parsed"] == 1
+
+
+def test_unterminated_define_parameters_name_the_line():
+    with pytest.raises(ConfigParseError, match=r"^config\.cpp:2: unterminated parameter list in #define MACRO"):
+        parse_text("class CfgPatches {};\n#define MACRO(a, b\n", source="config.cpp")
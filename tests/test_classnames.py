@@ -0,0 +1,25 @@
+import pytest
+
+from app.classnames import MAGIC, ClassnameIndex, ClassnameIndexError, write_index
+
+
+def test_prefix_search_is_case_insensitive(tmp_path):
+    path = tmp_path / "classes.idx"
+    write_index([("rhs_weap_m4", "weapon"), ("RHS_Weap_M16", "weapon"), ("rhs_mag_30Rnd", "magazine")], path)
+    index = ClassnameIndex(path)
+    try:
+        assert len(index) == 3
+        assert [name for name, _ in index.complete("RHS_WEAP")] == ["RHS_Weap_M16", "rhs_weap_m4"]
+        assert index.complete("rhs_", kind="magazine") == [("rhs_mag_30Rnd", "magazine")]
+    finally:
+        index.close()
+
+
+@pytest.mark.parametrize(
+    "data", [b"", b"CLS", b"not an index file", MAGIC + b"\xff\xff\xff\x00"], ids=["empty", "short", "text", "truncated"]
+)
+def test_non_index_files_raise(tmp_path, data):
+    path = tmp_path / "junk.idx"
+    path.write_bytes(data)
+    with pytest.raises(ClassnameIndexError, match="junk.idx"):
+        ClassnameIndex(path)
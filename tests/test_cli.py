@@ -0,0 +1,34 @@
+import pytest
+
+from app.main import main
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["pack", "{tmp}/missing"],
+        ["list", "{tmp}/missing.pbo"],
+        ["unpack", "{tmp}/garbage.pbo"],
+        ["derapify", "{tmp}/garbage.pbo"],
+        ["config", "{tmp}/missing"],
+        ["textures", "{tmp}/missing"],
+        ["textures", "{tmp}/garbage.pbo"],
+        ["sign", "--key", "{tmp}/junk.biprivatekey", "{tmp}/garbage.pbo"],
+        ["classnames", "search", "--index", "{tmp}/junk.idx", "rhs"],
+        ["classnames", "search", "--index", "{tmp}/empty.idx", "rhs"],
+        ["scaffold", "--watch", "{tmp}/bad_spec.json", "--output", "{tmp}/out"],
+    ],
+)
+def test_bad_input_is_a_one_line_error(argv, tmp_path, capsys):
+    (tmp_path / "garbage.pbo").write_bytes(b"not a pbo")
+    (tmp_path / "junk.biprivatekey").write_bytes(b"not a key\n")
+    (tmp_path / "junk.idx").write_bytes(b"not an index")
+    (tmp_path / "empty.idx").write_bytes(b"")
+    (tmp_path / "bad_spec.json").write_text('{"author": ', encoding="utf-8")
+    with pytest.raises(SystemExit) as exit_info:
+        main([arg.format(tmp=tmp_path) for arg in argv])
+    assert exit_info.value.code == 1
+    err = capsys.readouterr().err
+    assert f" {argv[0]}: error: " in err
+    assert "Traceback" not in err
+    assert len(err.strip().splitlines()) == 1
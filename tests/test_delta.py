@@ -0,0 +1,104 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from app.delta import DeltaError, apply_bundle, block_signatures, diff_trees, list_files, weak_checksums
+
+BLOCK = 1024
+
+
+def _reference_weak(window: bytes) -> int:
+    a = sum(window) & 0xFFFF
+    b = sum((len(window) - index) * byte for index, byte in enumerate(window)) & 0xFFFF
+    return a | (b << 16)
+
+
+def _trees(root):
+    rng = np.random.default_rng(7)
+    old, new = root / "old", root / "new"
+    for tree in (old, new):
+        (tree / "addons").mkdir(parents=True)
+    model = rng.integers(0, 256, 64 * BLOCK + 100, dtype=np.uint8).tobytes()
+    (old / "addons" / "model.p3d").write_bytes(model)
+    # Insert and overwrite a few bytes so most blocks match at shifted offsets.
+    edited = model[:5000] + b"inserted" + model[5000:40000] + b"\xff" * 300 + model[40300:]
+    (new / "addons" / "model.p3d").write_bytes(edited)
+    for tree in (old, new):
+        (tree / "keep.txt").write_text("unchanged\n")
+        (tree / "addons" / "empty.bin").write_bytes(b"")
+    (old / "readme.txt").write_text("moved\n")
+    (new / "addons" / "readme.txt").write_text("moved\n")
+    (old / "removed.txt").write_text("gone\n")
+    (new / "added.dat").write_bytes(rng.integers(0, 256, 3 * BLOCK, dtype=np.uint8).tobytes())
+    return old, new
+
+
+def _snapshot(tree):
+    return {name: (tree / name).read_bytes() for name in list_files(tree)}
+
+
+def test_weak_checksums_match_rsync_definition():
+    data = np.random.default_rng(3).integers(0, 256, 300, dtype=np.uint8)
+    block = 32
+    expected = [_reference_weak(data[start:start + block].tobytes()) for start in range(len(data) - block + 1)]
+    assert weak_checksums(data, block).tolist() == expected
+
+    signatures = block_signatures(data.tobytes(), block)
+    for start in range(0, len(data) - len(data) % block, block):
+        assert start in [offset for offset, _ in signatures[expected[start]]]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_diff_apply_round_trip(tmp_path, jobs):
+    old, new = _trees(tmp_path)
+    result = diff_trees(old, new, tmp_path / "update.delta", block_size=BLOCK, jobs=jobs)
+
+    actions = {entry.path: entry.action for entry in result.entries}
+    assert actions == {
+        "added.dat": "add",
+        "addons/empty.bin": "keep",
+        "addons/model.p3d": "delta",
+        "addons/readme.txt": "copy",
+        "keep.txt": "keep",
+    }
+    assert result.deleted == ["readme.txt", "removed.txt"]
+    model = next(entry for entry in result.entries if entry.path == "addons/model.p3d")
+    assert model.copied >= model.size - 4 * BLOCK
+    assert result.patch_bytes < result.full_bytes / 4
+
+    apply_bundle(result.output, old, tmp_path / "rebuilt")
+    assert _snapshot(tmp_path / "rebuilt") == _snapshot(new)
+
+    written, deleted = apply_bundle(result.output, old)
+    assert (written, deleted) == (3, 2)
+    assert _snapshot(old) == _snapshot(new)
+
+
+def test_apply_refuses_a_different_base_and_changes_nothing(tmp_path):
+    old, new = _trees(tmp_path)
+    bundle = diff_trees(old, new, tmp_path / "update.delta", block_size=BLOCK).output
+    (old / "addons" / "model.p3d").write_bytes(b"someone else's build")
+    before = _snapshot(old)
+    with pytest.raises(DeltaError, match="does not match"):
+        apply_bundle(bundle, old)
+    assert _snapshot(old) == before
+
+
+def test_corrupt_bundle_is_rejected(tmp_path):
+    old, new = _trees(tmp_path)
+    bundle = tmp_path / "bogus.delta"
+    bundle.write_bytes(b"PK\x03\x04 not a delta")
+    with pytest.raises(DeltaError, match="Not a delta bundle"):
+        apply_bundle(bundle, old)
+
+    good = diff_trees(old, new, tmp_path / "update.delta", block_size=BLOCK).output
+    size = good.stat().st_size
+    for position in (size - 10, size - 2000, size // 2):
+        shutil.copy(good, bundle)
+        data = bytearray(bundle.read_bytes())
+        data[position] ^= 0xFF
+        bundle.write_bytes(bytes(data))
+        with pytest.raises(DeltaError):
+            apply_bundle(bundle, old, tmp_path / "rebuilt")
+    assert not (tmp_path / "rebuilt").exists() or not list_files(tmp_path / "rebuilt")
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from app.metrics import Metrics
+
+LABELS = (("route", "/"), ("method", "GET"), ("status", "200"))
+
+
+def test_single_process_series_carry_pid():
+    metrics = Metrics()
+    metrics.inc("arma_http_requests_total", LABELS)
+    assert f'arma_http_requests_total{{route="/",method="GET",status="200",pid="{os.getpid()}"}} 1' in metrics.render()
+
+
+def test_shared_directory_sums_every_process(tmp_path):
+    first, second = Metrics(directory=tmp_path), Metrics(directory=tmp_path)
+    first.inc("arma_http_requests_total", LABELS, 2)
+    second.inc("arma_http_requests_total", LABELS, 3)
+    second.observe("arma_http_request_duration_seconds", (("route", "/"), ("method", "GET")), 0.004)
+    second.flush()
+
+    text = first.render()
+    assert 'arma_http_requests_total{route="/",method="GET",status="200"} 5' in text
+    assert 'arma_http_request_duration_seconds_count{route="/",method="GET"} 1' in text
+    assert "pid=" not in text
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_worker_totals_outlive_the_worker(tmp_path):
+    metrics = Metrics(directory=tmp_path)
+    pid = os.fork()
+    if pid == 0:
+        metrics.inc("arma_http_requests_total", LABELS, 4)
+        metrics.flush()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    metrics.inc("arma_http_requests_total", LABELS)
+    assert 'arma_http_requests_total{route="/",method="GET",status="200"} 5' in metrics.render()
+    assert len(list(tmp_path.glob("*.json"))) == 2
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import struct
+from pathlib import Path
+
+import pytest
+
+from app.pbo import PboError, pack_pbo, read_pbo, unpack_pbo, verify_pbo
+
+MTIME = 1_600_000_000
+
+
+def _addon(root: Path) -> Path:
+    addon = root / "my_addon"
+    (addon / "data").mkdir(parents=True)
+    (addon / "$PBOPREFIX$").write_text("x\\my_addon\n", encoding="utf-8")
+    (addon / "config.cpp").write_bytes(b"class CfgPatches {};\n")
+    (addon / "data" / "B.txt").write_bytes(b"")
+    (addon / "data" / "a.paa").write_bytes(bytes(range(256)) * 3)
+    for path in addon.rglob("*"):
+        os.utime(path, (MTIME, MTIME))
+    return addon
+
+
+def _entry(name: str, size: int) -> bytes:
+    return name.encode() + b"\0" + struct.pack("<5I", 0, 0, 0, MTIME, size)
+
+
+def test_pack_matches_known_layout(tmp_path):
+    addon = _addon(tmp_path)
+    result = pack_pbo(addon)
+
+    body = b"\0" + struct.pack("<5I", 0x56657273, 0, 0, 0, 0) + b"prefix\0x\\my_addon\0\0"
+    # Entries are sorted case-insensitively by path; the prefix file itself is not packed.
+    body += _entry("config.cpp", 21) + _entry("data\\a.paa", 768) + _entry("data\\B.txt", 0)
+    body += b"\0" + bytes(20)
+    body += b"class CfgPatches {};\n" + bytes(range(256)) * 3
+    expected = body + b"\0" + hashlib.sha1(body).digest()
+
+    assert result.output == tmp_path / "my_addon.pbo"
+    assert result.files == 3
+    assert result.bytes_written == len(expected)
+    assert result.output.read_bytes() == expected
+
+
+def test_pack_unpack_round_trip(tmp_path):
+    addon = _addon(tmp_path)
+    pbo = pack_pbo(addon, tmp_path / "out" / "addon.pbo").output
+    assert verify_pbo(pbo)
+
+    archive = read_pbo(pbo)
+    assert archive.prefix == "x\\my_addon"
+    assert [entry.name for entry in archive.entries] == ["config.cpp", "data\\a.paa", "data\\B.txt"]
+
+    unpack_pbo(pbo, tmp_path / "unpacked")
+    for name in ("config.cpp", "data/a.paa", "data/B.txt"):
+        unpacked = tmp_path / "unpacked" / name
+        assert unpacked.read_bytes() == (addon / name).read_bytes()
+        assert int(unpacked.stat().st_mtime) == MTIME
+    assert (tmp_path / "unpacked" / "$PBOPREFIX$").read_text(encoding="utf-8") == "x\\my_addon\n"
+
+    # Repacking the extracted folder reproduces the archive byte for byte.
+    assert pack_pbo(tmp_path / "unpacked", tmp_path / "again.pbo").output.read_bytes() == pbo.read_bytes()
+
+
+def test_verify_detects_modified_data(tmp_path):
+    pbo = pack_pbo(_addon(tmp_path)).output
+    data = bytearray(pbo.read_bytes())
+    data[data.index(b"CfgPatches")] ^= 0x20
+    pbo.write_bytes(bytes(data))
+    assert not verify_pbo(pbo)
+
+
+def test_truncated_archive_is_rejected(tmp_path):
+    pbo = pack_pbo(_addon(tmp_path)).output
+    pbo.write_bytes(pbo.read_bytes()[:200])
+    with pytest.raises(PboError, match="truncated"):
+        read_pbo(pbo)
+
+
+def test_unpack_refuses_paths_outside_destination(tmp_path):
+    pbo = tmp_path / "evil.pbo"
+    body = b"\0" + struct.pack("<5I", 0x56657273, 0, 0, 0, 0) + b"\0"
+    body += _entry("..\\escape.txt", 2) + b"\0" + bytes(20) + b"hi"
+    pbo.write_bytes(body + b"\0" + hashlib.sha1(body).digest())
+    with pytest.raises(PboError, match="outside"):
+        unpack_pbo(pbo, tmp_path / "dest")
+    assert not (tmp_path / "escape.txt").exists()
+
+
+def test_pack_rejects_missing_folder(tmp_path):
+    with pytest.raises(PboError, match="not a directory"):
+        pack_pbo(tmp_path / "missing")
+
+
+def test_failed_pack_leaves_no_partial_file(tmp_path, monkeypatch):
+    addon = _addon(tmp_path)
+
+    def vanished(writer, path, size):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr("app.pbo._copy_into", vanished)
+    with pytest.raises(FileNotFoundError):
+        pack_pbo(addon, tmp_path / "out" / "my_addon.pbo")
+    assert list((tmp_path / "out").iterdir()) == []
@@ -0,0 +1,101 @@
+import struct
+
+import pytest
+
+from app.rapify import RapifyError, _compressed_int, config_text, derapify, evaluate, rapify_file, rapify_text
+
+SOURCE = '''
+class CfgPatches {
+    class my_addon {
+        units[] = {};
+        requiredAddons[] = {"A3_Weapons_F", "rhsusf_c_weapons"};
+        requiredVersion = 0.1;
+    };
+};
+class Mode_SemiAuto;
+class CfgWeapons {
+    class Rifle_Base_F;
+    class my_rifle: Rifle_Base_F {
+        displayName = "Rifle ""DMR""";
+        magazines[] += {"mag_a", {"nested", 2}};
+        modes[] = {"Single"};
+        reloadTime = 60/700;
+        enabled = true;
+        aiDispersion = 1e-3;
+        shotSound = db-5;
+        class Single: Mode_SemiAuto {
+            reloadTime = 0.1;
+            count = 3;
+        };
+        delete OldMode;
+    };
+};
+'''
+
+
+@pytest.mark.parametrize("value, encoded", [(0, "00"), (1, "01"), (127, "7f"), (128, "8001"), (300, "ac02"), (16384, "808001")])
+def test_compressed_int_vectors(value, encoded):
+    assert _compressed_int(value) == bytes.fromhex(encoded)
+
+
+def test_known_layout():
+    body_offset = 16 + len(b"\0\x01\x00A\0") + 4
+    enums = body_offset + len(b"\0\x01\x01\x02x\0") + 4
+    expected = (
+        b"\0raP" + struct.pack("<III", 0, 8, enums)
+        + b"\0\x01" + b"\x00A\0" + struct.pack("<I", body_offset)
+        + b"\0\x01" + b"\x01\x02x\0" + struct.pack("<i", 1)
+        + struct.pack("<I", 0)
+    )
+    assert rapify_text("class A { x = 1; };") == expected
+
+
+def test_value_encodings():
+    data = rapify_text('s = "hi"; f = 0.5; l = -2; a[] = {1, "b"};')
+    root_entries = data[16 + 2:]
+    assert root_entries.startswith(b"\x01\x00s\0hi\0")
+    assert b"\x01\x01f\0" + struct.pack("<f", 0.5) in root_entries
+    assert b"\x01\x02l\0" + struct.pack("<i", -2) in root_entries
+    assert b"\x02a\0\x02\x02" + struct.pack("<i", 1) + b"\x00b\0" in root_entries
+
+
+def test_constant_folding():
+    assert evaluate("60/700") == pytest.approx(60 / 700)
+    assert evaluate("true") == 1
+    assert evaluate("db-5") == pytest.approx(10 ** (-5 / 20))
+    assert evaluate("__EVAL(1)") is None
+
+
+def test_round_trip_preserves_the_tree():
+    binary = rapify_text(SOURCE)
+    root = derapify(binary)
+
+    rifle = root.classes["cfgweapons"].classes["my_rifle"]
+    assert rifle.parent == "Rifle_Base_F"
+    assert rifle.properties["displayName"] == 'Rifle "DMR"'
+    assert rifle.properties["magazines"] == ["mag_a", ["nested", 2]]
+    assert rifle.appends == {"magazines"}
+    assert rifle.properties["reloadTime"] == pytest.approx(60 / 700)
+    assert rifle.properties["enabled"] == 1
+    assert rifle.deletes == ["OldMode"]
+    assert rifle.classes["single"].properties == {"reloadTime": pytest.approx(0.1), "count": 3}
+    assert root.classes["mode_semiauto"].external
+    assert root.classes["cfgweapons"].classes["rifle_base_f"].external
+
+    # Text written back from the binary rapifies to the identical binary.
+    assert rapify_text(config_text(root)) == binary
+
+
+def test_rapify_file_writes_beside_source(tmp_path):
+    source = tmp_path / "config.cpp"
+    source.write_text(SOURCE, encoding="utf-8")
+    output = rapify_file(source)
+    assert output == tmp_path / "config.bin"
+    assert output.read_bytes() == rapify_text(SOURCE)
+
+
+def test_malformed_input_is_rejected():
+    with pytest.raises(RapifyError, match="signature"):
+        derapify(b"class A {};")
+    with pytest.raises(RapifyError):
+        derapify(rapify_text(SOURCE)[:60])
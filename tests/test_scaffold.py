@@ -0,0 +1,64 @@
+import json
+import os
+
+from app.main import MANIFEST_NAME, ScaffoldContext, addon_directory, sync_scaffold
+
+
+def _statuses(changes):
+    return {change.path.name: change.status for change in changes}
+
+
+def test_rerun_is_a_no_op(tmp_path):
+    ctx = ScaffoldContext()
+    addon = addon_directory(tmp_path, ctx)
+    assert set(_statuses(sync_scaffold(addon, ctx)).values()) == {"created"}
+    mtime = (addon / "config.cpp").stat().st_mtime_ns
+    assert set(_statuses(sync_scaffold(addon, ctx)).values()) == {"unchanged"}
+    assert (addon / "config.cpp").stat().st_mtime_ns == mtime
+
+
+def test_hand_edit_is_repaired(tmp_path):
+    ctx = ScaffoldContext()
+    addon = addon_directory(tmp_path, ctx)
+    sync_scaffold(addon, ctx)
+    original = (addon / "config.cpp").read_text(encoding="utf-8")
+    (addon / "config.cpp").write_text(original + "// local edit\n", encoding="utf-8")
+
+    assert _statuses(sync_scaffold(addon, ctx))["config.cpp"] == "updated"
+    assert (addon / "config.cpp").read_text(encoding="utf-8") == original
+
+
+def test_same_size_edit_is_repaired(tmp_path):
+    ctx = ScaffoldContext()
+    addon = addon_directory(tmp_path, ctx)
+    sync_scaffold(addon, ctx)
+    path = addon / "model.cfg"
+    original = path.read_bytes()
+    path.write_bytes(original.replace(b"class", b"CLASS", 1))
+    assert _statuses(sync_scaffold(addon, ctx))["model.cfg"] == "updated"
+    assert path.read_bytes() == original
+
+
+def test_touch_only_refreshes_the_record(tmp_path):
+    ctx = ScaffoldContext()
+    addon = addon_directory(tmp_path, ctx)
+    sync_scaffold(addon, ctx)
+    path = addon / "config.cpp"
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+
+    assert _statuses(sync_scaffold(addon, ctx))["config.cpp"] == "unchanged"
+    assert path.stat().st_mtime_ns == 1_000_000_000
+    record = json.loads((addon / MANIFEST_NAME).read_text(encoding="utf-8"))["config.cpp"]
+    assert record["mtime_ns"] == 1_000_000_000
+
+
+def test_legacy_hash_only_manifest_is_upgraded(tmp_path):
+    ctx = ScaffoldContext()
+    addon = addon_directory(tmp_path, ctx)
+    sync_scaffold(addon, ctx)
+    manifest = addon / MANIFEST_NAME
+    legacy = {name: record["sha256"] for name, record in json.loads(manifest.read_text(encoding="utf-8")).items()}
+    manifest.write_text(json.dumps(legacy), encoding="utf-8")
+
+    assert set(_statuses(sync_scaffold(addon, ctx)).values()) == {"unchanged"}
+    assert all(isinstance(record, dict) for record in json.loads(manifest.read_text(encoding="utf-8")).values())
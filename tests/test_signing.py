@@ -0,0 +1,139 @@
+import hashlib
+import struct
+
+import pytest
+
+from app.pbo import pack_pbo
+from app.signing import (
+    PublicKey,
+    SigningError,
+    _pad,
+    generate_key,
+    load_private_key,
+    load_public_key,
+    load_signature,
+    pbo_hashes,
+    sign_pbo,
+    signature_path,
+    verify_pbo_signature,
+)
+
+SHA1_DIGEST_INFO = bytes.fromhex("3021300906052b0e03021a05000414")
+
+
+@pytest.fixture(scope="module")
+def key():
+    return generate_key("tester", bits=512)
+
+
+def _pbo(tmp_path, files):
+    addon = tmp_path / "signed_addon"
+    addon.mkdir()
+    (addon / "$PBOPREFIX$").write_text("x\\signed_addon\n", encoding="utf-8")
+    for name, data in files.items():
+        (addon / name).write_bytes(data)
+    return pack_pbo(addon).output
+
+
+FILES = {"config.cpp": b"class CfgPatches {};\n", "init.sqf": b"hint 'hi';\n", "model.p3d": b"MLOD", "empty.txt": b""}
+
+
+def test_public_key_blob_layout():
+    blob = PublicKey("me", 64, 65537, 0x0102030405060708).to_bytes()
+    expected_blob = b"\x06\x02\x00\x00\x00\x24\x00\x00RSA1" + struct.pack("<II", 64, 65537) + bytes.fromhex("0807060504030201")
+    assert blob == b"me\0" + struct.pack("<I", len(expected_blob)) + expected_blob
+
+
+def test_pkcs1_padding_vector():
+    digest = hashlib.sha1(b"abc").digest()
+    padded = _pad(digest, 1024).to_bytes(128, "big")
+    assert padded == b"\x00\x01" + b"\xff" * (128 - 3 - len(SHA1_DIGEST_INFO) - 20) + b"\x00" + SHA1_DIGEST_INFO + digest
+
+
+def test_pbo_hashes_follow_the_bi_scheme(tmp_path):
+    pbo = _pbo(tmp_path, FILES)
+    data = pbo.read_bytes()
+    hash1, hash2, hash3 = pbo_hashes(pbo, version=3)
+
+    # hash1 covers everything before the trailer and equals the trailer's SHA1.
+    assert hash1 == hashlib.sha1(data[:-21]).digest() == data[-20:]
+    # Names of non-empty entries, lower-cased and sorted; prefix with a trailing backslash.
+    names = hashlib.sha1(b"config.cppinit.sqfmodel.p3d").digest()
+    assert hash2 == hashlib.sha1(hash1 + names + b"x\\signed_addon\\").digest()
+    # Version 3 hashes only script-like contents (.sqf here), in entry order.
+    files = hashlib.sha1(FILES["init.sqf"]).digest()
+    assert hash3 == hashlib.sha1(files + names + b"x\\signed_addon\\").digest()
+
+    # Version 2 hashes everything except the listed media formats instead.
+    _, _, hash3_v2 = pbo_hashes(pbo, version=2)
+    files_v2 = hashlib.sha1(FILES["config.cpp"] + FILES["init.sqf"]).digest()
+    assert hash3_v2 == hashlib.sha1(files_v2 + names + b"x\\signed_addon\\").digest()
+
+
+def test_pbo_without_hashed_files_uses_placeholder(tmp_path):
+    pbo = _pbo(tmp_path, {"model.p3d": b"MLOD"})
+    hash1, _, hash3 = pbo_hashes(pbo, version=3)
+    names = hashlib.sha1(b"model.p3d").digest()
+    assert hash3 == hashlib.sha1(hashlib.sha1(b"gnihton").digest() + names + b"x\\signed_addon\\").digest()
+
+
+def test_sign_and_verify_round_trip(tmp_path, key):
+    pbo = _pbo(tmp_path, FILES)
+    signature = sign_pbo(pbo, key)
+    assert signature == signature_path(pbo, "tester") == tmp_path / "signed_addon.pbo.tester.bisign"
+    assert verify_pbo_signature(pbo, key.public)
+
+    loaded = load_signature(signature)
+    assert loaded.key == key.public
+    assert loaded.version == 3
+    padded = [_pad(digest, key.bits) for digest in pbo_hashes(pbo)]
+    assert [pow(value, key.exponent, key.modulus) for value in loaded.signatures] == padded
+
+
+def test_verify_rejects_tampered_pbo_and_other_keys(tmp_path, key):
+    pbo = _pbo(tmp_path, FILES)
+    sign_pbo(pbo, key)
+    assert not verify_pbo_signature(pbo, generate_key("tester", bits=512).public)
+
+    data = bytearray(pbo.read_bytes())
+    data[data.index(b"hint")] ^= 0x20
+    pbo.write_bytes(bytes(data))
+    assert not verify_pbo_signature(pbo, key.public)
+
+
+def test_key_files_round_trip(tmp_path, key):
+    (tmp_path / "tester.bikey").write_bytes(key.public.to_bytes())
+    (tmp_path / "tester.biprivatekey").write_bytes(key.to_bytes())
+    assert load_public_key(tmp_path / "tester.bikey") == key.public
+    assert load_private_key(tmp_path / "tester.biprivatekey") == key
+
+
+def test_loading_a_private_key_as_public_fails(tmp_path, key):
+    (tmp_path / "tester.biprivatekey").write_bytes(key.to_bytes())
+    with pytest.raises(SigningError):
+        load_public_key(tmp_path / "tester.biprivatekey")
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"junk", b"not a key at all\n" * 4, b"tester\0\x01", b"tester\0\xff\xff\xff\x7f", b"\xff\xfe\0"],
+    ids=["empty", "no-authority", "text", "short-length", "huge-length", "bad-utf8"],
+)
+def test_non_key_files_raise_signing_error(tmp_path, data):
+    junk = tmp_path / "junk.biprivatekey"
+    junk.write_bytes(data)
+    for load in (load_private_key, load_public_key, load_signature):
+        with pytest.raises(SigningError, match="junk.biprivatekey"):
+            load(junk)
+
+
+def test_truncated_key_and_signature_raise_signing_error(tmp_path, key):
+    pbo = _pbo(tmp_path, FILES)
+    signature = sign_pbo(pbo, key)
+    for path, data, load in (
+        (tmp_path / "short.biprivatekey", key.to_bytes(), load_private_key),
+        (tmp_path / "short.bisign", signature.read_bytes(), load_signature),
+    ):
+        path.write_bytes(data[:-1])
+        with pytest.raises(SigningError, match="Truncated"):
+            load(path)
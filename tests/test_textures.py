@@ -0,0 +1,137 @@
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from app.textures import TextureError, compress, convert_many, convert_texture, decode_png, encode_paa
+
+
+def read_paa(data: bytes):
+    """Minimal independent PAA reader: taggs, OFFS table and the mipmap headers it points at."""
+    (kind,) = struct.unpack_from("<H", data, 0)
+    position, taggs = 2, {}
+    while data[position:position + 4] == b"GGAT":
+        name = data[position + 4:position + 8][::-1].decode()
+        (length,) = struct.unpack_from("<I", data, position + 8)
+        taggs[name] = data[position + 12:position + 12 + length]
+        position += 12 + length
+    (palette,) = struct.unpack_from("<H", data, position)
+    assert palette == 0
+    first_mip = position + 2
+    offsets = [offset for offset in struct.unpack(f"<{len(taggs['OFFS']) // 4}I", taggs["OFFS"]) if offset]
+    mips = []
+    for offset in offsets:
+        width, height = struct.unpack_from("<HH", data, offset)
+        size = int.from_bytes(data[offset + 4:offset + 7], "little")
+        mips.append((offset, width, height, data[offset + 7:offset + 7 + size]))
+    return kind, taggs, first_mip, mips
+
+
+def _png(pixels: np.ndarray, filters) -> bytes:
+    """RGBA PNG with the given filter type per row (scalar reference implementation of the filters)."""
+    height, width, bpp = pixels.shape
+    rows = pixels.reshape(height, width * bpp).astype(np.int32)
+    raw = bytearray()
+    for y, kind in enumerate(filters):
+        raw.append(kind)
+        for x in range(width * bpp):
+            a = rows[y, x - bpp] if x >= bpp else 0
+            b = rows[y - 1, x] if y else 0
+            c = rows[y - 1, x - bpp] if y and x >= bpp else 0
+            if kind == 0:
+                predicted = 0
+            elif kind == 1:
+                predicted = a
+            elif kind == 2:
+                predicted = b
+            elif kind == 3:
+                predicted = (a + b) // 2
+            else:
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                predicted = a if pa <= pb and pa <= pc else b if pb <= pc else c
+            raw.append((rows[y, x] - predicted) & 0xFF)
+
+    def chunk(kind: bytes, payload: bytes) -> bytes:
+        return struct.pack(">I", len(payload)) + kind + payload + struct.pack(">I", zlib.crc32(kind + payload))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(bytes(raw))) + chunk(b"IEND", b"")
+
+
+@pytest.mark.parametrize("filters", [[0, 1, 2, 3, 4, 3, 1], [4] * 7, [3] * 7, [2, 1, 0, 1, 2, 1, 0]])
+def test_png_unfilter_matches_reference(filters):
+    pixels = np.random.default_rng(len(filters) + sum(filters)).integers(0, 256, (7, 9, 4), dtype=np.uint8)
+    assert np.array_equal(decode_png(_png(pixels, filters)), pixels)
+
+
+def test_dxt1_solid_block_vector():
+    red = np.zeros((4, 4, 4), dtype=np.uint8)
+    red[:, :, 0], red[:, :, 3] = 255, 255
+    # Both endpoints are pure red in RGB565 (0xF800), every index 0.
+    assert compress(red, "DXT1") == bytes.fromhex("00f800f800000000")
+
+
+def test_dxt5_solid_block_vector():
+    grey = np.full((4, 4, 4), 128, dtype=np.uint8)
+    # Alpha block: a0 = a1 = 128 with zero indices, then the colour block (0x8410 is grey in RGB565).
+    assert compress(grey, "DXT5") == bytes.fromhex("8080000000000000" "1084108400000000")
+
+
+@pytest.mark.parametrize("fmt, block_bytes", [("DXT1", 8), ("DXT5", 16)])
+def test_offs_table_points_at_each_mipmap(fmt, block_bytes):
+    rgba = np.random.default_rng(1).integers(0, 256, (32, 64, 4), dtype=np.uint8)
+    data, count = encode_paa(rgba, fmt)
+    kind, taggs, first_mip, mips = read_paa(data)
+
+    assert kind == (0xFF01 if fmt == "DXT1" else 0xFF05)
+    assert ("FLAG" in taggs) == (fmt == "DXT5")
+    assert len(taggs["OFFS"]) == 16 * 4
+    assert count == len(mips) == 4
+    assert mips[0][0] == first_mip
+    sizes = [(64, 32), (32, 16), (16, 8), (8, 4)]
+    for (offset, width, height, payload), (expected_width, expected_height) in zip(mips, sizes):
+        assert (width, height) == (expected_width, expected_height)
+        assert len(payload) == (width // 4) * (height // 4) * block_bytes
+    end = mips[-1][0] + 7 + len(mips[-1][3])
+    assert data[end:] == b"\0" * 6
+    # Level 1 is the 2x2 box filter of level 0, rounded half up.
+    half = (rgba.reshape(16, 2, 32, 2, 4).sum(axis=(1, 3)) + 2) // 4
+    assert mips[1][3] == compress(half.astype(np.uint8), fmt)
+
+
+def test_convert_texture_round_trip(tmp_path):
+    pixels = np.random.default_rng(2).integers(0, 256, (16, 16, 4), dtype=np.uint8)
+    pixels[:, :, 3] = 255
+    source = tmp_path / "rifle_co.png"
+    source.write_bytes(_png(pixels, [4] * 16))
+    result = convert_texture(source, tmp_path / "rifle_co.paa")
+    assert not result.error
+    assert (result.fmt, result.width, result.height, result.mipmaps) == ("DXT1", 16, 16, 3)
+    _, taggs, _, mips = read_paa(result.output.read_bytes())
+    assert mips[0][3] == compress(pixels, "DXT1")
+    assert taggs["AVGC"] == bytes(pixels.reshape(-1, 4).mean(axis=0).round().astype(np.uint8)[[2, 1, 0, 3]])
+
+
+def test_non_power_of_two_is_rejected():
+    with pytest.raises(TextureError, match="power-of-two"):
+        encode_paa(np.zeros((12, 16, 4), dtype=np.uint8), "DXT1")
+
+
+def test_a_single_texture_can_be_named(tmp_path):
+    source = tmp_path / "rifle_co.png"
+    source.write_bytes(_png(np.full((4, 4, 4), 255, dtype=np.uint8), [0] * 4))
+    [result] = convert_many(source)
+    assert not result.error and result.output == tmp_path / "rifle_co.paa"
+
+
+@pytest.mark.parametrize("name", ["notes.txt", "empty_dir"])
+def test_nothing_to_convert_is_an_error(tmp_path, name):
+    target = tmp_path / name
+    if name.endswith(".txt"):
+        target.write_text("not a texture", encoding="utf-8")
+    else:
+        target.mkdir()
+    with pytest.raises(TextureError):
+        list(convert_many(target))
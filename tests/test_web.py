@@ -0,0 +1,50 @@
+import io
+import zipfile
+
+import pytest
+
+from app.main import ScaffoldContext
+from app.web import create_app
+
+BUDGET = 3000
+POSTS = 30
+
+
+@pytest.fixture
+def app(tmp_path):
+    return create_app(upload_budget_bytes=BUDGET, jobs_dir=tmp_path / "jobs")
+
+
+def _model_form():
+    # Each body is comfortably larger than BUDGET / POSTS, so a leaked reservation exhausts the budget.
+    return {"model_upload": (io.BytesIO(b"\x00" * (2 * BUDGET // POSTS)), "rifle.p3d")}
+
+
+@pytest.mark.parametrize("query", ["", "?buffered=1"])
+def test_uploads_return_their_budget(app, query):
+    client = app.test_client()
+    for _ in range(POSTS):
+        response = client.post("/scaffold" + query, data=_model_form(), content_type="multipart/form-data")
+        assert response.status_code == 200
+        response.data
+        response.close()
+    assert app.extensions["upload_budget"].in_flight == 0
+
+
+def test_empty_file_inputs_do_not_reserve(app):
+    client = app.test_client()
+    for _ in range(POSTS):
+        form = {"author": "Tester", "model_upload": (io.BytesIO(b""), "")}
+        response = client.post("/scaffold", data=form, content_type="multipart/form-data")
+        assert response.status_code == 200
+        response.close()
+    assert app.extensions["upload_budget"].in_flight == 0
+
+
+def test_buffered_upload_is_sized(app):
+    response = app.test_client().post("/scaffold?buffered=1", data=_model_form(), content_type="multipart/form-data")
+    body = response.data
+    response.close()
+    assert response.content_length == len(body)
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        assert any(name.endswith(ScaffoldContext().model_filename) for name in archive.namelist())